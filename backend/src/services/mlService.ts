@@ -2,10 +2,48 @@
  * ML Service Integration for Node.js Backend
  */
 import axios from 'axios';
+import { encode, decode } from '@msgpack/msgpack';
 import logger from '@/utils/logger';
 
 const ML_SERVICE_URL = process.env.ML_SERVICE_URL || 'http://localhost:8000';
 
+// Wire format for batch predictions and forecasts: 'json' (default) or 'msgpack'
+// (columnar, several times smaller and cheaper to parse for large batches)
+const ML_WIRE_FORMAT = process.env.ML_WIRE_FORMAT === 'msgpack' ? 'msgpack' : 'json';
+
+const MSGPACK = 'application/msgpack';
+
+const msgpackPost = async (path: string, body: any): Promise<any> => {
+  const encoded = encode(body);
+  const response = await axios.post(
+    `${ML_SERVICE_URL}${path}`,
+    Buffer.from(encoded.buffer, encoded.byteOffset, encoded.byteLength),
+    { headers: { 'Content-Type': MSGPACK, Accept: MSGPACK }, responseType: 'arraybuffer' }
+  );
+  return decode(response.data);
+};
+
+const toColumns = (transactions: any[]) => ({
+  description: transactions.map(t => t.description),
+  amount: transactions.map(t => Number(t.amount)),
+  date: transactions.map(t => (t.date instanceof Date ? t.date.toISOString() : t.date ?? null)),
+});
+
+// Columnar daily forecast back to one object per day
+const forecastRows = (forecast: any) => {
+  const daily = forecast?.daily_forecast;
+  if (!daily || Array.isArray(daily)) return forecast;
+  return {
+    ...forecast,
+    daily_forecast: daily.date.map((date: string, i: number) => ({
+      date,
+      predicted_amount: daily.predicted_amount[i],
+      lower_bound: daily.lower_bound[i],
+      upper_bound: daily.upper_bound[i],
+    })),
+  };
+};
+
 export class MLService {
   // Transaction Categorization
   static async trainCategorizer(userId: string, transactions: any[]): Promise<any> {
@@ -44,6 +82,22 @@ export class MLService {
 
   static async predictCategoriesBatch(userId: string, transactions: any[]): Promise<any[]> {
     try {
+      if (ML_WIRE_FORMAT === 'msgpack') {
+        const { data } = await msgpackPost('/categorize/predict-batch', {
+          user_id: userId,
+          transactions: toColumns(transactions)
+        });
+
+        return data.category.map((category: string, i: number) => ({
+          category,
+          confidence: data.confidence[i],
+          alternatives: data.alternatives.category[i].map((alternative: string, j: number) => ({
+            category: alternative,
+            confidence: data.alternatives.confidence[i][j]
+          }))
+        }));
+      }
+
       const response = await axios.post(`${ML_SERVICE_URL}/categorize/predict-batch`, {
         user_id: userId,
         transactions
@@ -79,6 +133,22 @@ export class MLService {
 
   static async forecastExpenses(userId: string, category?: string, periods: number = 30): Promise<any> {
     try {
+      if (ML_WIRE_FORMAT === 'msgpack') {
+        const { data } = await msgpackPost('/forecast/predict', {
+          user_id: userId,
+          category,
+          periods
+        });
+
+        if (data.categories) {
+          for (const name of Object.keys(data.categories)) {
+            data.categories[name] = forecastRows(data.categories[name]);
+          }
+          return data;
+        }
+        return forecastRows(data);
+      }
+
       const response = await axios.post(`${ML_SERVICE_URL}/forecast/predict`, {
         user_id: userId,
         category,
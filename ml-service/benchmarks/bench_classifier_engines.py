@@ -0,0 +1,77 @@
+"""
+Benchmark categorizer engines (random forest vs xgboost)
+Compares training time, model size, inference latency and accuracy across user sizes
+
+Usage: python -m benchmarks.bench_classifier_engines [--sizes 200 1000 5000]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+# Keep benchmark models out of the real model directory
+os.environ.setdefault("MODEL_PATH", tempfile.mkdtemp(prefix="bench_models_"))
+
+from benchmarks.synthetic import generate_transactions
+from services.transaction_categorizer import TransactionCategorizer
+
+
+def directory_size(path) -> int:
+    """Total size in bytes of the files in a model directory"""
+    return sum(p.stat().st_size for p in path.iterdir() if p.is_file())
+
+
+def bench_engine(engine: str, size: int, predict_rounds: int = 200) -> dict:
+    """Train and exercise one engine on one synthetic user"""
+    transactions = generate_transactions(size, seed=size)
+    categorizer = TransactionCategorizer(f"bench_{engine}_{size}", engine=engine)
+    
+    start = time.perf_counter()
+    result = categorizer.train(transactions)
+    train_seconds = time.perf_counter() - start
+    
+    # Reload from disk to measure the persisted artifact
+    start = time.perf_counter()
+    categorizer = TransactionCategorizer(f"bench_{engine}_{size}", engine=engine)
+    load_seconds = time.perf_counter() - start
+    
+    sample = transactions[:predict_rounds]
+    start = time.perf_counter()
+    for txn in sample:
+        categorizer.predict(txn)
+    single_ms = (time.perf_counter() - start) / len(sample) * 1000
+    
+    start = time.perf_counter()
+    categorizer.predict_batch(transactions)
+    batch_seconds = time.perf_counter() - start
+    
+    return {
+        "engine": engine,
+        "size": size,
+        "accuracy": result["accuracy"],
+        "train_s": train_seconds,
+        "load_s": load_seconds,
+        "model_kb": directory_size(categorizer.store.versions_dir / categorizer.version) / 1024,
+        "predict_ms": single_ms,
+        "batch_tps": len(transactions) / batch_seconds
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark categorizer engines')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[200, 1000, 5000, 20000])
+    parser.add_argument('--engines', nargs='+', default=list(TransactionCategorizer.ENGINES))
+    args = parser.parse_args()
+    
+    header = f"{'engine':<14}{'size':>7}{'acc':>8}{'train s':>9}{'load s':>8}{'model KB':>10}{'pred ms':>9}{'batch tx/s':>12}"
+    print(header)
+    print("-" * len(header))
+    for size in args.sizes:
+        for engine in args.engines:
+            r = bench_engine(engine, size)
+            print(f"{r['engine']:<14}{r['size']:>7}{r['accuracy']:>8.2%}{r['train_s']:>9.2f}"
+                  f"{r['load_s']:>8.3f}{r['model_kb']:>10.1f}{r['predict_ms']:>9.2f}{r['batch_tps']:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
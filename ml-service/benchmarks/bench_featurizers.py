@@ -0,0 +1,75 @@
+"""
+Benchmark description featurizers (TF-IDF vs hashing)
+Compares accuracy, artifact size, fit time and featurization throughput
+
+Usage: python -m benchmarks.bench_featurizers [--sizes 200 1000 5000]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+# Keep benchmark models out of the real model directory
+os.environ.setdefault("MODEL_PATH", tempfile.mkdtemp(prefix="bench_models_"))
+
+import pandas as pd
+
+from benchmarks.synthetic import generate_transactions
+from services.transaction_categorizer import TransactionCategorizer
+
+ARTIFACTS = {"tfidf": "tfidf_vectorizer.pkl", "hashing": "text_hashing.npz"}
+
+
+def bench_featurizer(featurizer: str, size: int, engine: str) -> dict:
+    """Train one user with the given featurizer and time featurization alone"""
+    transactions = generate_transactions(size, seed=size)
+    categorizer = TransactionCategorizer(f"bench_{featurizer}_{engine}_{size}", engine=engine,
+                                         featurizer=featurizer)
+    result = categorizer.train(transactions)
+    
+    descriptions = pd.Series([t['description'] for t in transactions]).apply(
+        categorizer.preprocess_description
+    )
+    start = time.perf_counter()
+    categorizer.build_text_vectorizer().fit_transform(descriptions)
+    fit_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    categorizer.text_vectorizer.transform(descriptions)
+    transform_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    TransactionCategorizer(categorizer.user_id, engine=engine, featurizer=featurizer)
+    load_seconds = time.perf_counter() - start
+    
+    return {
+        "featurizer": featurizer,
+        "engine": engine,
+        "size": size,
+        "accuracy": result["accuracy"],
+        "fit_ms": fit_seconds * 1000,
+        "docs_per_s": size / transform_seconds,
+        "artifact_kb": (categorizer.store.versions_dir / categorizer.version / ARTIFACTS[featurizer]).stat().st_size / 1024,
+        "load_s": load_seconds
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark description featurizers')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[200, 1000, 5000, 20000])
+    parser.add_argument('--engine', default='random_forest', choices=TransactionCategorizer.ENGINES)
+    args = parser.parse_args()
+    
+    header = f"{'featurizer':<12}{'size':>7}{'acc':>8}{'fit ms':>9}{'docs/s':>11}{'artifact KB':>13}{'load s':>8}"
+    print(f"engine: {args.engine}")
+    print(header)
+    print("-" * len(header))
+    for size in args.sizes:
+        for featurizer in TransactionCategorizer.FEATURIZERS:
+            r = bench_featurizer(featurizer, size, args.engine)
+            print(f"{r['featurizer']:<12}{r['size']:>7}{r['accuracy']:>8.2%}{r['fit_ms']:>9.1f}"
+                  f"{r['docs_per_s']:>11.0f}{r['artifact_kb']:>13.1f}{r['load_s']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Benchmark the ML service hot paths
+Measures categorizer/forecaster train time, model load time, single and batch
+predict latency and throughput, feature extraction, forecast latency and peak
+memory at several data sizes on seeded synthetic data. Results are written as
+JSON and can be compared against a saved baseline to flag regressions.
+
+Usage:
+    python -m benchmarks.bench_hot_paths --output baseline.json
+    python -m benchmarks.bench_hot_paths --baseline baseline.json [--threshold 0.15] [--fail-on-regression]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+# Keep benchmark models out of the real model directory
+os.environ.setdefault("MODEL_PATH", tempfile.mkdtemp(prefix="bench_models_"))
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from benchmarks.synthetic import generate_transactions
+from services.transaction_categorizer import TransactionCategorizer
+from services.expense_forecaster import ExpenseForecaster
+
+# Metric name -> True when higher is better
+METRICS = {
+    "categorizer_train_s": False,
+    "categorizer_train_peak_mb": False,
+    "categorizer_load_ms": False,
+    "extract_features_ms": False,
+    "predict_single_ms": False,
+    "predict_batch_ms": False,
+    "predict_batch_tps": True,
+    "predict_batch_peak_mb": False,
+    "forecaster_train_s": False,
+    "forecaster_train_peak_mb": False,
+    "forecaster_load_ms": False,
+    "forecast_category_ms": False,
+    "forecast_all_ms": False,
+    "forecast_all_peak_mb": False,
+}
+
+
+def median_seconds(fn, repeats: int) -> float:
+    """Median wall time of ``fn()`` over ``repeats`` runs"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def peak_mb(fn) -> float:
+    """Peak traced allocation of one ``fn()`` call, in MB (run separately from timing)"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def bench_categorizer(size: int, repeats: int, batch_size: int) -> dict:
+    transactions = generate_transactions(size, seed=size)
+    user_id = f"bench_hot_{size}"
+    
+    start = time.perf_counter()
+    TransactionCategorizer(user_id).train(transactions)
+    train_seconds = time.perf_counter() - start
+    train_peak = peak_mb(lambda: TransactionCategorizer(f"{user_id}_mem").train(transactions))
+    
+    categorizer = TransactionCategorizer(user_id)
+    load_seconds = median_seconds(lambda: TransactionCategorizer(user_id), repeats)
+    
+    queries = generate_transactions(batch_size, seed=size + 1)
+    for txn in queries:
+        txn.pop("category")
+    batch_df = pd.DataFrame(queries)
+    
+    # Warm up lazy imports and caches before timing
+    categorizer.predict_batch(queries)
+    
+    single = median_seconds(lambda: [categorizer.predict(txn) for txn in queries[:20]], repeats) / 20
+    batch = median_seconds(lambda: categorizer.predict_batch(queries), repeats)
+    features = median_seconds(lambda: categorizer.extract_features(batch_df), repeats)
+    
+    return {
+        "categorizer_train_s": train_seconds,
+        "categorizer_train_peak_mb": train_peak,
+        "categorizer_load_ms": load_seconds * 1000,
+        "extract_features_ms": features * 1000,
+        "predict_single_ms": single * 1000,
+        "predict_batch_ms": batch * 1000,
+        "predict_batch_tps": batch_size / batch,
+        "predict_batch_peak_mb": peak_mb(lambda: categorizer.predict_batch(queries)),
+    }
+
+
+def bench_forecaster(size: int, repeats: int) -> dict:
+    transactions = generate_transactions(size, seed=size)
+    user_id = f"bench_hot_{size}"
+    
+    start = time.perf_counter()
+    ExpenseForecaster(user_id).train(transactions)
+    train_seconds = time.perf_counter() - start
+    train_peak = peak_mb(lambda: ExpenseForecaster(f"{user_id}_mem").train(transactions))
+    
+    forecaster = ExpenseForecaster(user_id)
+    result = {
+        "forecaster_train_s": train_seconds,
+        "forecaster_train_peak_mb": train_peak,
+        "forecaster_load_ms": median_seconds(lambda: ExpenseForecaster(user_id), repeats) * 1000,
+    }
+    if not forecaster.is_trained():
+        return result
+    
+    # The category with the most history is the usual dashboard request
+    category = max(forecaster.category_stats, key=lambda c: forecaster.category_stats[c]["days_of_data"])
+    forecaster.forecast_all(30)
+    result.update({
+        "forecast_category_ms": median_seconds(lambda: forecaster.forecast_category(category, 30), repeats) * 1000,
+        "forecast_all_ms": median_seconds(lambda: forecaster.forecast_all(30), repeats) * 1000,
+        "forecast_all_peak_mb": peak_mb(lambda: forecaster.forecast_all(30)),
+    })
+    return result
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Metrics that got worse than the baseline by more than ``threshold``"""
+    regressions = []
+    for size, metrics in results.items():
+        for name, value in metrics.items():
+            base = baseline.get(size, {}).get(name)
+            if not base or name not in METRICS:
+                continue
+            # Positive change means slower, bigger or lower throughput
+            change = (base - value) / base if METRICS[name] else (value - base) / base
+            if change > threshold:
+                regressions.append({"size": size, "metric": name, "baseline": base, "current": value,
+                                    "change": change})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ML service hot paths')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[200, 1000, 5000])
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--skip-forecaster', action='store_true', help='Skip Prophet benchmarks (slow)')
+    parser.add_argument('--output', help='Write results as JSON (use as a later --baseline)')
+    parser.add_argument('--baseline', help='Compare against a previous --output file')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='Relative change counted as a regression (default: 0.15)')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 on regressions')
+    args = parser.parse_args()
+    
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+    
+    results = {}
+    for size in args.sizes:
+        print(f"Benchmarking {size} transactions...", file=sys.stderr)
+        metrics = bench_categorizer(size, args.repeats, args.batch_size)
+        if not args.skip_forecaster:
+            metrics.update(bench_forecaster(size, args.repeats))
+        results[str(size)] = metrics
+    
+    names = [name for name in METRICS if any(name in m for m in results.values())]
+    header = f"{'metric':<28}" + "".join(f"{size:>12}" for size in results)
+    print(header)
+    print("-" * len(header))
+    for name in names:
+        print(f"{name:<28}" + "".join(
+            f"{results[size][name]:>12.2f}" if name in results[size] else f"{'-':>12}" for size in results
+        ))
+    
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "environment": environment(),
+        "config": {"repeats": args.repeats, "batch_size": args.batch_size},
+        "results": results
+    }
+    
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("environment") != report["environment"]:
+            print("\n[WARNING] Baseline was recorded in a different environment", file=sys.stderr)
+        regressions = compare(results, baseline.get("results", {}), args.threshold)
+        report["baseline"] = args.baseline
+        report["regressions"] = regressions
+        
+        print(f"\nRegressions vs {args.baseline} (> {args.threshold:.0%} worse): {len(regressions)}")
+        for r in regressions:
+            print(f"  [REGRESSION] {r['metric']} @ {r['size']}: {r['baseline']:.2f} -> {r['current']:.2f} "
+                  f"({r['change']:+.0%})")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
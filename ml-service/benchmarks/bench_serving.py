@@ -0,0 +1,177 @@
+"""
+Benchmark preforked serving (gunicorn + uvicorn workers)
+Trains categorizers for synthetic users, then starts gunicorn with 1, 2, 4...
+workers and reports requests/sec per core and RSS/PSS per worker. PSS splits
+copy-on-write pages shared with the master between the processes sharing them,
+so it shows how much of the preloaded model memory the workers actually share.
+
+Linux only (gunicorn, /proc).
+Usage: python -m benchmarks.bench_serving [--workers 1 2 4] [--duration 10] [--output serving.json]
+"""
+import argparse
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+from pathlib import Path
+
+# Keep benchmark models out of the real model directory
+os.environ.setdefault("MODEL_PATH", tempfile.mkdtemp(prefix="bench_models_"))
+
+import requests
+
+from benchmarks.synthetic import generate_transactions
+from services.transaction_categorizer import TransactionCategorizer
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+
+
+def seed_models(users: int, size: int) -> list:
+    """Train one categorizer per synthetic user; returns the user ids"""
+    user_ids = []
+    for i in range(users):
+        user_id = f"bench_serving_{i}"
+        TransactionCategorizer(user_id).train(generate_transactions(size, seed=i))
+        user_ids.append(user_id)
+    return user_ids
+
+
+def memory_kb(pid: int) -> dict:
+    """Resident and proportional set size of a process, in KB"""
+    result = {"rss_kb": 0, "pss_kb": 0}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                result["rss_kb"] = int(line.split()[1])
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    result["pss_kb"] = int(line.split()[1])
+    except OSError:
+        pass
+    return result
+
+
+def child_pids(pid: int) -> list:
+    """Direct children of a process (the gunicorn workers)"""
+    children = []
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+        except OSError:
+            continue
+        # The command name may contain spaces, so split after its closing paren
+        if int(stat.rsplit(")", 1)[1].split()[1]) == pid:
+            children.append(int(entry.name))
+    return children
+
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    env = dict(os.environ, SERVE_WORKERS=str(workers), PORT=str(port), HOST="127.0.0.1",
+               SERVE_MAX_REQUESTS="0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "main:app"],
+        cwd=SERVICE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).ok and \
+                    len(child_pids(server.pid)) >= workers:
+                return server
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    server.kill()
+    raise RuntimeError(f"gunicorn with {workers} workers did not become healthy")
+
+
+def client_loop(args) -> tuple:
+    """One load-generating client: (requests completed, errors)"""
+    port, user_ids, duration, seed = args
+    rng = random.Random(seed)
+    transactions = generate_transactions(200, seed=seed)
+    session = requests.Session()
+    done = errors = 0
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        txn = rng.choice(transactions)
+        response = session.post(f"http://127.0.0.1:{port}/categorize/predict", json={
+            "user_id": rng.choice(user_ids),
+            "transaction": {"description": txn["description"], "amount": txn["amount"], "date": txn["date"]}
+        })
+        done += 1
+        errors += not response.ok
+    return done, errors
+
+
+def bench_workers(workers: int, user_ids: list, port: int, clients: int, duration: float) -> dict:
+    server = start_server(workers, port)
+    try:
+        master = memory_kb(server.pid)
+        with Pool(clients) as pool:
+            # Warm every worker's cache before measuring
+            pool.map(client_loop, [(port, user_ids, 1, seed) for seed in range(clients)])
+            start = time.perf_counter()
+            results = pool.map(client_loop, [(port, user_ids, duration, seed) for seed in range(clients)])
+            elapsed = time.perf_counter() - start
+        worker_memory = [memory_kb(pid) for pid in child_pids(server.pid)]
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+    completed = sum(done for done, _ in results)
+    cores = min(workers, os.cpu_count() or 1)
+    return {
+        "workers": workers,
+        "requests": completed,
+        "errors": sum(errors for _, errors in results),
+        "req_per_s": completed / elapsed,
+        "req_per_s_per_core": completed / elapsed / cores,
+        "master_rss_kb": master["rss_kb"],
+        "worker_rss_kb": sum(m["rss_kb"] for m in worker_memory) / max(1, len(worker_memory)),
+        "worker_pss_kb": sum(m["pss_kb"] for m in worker_memory) / max(1, len(worker_memory)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark preforked multi-worker serving')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--transactions', type=int, default=500)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    print(f"Training {args.users} users with {args.transactions} transactions...")
+    user_ids = seed_models(args.users, args.transactions)
+
+    header = f"{'workers':>8}{'req/s':>9}{'req/s/core':>12}{'errors':>8}{'RSS MB':>9}{'PSS MB':>9}"
+    print(f"cpus: {os.cpu_count()}, clients: {args.clients}, duration: {args.duration}s")
+    print(header)
+    print("-" * len(header))
+    results = []
+    for workers in args.workers:
+        r = bench_workers(workers, user_ids, args.port, args.clients, args.duration)
+        results.append(r)
+        print(f"{r['workers']:>8}{r['req_per_s']:>9.1f}{r['req_per_s_per_core']:>12.1f}{r['errors']:>8}"
+              f"{r['worker_rss_kb'] / 1024:>9.1f}{r['worker_pss_kb'] / 1024:>9.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"cpus": os.cpu_count(), "clients": args.clients, "duration_s": args.duration,
+                       "users": args.users, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Benchmark consistent-hash user sharding across several local instances
+Trains categorizers for synthetic users into a shared temporary MODEL_PATH,
+then starts ``--nodes`` uvicorn processes (SERVICE_ROLE=categorize, cold
+caches of ``--cache-size`` models) twice: once as independent replicas and
+once sharded with SHARD_NODES. A round-robin client, standing in for a load
+balancer, sends the same skewed stream of /categorize/predict requests to
+both. Reports per node RSS, cached models and model cache hit rate, plus the
+share of users that move to a node added to the ring.
+
+Usage: python -m benchmarks.bench_sharding [--nodes 3] [--users 60] [--cache-size 25] [--requests 3000]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Keep benchmark models out of the real model directory
+os.environ.setdefault("MODEL_PATH", tempfile.mkdtemp(prefix="bench_models_"))
+
+import numpy as np
+import requests
+
+from benchmarks.synthetic import generate_transactions
+from services.sharding import HashRing
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+
+
+def train_users(users: int, transactions: int) -> list:
+    from services.transaction_categorizer import TransactionCategorizer
+    user_ids = [f"bench_shard_{i}" for i in range(users)]
+    for seed, user_id in enumerate(user_ids):
+        TransactionCategorizer(user_id).train(generate_transactions(transactions, seed=seed))
+    return user_ids
+
+
+def start_nodes(ports: list, cache_size: int, sharded: bool) -> list:
+    urls = [f"http://127.0.0.1:{port}" for port in ports]
+    history_dir = tempfile.mkdtemp(prefix="bench_history_")
+    nodes = []
+    for port, url in zip(ports, urls):
+        env = dict(
+            os.environ, SERVICE_ROLE="categorize", MODEL_CACHE_SIZE=str(cache_size), PRELOAD_MODELS="false",
+            ACCESS_HISTORY_FILE=os.path.join(history_dir, f"{port}.json"), CATEGORIZER_N_JOBS="1",
+            SHARD_NODES=",".join(urls) if sharded else "", SHARD_SELF=url if sharded else ""
+        )
+        nodes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+             "--log-level", "warning"],
+            cwd=SERVICE_DIR, env=env
+        ))
+    deadline = time.time() + 120
+    for url in urls:
+        while True:
+            try:
+                if requests.get(f"{url}/ready", timeout=1).ok:
+                    break
+            except requests.RequestException:
+                pass
+            if time.time() > deadline:
+                raise RuntimeError(f"{url} did not become ready")
+            time.sleep(0.5)
+    return nodes
+
+
+def scrape(url: str) -> dict:
+    """Model cache and shard counters from a node's /metrics"""
+    values = {}
+    for line in requests.get(f"{url}/metrics", timeout=10).text.splitlines():
+        for prefix in ('ml_model_cache{stat="', 'ml_shard_requests_total{outcome="'):
+            if line.startswith(prefix):
+                name, value = line[len(prefix):].split('"} ')
+                values[name] = float(value)
+    return values
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith('VmRSS:')) / 1024
+
+
+def drive(urls: list, stream: list, concurrency: int) -> dict:
+    """Send ``(user_id, transaction)`` requests round-robin over ``urls``"""
+    sessions = threading.local()
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    
+    def send(index):
+        nonlocal errors
+        if not hasattr(sessions, "session"):
+            sessions.session = requests.Session()
+        user_id, txn = stream[index]
+        start = time.perf_counter()
+        try:
+            ok = sessions.session.post(f"{urls[index % len(urls)]}/categorize/predict", json={
+                "user_id": user_id,
+                "transaction": {"description": txn["description"], "amount": txn["amount"], "date": txn["date"]}
+            }, timeout=120).ok
+        except requests.RequestException:
+            ok = False
+        with lock:
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(send, range(len(stream))))
+    elapsed = time.perf_counter() - start
+    values = np.array(latencies) * 1000
+    return {
+        "throughput": len(stream) / elapsed,
+        "errors": errors,
+        "p50_ms": float(np.percentile(values, 50)),
+        "p99_ms": float(np.percentile(values, 99))
+    }
+
+
+def run(ports: list, cache_size: int, sharded: bool, stream: list, concurrency: int) -> dict:
+    urls = [f"http://127.0.0.1:{port}" for port in ports]
+    nodes = start_nodes(ports, cache_size, sharded)
+    try:
+        traffic = drive(urls, stream, concurrency)
+        per_node = []
+        for url, node in zip(urls, nodes):
+            stats = scrape(url)
+            lookups = stats.get('hits', 0) + stats.get('misses', 0)
+            per_node.append({
+                "url": url,
+                "rss_mb": rss_mb(node.pid),
+                "cached_models": int(stats.get('size', 0)),
+                "hit_rate": stats.get('hits', 0) / lookups if lookups else None,
+                "lookups": int(lookups),
+                "forwarded": int(stats.get('forwarded', 0))
+            })
+    finally:
+        for node in nodes:
+            node.terminate()
+        for node in nodes:
+            node.wait(timeout=60)
+    total_hits = sum(n['hit_rate'] * n['lookups'] for n in per_node if n['lookups'])
+    total_lookups = sum(n['lookups'] for n in per_node)
+    return {**traffic, "hit_rate": total_hits / total_lookups if total_lookups else None, "nodes": per_node}
+
+
+def rebalance(nodes: int, user_ids: list, virtual_nodes: int) -> dict:
+    """Share of users moved, and owner balance, when a node is added to the ring"""
+    before = HashRing([f"node-{i}" for i in range(nodes)], virtual_nodes)
+    after = HashRing([f"node-{i}" for i in range(nodes + 1)], virtual_nodes)
+    moved = sum(before.owner(u) != after.owner(u) for u in user_ids)
+    counts = np.unique([after.owner(u) for u in user_ids], return_counts=True)[1]
+    return {
+        "moved_fraction": moved / len(user_ids),
+        "ideal_fraction": 1 / (nodes + 1),
+        "max_over_mean_load": float(counts.max() / counts.mean())
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark consistent-hash sharding across local instances')
+    parser.add_argument('--nodes', type=int, default=3)
+    parser.add_argument('--users', type=int, default=60)
+    parser.add_argument('--transactions', type=int, default=1000, help='Transactions per synthetic user')
+    parser.add_argument('--cache-size', type=int, default=25, help='MODEL_CACHE_SIZE per node')
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--zipf', type=float, default=0.8, help='Skew of user popularity (0 = uniform)')
+    parser.add_argument('--port', type=int, default=8870)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+    
+    print(f"Training {args.users} synthetic users...")
+    user_ids = train_users(args.users, args.transactions)
+    
+    rng = random.Random(0)
+    weights = [1 / (rank + 1) ** args.zipf for rank in range(len(user_ids))]
+    history = {user_id: generate_transactions(50, seed=1000 + i) for i, user_id in enumerate(user_ids)}
+    stream = [(u, rng.choice(history[u])) for u in rng.choices(user_ids, weights, k=args.requests)]
+    
+    ports = [args.port + i for i in range(args.nodes)]
+    report = {
+        "replicated": run(ports, args.cache_size, False, stream, args.concurrency),
+        "sharded": run(ports, args.cache_size, True, stream, args.concurrency),
+        "rebalance": rebalance(args.nodes, [f"user-{i}" for i in range(100000)], 160)
+    }
+    
+    for mode in ('replicated', 'sharded'):
+        r = report[mode]
+        print(f"\n{mode}: hit rate {r['hit_rate']:.1%}, {r['throughput']:.0f} req/s, "
+              f"p50 {r['p50_ms']:.1f} ms, p99 {r['p99_ms']:.1f} ms, {r['errors']} errors")
+        header = f"{'node':<24}{'RSS MB':>8}{'models':>8}{'hit rate':>10}{'lookups':>9}{'forwarded':>11}"
+        print(header)
+        print("-" * len(header))
+        for n in r['nodes']:
+            hit_rate = f"{n['hit_rate']:.1%}" if n['hit_rate'] is not None else "-"
+            print(f"{n['url']:<24}{n['rss_mb']:>8.1f}{n['cached_models']:>8}{hit_rate:>10}"
+                  f"{n['lookups']:>9}{n['forwarded']:>11}")
+    b = report['rebalance']
+    print(f"\nAdding node {args.nodes + 1}: {b['moved_fraction']:.1%} of users move "
+          f"(ideal {b['ideal_fraction']:.1%}), busiest node {b['max_over_mean_load']:.2f}x the mean")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
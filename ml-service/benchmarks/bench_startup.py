@@ -0,0 +1,86 @@
+"""
+Benchmark service cold start per SERVICE_ROLE
+Starts a fresh interpreter per run and measures what a gunicorn master does
+before forking: ``import main`` (routes, config, shared libraries) and
+``preload_models()`` (the role's engines, plus any saved models), then the
+process RSS. Runs against an empty temporary MODEL_PATH, so the numbers are
+the import cost of each role rather than model loading.
+
+Usage: python -m benchmarks.bench_startup [--roles categorize forecast all] [--repeats 5] [--output startup.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.preload_models()
+ready = time.perf_counter()
+with open('/proc/self/status') as f:
+    rss_kb = next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+print(json.dumps({
+    "import_s": imported - start,
+    "preload_s": ready - imported,
+    "ready_s": ready - start,
+    "rss_kb": rss_kb,
+    "sklearn": 'sklearn' in sys.modules,
+    "prophet": 'prophet' in sys.modules
+}))
+"""
+
+
+def probe(role: str, model_path: str) -> dict:
+    env = {**os.environ, "SERVICE_ROLE": role, "MODEL_PATH": model_path}
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=SERVICE_DIR, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def bench_role(role: str, repeats: int, model_path: str) -> dict:
+    # One untimed run so every role starts from the same warm OS file cache
+    probe(role, model_path)
+    runs = [probe(role, model_path) for _ in range(repeats)]
+    report = {
+        key: statistics.median(run[key] for run in runs)
+        for key in ('import_s', 'preload_s', 'ready_s', 'rss_kb')
+    }
+    report["imports"] = [name for name in ('sklearn', 'prophet') if runs[-1][name]]
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark cold start and RSS per SERVICE_ROLE')
+    parser.add_argument('--roles', nargs='+', default=['categorize', 'forecast', 'all'])
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+    
+    model_path = tempfile.mkdtemp(prefix="bench_models_")
+    report = {role: bench_role(role, args.repeats, model_path) for role in args.roles}
+    
+    header = f"{'role':<12}{'import s':>10}{'preload s':>11}{'ready s':>9}{'RSS MB':>9}  engines"
+    print(header)
+    print("-" * len(header))
+    for role, r in report.items():
+        print(f"{role:<12}{r['import_s']:>10.2f}{r['preload_s']:>11.2f}{r['ready_s']:>9.2f}"
+              f"{r['rss_kb'] / 1024:>9.1f}  {', '.join(r['imports']) or '-'}")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
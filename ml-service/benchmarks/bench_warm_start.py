@@ -0,0 +1,111 @@
+"""
+Benchmark warm-started Prophet refits
+Simulates the weekly continuous_learning retrain: each synthetic user's
+forecaster is first trained on their history up to a week ago, then refit on
+the full history twice, once from Prophet's default initialization (cold) and
+once from the previous week's parameters (warm). Reports fit time and Stan
+optimizer iterations per category fit, and how far the warm-started forecasts
+end up from the cold ones.
+
+Usage: python -m benchmarks.bench_warm_start [--users 5] [--sizes 1000 3000] [--days 400] [--output warm.json]
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+# Keep benchmark models out of the real model directory
+os.environ.setdefault("MODEL_PATH", tempfile.mkdtemp(prefix="bench_models_"))
+
+import numpy as np
+
+from benchmarks.synthetic import generate_transactions
+from services.expense_forecaster import ExpenseForecaster
+
+END_DATE = datetime(2024, 12, 31, 23, 0, 0)
+
+
+def retrain(user_id: str, history: list, transactions: list, periods: int) -> dict:
+    """Cold and warm refits of one user's forecaster after a week of new data"""
+    ExpenseForecaster(user_id).train(history)
+    
+    # Both start from the same saved version; the cold one forgets its models
+    warm = ExpenseForecaster(user_id)
+    cold = ExpenseForecaster(user_id)
+    cold.models = {}
+    results = {"cold": cold.train(transactions), "warm": warm.train(transactions)}
+    
+    # Warm and cold fits should converge to the same optimum
+    difference = 0.0
+    for category in set(cold.models) & set(warm.models):
+        cold_yhat = cold.forecast_category(category, periods, columnar=True)['daily_forecast']['predicted_amount']
+        warm_yhat = warm.forecast_category(category, periods, columnar=True)['daily_forecast']['predicted_amount']
+        scale = max(np.abs(cold_yhat).max(), 1e-9)
+        difference = max(difference, float(np.abs(np.subtract(warm_yhat, cold_yhat)).max() / scale))
+    
+    return {
+        "cold": results['cold']['fit_summary']['cold'],
+        "warm": results['warm']['fit_summary']['warm'],
+        "max_forecast_difference": difference
+    }
+
+
+def bench_size(size: int, users: int, days: int, periods: int) -> dict:
+    totals = {mode: {"fits": 0, "fit_seconds": 0.0, "optimizer_iterations": 0} for mode in ('cold', 'warm')}
+    difference = 0.0
+    cutoff = (END_DATE - timedelta(days=7)).isoformat()
+    for user in range(users):
+        transactions = generate_transactions(size, days=days, seed=size + user, end_date=END_DATE)
+        history = [t for t in transactions if t['date'] < cutoff]
+        result = retrain(f"bench_warm_{size}_{user}", history, transactions, periods)
+        for mode in totals:
+            for key in totals[mode]:
+                totals[mode][key] += result[mode][key]
+        difference = max(difference, result['max_forecast_difference'])
+    
+    report = {"users": users, "max_forecast_difference": difference}
+    for mode, total in totals.items():
+        fits = max(total['fits'], 1)
+        report[mode] = {
+            "fits": total['fits'],
+            "fit_ms_per_fit": total['fit_seconds'] / fits * 1000,
+            "iterations_per_fit": total['optimizer_iterations'] / fits
+        }
+    report["speedup"] = report['cold']['fit_ms_per_fit'] / max(report['warm']['fit_ms_per_fit'], 1e-9)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark warm-started Prophet refits')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 3000],
+                        help='Transactions per synthetic user')
+    parser.add_argument('--users', type=int, default=5, help='Synthetic users per size')
+    parser.add_argument('--days', type=int, default=400, help='Days of history per user')
+    parser.add_argument('--periods', type=int, default=30, help='Forecast horizon for the comparison')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+    
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+    logging.getLogger("prophet").setLevel(logging.ERROR)
+    
+    report = {str(size): bench_size(size, args.users, args.days, args.periods) for size in args.sizes}
+    
+    header = (f"{'size':>7}{'fits':>6}{'cold ms':>10}{'warm ms':>10}{'speedup':>9}"
+              f"{'cold iter':>11}{'warm iter':>11}{'max diff':>10}")
+    print(header)
+    print("-" * len(header))
+    for size, r in report.items():
+        print(f"{size:>7}{r['warm']['fits']:>6}{r['cold']['fit_ms_per_fit']:>10.1f}{r['warm']['fit_ms_per_fit']:>10.1f}"
+              f"{r['speedup']:>8.2f}x{r['cold']['iterations_per_fit']:>11.0f}{r['warm']['iterations_per_fit']:>11.0f}"
+              f"{r['max_forecast_difference']:>9.2%}")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
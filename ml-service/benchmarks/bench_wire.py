@@ -0,0 +1,187 @@
+"""
+Benchmark the batch endpoint wire formats
+Compares payload size and encode/decode time of /categorize/predict-batch and
+/forecast/predict bodies at several sizes:
+
+- json_stdlib: the previous path (json + Pydantic models + jsonable_encoder)
+- json: row-oriented JSON via Pydantic's JSON parser and orjson
+- msgpack / arrow: the columnar encodings in services/wire.py
+
+Request encode and response decode are the client's side; request decode and
+response encode are the service's.
+
+Usage: python -m benchmarks.bench_wire [--sizes 100 1000 10000] [--skip-forecaster] [--output wire.json]
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+# Keep benchmark models out of the real model directory
+os.environ.setdefault("MODEL_PATH", tempfile.mkdtemp(prefix="bench_models_"))
+
+import msgpack
+import orjson
+import pandas as pd
+import pyarrow as pa
+from fastapi.encoders import jsonable_encoder
+
+from benchmarks.synthetic import generate_transactions
+from main import PredictBatchRequest
+from services import wire
+from services.transaction_categorizer import TransactionCategorizer
+from services.expense_forecaster import ExpenseForecaster
+
+STEPS = ('request_encode', 'request_decode', 'response_encode', 'response_decode')
+
+
+def median_ms(fn, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def stdlib_dumps(content) -> bytes:
+    """What JSONResponse renders after FastAPI's jsonable_encoder"""
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def arrow_bytes(table) -> bytes:
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def measure(encode_request, decode_request, encode_response, decode_response, repeats: int) -> dict:
+    request_body = encode_request()
+    response_body = encode_response()
+    return {
+        "request_bytes": len(request_body),
+        "response_bytes": len(response_body),
+        "request_encode_ms": median_ms(encode_request, repeats),
+        "request_decode_ms": median_ms(lambda: decode_request(request_body), repeats),
+        "response_encode_ms": median_ms(encode_response, repeats),
+        "response_decode_ms": median_ms(lambda: decode_response(response_body), repeats),
+    }
+
+
+def bench_batch(categorizer: TransactionCategorizer, size: int, repeats: int) -> dict:
+    transactions = generate_transactions(size, seed=size + 1)
+    rows = [{k: t[k] for k in ('description', 'amount', 'date')} for t in transactions]
+    columns = {k: [row[k] for row in rows] for k in ('description', 'amount', 'date')}
+    request = {"user_id": categorizer.user_id, "transactions": rows}
+    columnar_request = {"user_id": categorizer.user_id, "transactions": columns}
+    arrow_request = pa.table(columns).replace_schema_metadata({b'user_id': categorizer.user_id.encode()})
+    
+    predictions = categorizer.predict_columns(pd.DataFrame(columns))
+    response = {"success": True, "data": categorizer.predict_batch(rows)}
+    
+    def decode_stdlib(body):
+        parsed = PredictBatchRequest.model_validate(json.loads(body))
+        return [t.model_dump() for t in parsed.transactions]
+    
+    def decode_json(body):
+        parsed = PredictBatchRequest.model_validate_json(body)
+        return pd.DataFrame({
+            "description": [t.description for t in parsed.transactions],
+            "amount": [t.amount for t in parsed.transactions],
+            "date": [t.date for t in parsed.transactions]
+        })
+    
+    cases = {
+        'json_stdlib': (
+            lambda: json.dumps(request).encode(), decode_stdlib,
+            lambda: stdlib_dumps(response), json.loads
+        ),
+        'json': (
+            lambda: orjson.dumps(request), decode_json,
+            lambda: wire.FastJSONResponse(response).body, orjson.loads
+        ),
+        'msgpack': (
+            lambda: msgpack.packb(columnar_request),
+            lambda body: wire.decode_batch_request(body, wire.MSGPACK),
+            lambda: wire.encode_predictions(predictions, wire.MSGPACK), msgpack.unpackb
+        ),
+        'arrow': (
+            lambda: arrow_bytes(arrow_request),
+            lambda body: wire.decode_batch_request(body, wire.ARROW),
+            lambda: wire.encode_predictions(predictions, wire.ARROW),
+            lambda body: pa.ipc.open_stream(body).read_all()
+        ),
+    }
+    return {fmt: measure(*case, repeats) for fmt, case in cases.items()}
+
+
+def bench_forecast(forecaster: ExpenseForecaster, periods: int, repeats: int) -> dict:
+    rows = forecaster.forecast_all(periods)
+    columnar = forecaster.forecast_all(periods, columnar=True)
+    request = {"user_id": forecaster.user_id, "periods": periods}
+    response = {"success": True, "data": rows}
+    
+    cases = {
+        'json_stdlib': (lambda: json.dumps(request).encode(), json.loads, lambda: stdlib_dumps(response), json.loads),
+        'json': (lambda: orjson.dumps(request), orjson.loads,
+                 lambda: wire.FastJSONResponse(response).body, orjson.loads),
+        'msgpack': (lambda: msgpack.packb(request), msgpack.unpackb,
+                    lambda: wire.encode_forecast(columnar, wire.MSGPACK), msgpack.unpackb),
+        'arrow': (lambda: orjson.dumps(request), orjson.loads,
+                  lambda: wire.encode_forecast(columnar, wire.ARROW),
+                  lambda body: pa.ipc.open_stream(body).read_all()),
+    }
+    return {fmt: measure(*case, repeats) for fmt, case in cases.items()}
+
+
+def print_table(title: str, results: dict):
+    print(f"\n{title}")
+    header = f"{'size':>7} {'format':<12}{'req KB':>9}{'resp KB':>9}" + "".join(f"{s + ' ms':>20}" for s in STEPS)
+    print(header)
+    print("-" * len(header))
+    for size, formats in results.items():
+        for fmt, r in formats.items():
+            print(f"{size:>7} {fmt:<12}{r['request_bytes'] / 1024:>9.1f}{r['response_bytes'] / 1024:>9.1f}"
+                  + "".join(f"{r[s + '_ms']:>20.3f}" for s in STEPS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark batch endpoint wire formats')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000],
+                        help='Transactions per predict-batch payload')
+    parser.add_argument('--periods', type=int, nargs='+', default=[30, 90, 365],
+                        help='Forecast horizons in days')
+    parser.add_argument('--repeats', type=int, default=7)
+    parser.add_argument('--skip-forecaster', action='store_true', help='Skip Prophet forecasts (slow to train)')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+    
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+    
+    history = generate_transactions(1000, seed=0)
+    categorizer = TransactionCategorizer("bench_wire")
+    categorizer.train(history)
+    report = {"predict_batch": {str(size): bench_batch(categorizer, size, args.repeats) for size in args.sizes}}
+    print_table("/categorize/predict-batch (size = transactions)", report["predict_batch"])
+    
+    if not args.skip_forecaster:
+        forecaster = ExpenseForecaster("bench_wire")
+        forecaster.train(history)
+        report["forecast"] = {
+            str(periods): bench_forecast(forecaster, periods, args.repeats) for periods in args.periods
+        }
+        print_table(f"/forecast/predict, all {len(forecaster.models)} categories (size = days)", report["forecast"])
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+End-to-end HTTP load test for one ML service instance
+Seeds synthetic users into an in-process Mongo stand-in (mongomock), trains
+their models through the real continuous learning cycle, starts main.py under
+uvicorn and drives a weighted mix of train/predict/forecast requests at
+increasing concurrency. Reports latency percentiles, throughput, error rate and
+the concurrency at which throughput stops scaling, as JSON and a table.
+
+Needs the test-only packages mongomock and mongomock-motor.
+Usage: python -m benchmarks.load_test [--concurrency 1 2 4 8 16] [--mix predict=70,predict_batch=15,forecast=10,status=4,train=1]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+# Keep load-test models out of the real model directory
+os.environ.setdefault("MODEL_PATH", tempfile.mkdtemp(prefix="loadtest_models_"))
+
+import numpy as np
+import requests
+from bson import ObjectId
+
+from benchmarks.synthetic import generate_transactions
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_MIX = "predict=70,predict_batch=15,forecast=10,status=4,train=1"
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, weight = part.split("=")
+        weights[name.strip()] = float(weight)
+    unknown = set(weights) - set(OPERATIONS)
+    if unknown:
+        raise ValueError(f"Unknown operations in mix: {', '.join(sorted(unknown))}")
+    return weights
+
+
+def seed_users(users: int, transactions: int) -> dict:
+    """Train models for synthetic users through ContinuousLearningService
+    
+    Returns ``{user_id: transactions}``.
+    """
+    try:
+        import mongomock
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        sys.exit("The load test needs mongomock and mongomock-motor: pip install mongomock mongomock-motor")
+    
+    import data_access
+    sync_db = mongomock.MongoClient()["finance_db"]
+    async_db = AsyncMongoMockClient()["finance_db"]
+    data_access.get_sync_db = lambda: sync_db
+    data_access.get_db = lambda: async_db
+    
+    seeded = {}
+    now = datetime.now()
+    for i in range(users):
+        user_id = ObjectId()
+        history = generate_transactions(transactions, seed=i)
+        docs = [{**t, "userId": str(user_id), "createdAt": now, "updatedAt": now} for t in history]
+        user = {"_id": user_id, "email": f"loadtest{i}@example.com"}
+        sync_db.users.insert_one(dict(user))
+        data_access.run(async_db.users.insert_one(dict(user)))
+        sync_db.transactions.insert_many([dict(d) for d in docs])
+        data_access.run(async_db.transactions.insert_many([dict(d) for d in docs]))
+        seeded[str(user_id)] = history
+    
+    from continuous_learning import ContinuousLearningService
+    ContinuousLearningService().check_and_train_all_users()
+    return seeded
+
+
+def start_server(port: int) -> subprocess.Popen:
+    env = dict(os.environ, PORT=str(port), HOST="127.0.0.1")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=SERVICE_DIR, env=env
+    )
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            # Ready once startup prewarming has finished
+            if requests.get(f"http://127.0.0.1:{port}/ready", timeout=1).ok:
+                return server
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    server.kill()
+    raise RuntimeError("ML service did not become ready")
+
+
+# Request builders: (method, path, json body)
+
+def op_predict(rng, user_id, history, batch_size):
+    txn = rng.choice(history)
+    return "POST", "/categorize/predict", {
+        "user_id": user_id,
+        "transaction": {"description": txn["description"], "amount": txn["amount"], "date": txn["date"]}
+    }
+
+
+def op_predict_batch(rng, user_id, history, batch_size):
+    sample = rng.sample(history, min(batch_size, len(history)))
+    return "POST", "/categorize/predict-batch", {
+        "user_id": user_id,
+        "transactions": [{"description": t["description"], "amount": t["amount"], "date": t["date"]} for t in sample]
+    }
+
+
+def op_forecast(rng, user_id, history, batch_size):
+    return "POST", "/forecast/predict", {"user_id": user_id, "category": rng.choice(history)["category"], "periods": 30}
+
+
+def op_status(rng, user_id, history, batch_size):
+    return "GET", f"/models/status/{user_id}", None
+
+
+def op_train(rng, user_id, history, batch_size):
+    return "POST", "/categorize/train", {"user_id": user_id, "transactions": history}
+
+
+OPERATIONS = {
+    "predict": op_predict,
+    "predict_batch": op_predict_batch,
+    "forecast": op_forecast,
+    "status": op_status,
+    "train": op_train,
+}
+
+
+def run_level(base_url: str, users: dict, mix: dict, concurrency: int, duration: float, batch_size: int) -> dict:
+    """Drive the mix with ``concurrency`` client threads for ``duration`` seconds"""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    user_ids = list(users)
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    
+    def client(seed):
+        rng = random.Random(seed)
+        session = requests.Session()
+        local_latencies = defaultdict(list)
+        local_errors = defaultdict(int)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            user_id = rng.choice(user_ids)
+            method, path, body = OPERATIONS[name](rng, user_id, users[user_id], batch_size)
+            start = time.perf_counter()
+            try:
+                ok = session.request(method, base_url + path, json=body, timeout=300).ok
+            except requests.RequestException:
+                ok = False
+            local_latencies[name].append(time.perf_counter() - start)
+            local_errors[name] += not ok
+        with lock:
+            for name, values in local_latencies.items():
+                latencies[name].extend(values)
+                errors[name] += local_errors[name]
+    
+    threads = [threading.Thread(target=client, args=(seed,)) for seed in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    
+    def summarize(values, error_count):
+        values = np.array(values) * 1000
+        return {
+            "requests": len(values),
+            "throughput": len(values) / elapsed,
+            "error_rate": error_count / len(values) if len(values) else 0.0,
+            "p50_ms": float(np.percentile(values, 50)) if len(values) else None,
+            "p90_ms": float(np.percentile(values, 90)) if len(values) else None,
+            "p99_ms": float(np.percentile(values, 99)) if len(values) else None,
+        }
+    
+    all_latencies = [v for values in latencies.values() for v in values]
+    return {
+        "concurrency": concurrency,
+        "elapsed_s": elapsed,
+        **summarize(all_latencies, sum(errors.values())),
+        "operations": {name: summarize(latencies[name], errors[name]) for name in latencies}
+    }
+
+
+def saturation_point(levels: list, min_gain: float = 0.1):
+    """First concurrency whose throughput gain over the previous level is below ``min_gain``"""
+    for previous, current in zip(levels, levels[1:]):
+        if current["throughput"] < previous["throughput"] * (1 + min_gain):
+            return previous["concurrency"]
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP load test for the ML service')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Weighted operation mix (default: {DEFAULT_MIX})')
+    parser.add_argument('--duration', type=float, default=15, help='Seconds per concurrency level')
+    parser.add_argument('--users', type=int, default=5)
+    parser.add_argument('--transactions', type=int, default=400, help='Transactions per seeded user')
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--url', help='Load an already running service instead (must hold the seeded models)')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+    
+    mix = parse_mix(args.mix)
+    print(f"Seeding {args.users} users x {args.transactions} transactions via continuous learning...")
+    users = seed_users(args.users, args.transactions)
+    
+    server = None if args.url else start_server(args.port)
+    base_url = args.url or f"http://127.0.0.1:{args.port}"
+    try:
+        levels = [
+            run_level(base_url, users, mix, concurrency, args.duration, args.batch_size)
+            for concurrency in args.concurrency
+        ]
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=60)
+    
+    header = f"{'conc':>5}{'req/s':>9}{'errors':>8}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}"
+    print(f"\nmix: {args.mix}")
+    print(header)
+    print("-" * len(header))
+    for level in levels:
+        print(f"{level['concurrency']:>5}{level['throughput']:>9.1f}{level['error_rate']:>8.1%}"
+              f"{level['p50_ms']:>9.1f}{level['p90_ms']:>9.1f}{level['p99_ms']:>9.1f}")
+    saturation = saturation_point(levels)
+    print(f"\nThroughput stops scaling at concurrency: {saturation or 'not reached'}")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                "mix": mix,
+                "users": args.users,
+                "transactions_per_user": args.transactions,
+                "duration_s": args.duration,
+                "cpus": os.cpu_count(),
+                "saturation_concurrency": saturation,
+                "levels": levels
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Synthetic transaction generator for benchmarks"""
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from config import DEFAULT_CATEGORIES
+
+# Merchant strings per category, modelled on real bank/SMS descriptions
+MERCHANTS = {
+    "Food": ["SWIGGY ORDER", "ZOMATO ONLINE", "STARBUCKS COFFEE", "DOMINOS PIZZA", "MCDONALDS",
+             "BIG BAZAAR GROCERY", "DMART SUPERMARKET", "CAFE COFFEE DAY", "KFC RESTAURANT"],
+    "Transportation": ["UBER TRIP", "OLA CABS", "RAPIDO BIKE", "INDIAN OIL PETROL", "HP FUEL STATION",
+                       "METRO CARD RECHARGE", "FASTAG TOLL", "SHELL PETROL PUMP"],
+    "Shopping": ["AMAZON PAY", "FLIPKART ORDER", "MYNTRA FASHION", "AJIO", "RELIANCE DIGITAL",
+                 "DECATHLON SPORTS", "IKEA FURNITURE", "NYKAA BEAUTY"],
+    "Entertainment": ["NETFLIX SUBSCRIPTION", "SPOTIFY PREMIUM", "BOOKMYSHOW TICKETS", "PVR CINEMAS",
+                      "PRIME VIDEO", "STEAM GAMES", "HOTSTAR"],
+    "Bills": ["AIRTEL POSTPAID BILL", "JIO RECHARGE", "ELECTRICITY BOARD BILL", "BESCOM POWER",
+              "TATA SKY DTH", "WATER BILL PAYMENT", "ACT FIBERNET BROADBAND", "GAS BILL"],
+    "Healthcare": ["APOLLO PHARMACY", "PRACTO CONSULTATION", "1MG MEDICINES", "MEDPLUS",
+                   "FORTIS HOSPITAL", "DR LAL PATHLABS"],
+    "Education": ["UDEMY COURSE", "COURSERA", "BYJUS", "SCHOOL FEES", "UNACADEMY", "BOOK DEPOT"],
+    "Travel": ["MAKEMYTRIP FLIGHT", "IRCTC RAIL TICKET", "INDIGO AIRLINES", "OYO ROOMS",
+               "GOIBIBO HOTEL", "AIRBNB STAY"],
+    "Salary": ["SALARY CREDIT ACME CORP", "NEFT SALARY", "PAYROLL CREDIT"],
+    "Investment": ["ZERODHA BROKING", "GROWW MUTUAL FUND", "SIP HDFC AMC", "PPF DEPOSIT", "NPS CONTRIBUTION"],
+    "Other": ["ATM WITHDRAWAL", "UPI TRANSFER", "IMPS P2P", "CHEQUE DEPOSIT", "BANK CHARGES"],
+}
+
+# (mean, spread) of absolute amount per category
+AMOUNTS = {
+    "Food": (450, 300), "Transportation": (300, 250), "Shopping": (2500, 2000),
+    "Entertainment": (500, 300), "Bills": (1200, 800), "Healthcare": (900, 700),
+    "Education": (4000, 3000), "Travel": (6000, 4000), "Salary": (75000, 10000),
+    "Investment": (10000, 5000), "Other": (1500, 1200),
+}
+
+# Relative frequency of each category in a typical history
+WEIGHTS = {
+    "Food": 30, "Transportation": 18, "Shopping": 12, "Entertainment": 8, "Bills": 8,
+    "Healthcare": 4, "Education": 2, "Travel": 3, "Salary": 2, "Investment": 3, "Other": 10,
+}
+
+SUFFIXES = ["", " UPI", " POS", " ONLINE", " *REF{ref}", " TXN{ref}", " BLR", " MUM", " DEL"]
+
+
+def generate_transactions(n: int, days: int = 365, seed: int = 42,
+                          end_date: Optional[datetime] = None) -> List[Dict]:
+    """Generate ``n`` labelled transactions spread over the last ``days`` days"""
+    rng = random.Random(seed)
+    end_date = end_date or datetime(2024, 12, 31, 23, 0, 0)
+    categories = [c for c in DEFAULT_CATEGORIES if c in MERCHANTS]
+    weights = [WEIGHTS[c] for c in categories]
+    
+    transactions = []
+    for _ in range(n):
+        category = rng.choices(categories, weights)[0]
+        merchant = rng.choice(MERCHANTS[category])
+        suffix = rng.choice(SUFFIXES).format(ref=rng.randint(10000, 99999))
+        mean, spread = AMOUNTS[category]
+        amount = round(max(10.0, rng.gauss(mean, spread / 2)), 2)
+        if category != "Salary":
+            amount = -amount
+        when = end_date - timedelta(
+            days=rng.randint(0, days - 1),
+            hours=rng.randint(0, 23),
+            minutes=rng.randint(0, 59)
+        )
+        transactions.append({
+            "description": f"{merchant}{suffix}",
+            "amount": amount,
+            "date": when.replace(second=0, microsecond=0).isoformat(),
+            "category": category
+        })
+    
+    return transactions
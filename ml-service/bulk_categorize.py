@@ -0,0 +1,363 @@
+"""
+Bulk Categorization Script
+Re-categorize historical transactions offline, e.g. after shipping a new
+categorizer. Transactions are read user by user from MongoDB or from a
+Parquet/CSV export, each user's current model is loaded once in a worker
+process, and the predictions are written back to MongoDB with update_many
+(one call per category) or to Parquet/CSV part files. Progress is checkpointed
+after every flush, so an interrupted job resumes where it stopped.
+
+Usage:
+    python bulk_categorize.py                                         # MongoDB -> transactions.mlCategory
+    python bulk_categorize.py --input export.parquet --output-dir out  # export -> part files
+    python bulk_categorize.py --resume                                # continue from the checkpoint
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent))
+
+from config import MODEL_PATH
+from services.model_store import ModelStore
+import data_access
+
+# Accepted names for the user and document id columns of an export
+USER_COLUMNS = ('userId', 'user_id')
+ID_COLUMNS = ('_id', 'id')
+INFERENCE_COLUMNS = ['description', 'amount', 'date']
+
+# Ids per update_many call, to stay well under MongoDB's 16 MB command limit
+MAX_IDS_PER_UPDATE = 10000
+
+
+def categorize_user(user_id: str, transactions: pd.DataFrame, chunk_size: int) -> Dict:
+    """Predict categories for one user's transactions (runs in a worker process)
+    
+    The user's model is loaded once; predictions run ``chunk_size`` rows at a
+    time to bound feature-matrix memory.
+    """
+    # Users without a saved model are skipped without creating a model directory
+    if ModelStore(MODEL_PATH / f"categorizer_{user_id}").resolve(legacy_marker="scaler.pkl")[1] is None:
+        return {"user_id": user_id, "status": "no_model"}
+    
+    from services.transaction_categorizer import TransactionCategorizer
+    categorizer = TransactionCategorizer(user_id)
+    if not categorizer.is_trained():
+        return {"user_id": user_id, "status": "no_model"}
+    # The pool already runs one user per core
+    if hasattr(categorizer.classifier, 'n_jobs'):
+        categorizer.classifier.n_jobs = 1
+    
+    categories = []
+    confidences = []
+    for start in range(0, len(transactions), chunk_size):
+        columns = categorizer.predict_columns(transactions.iloc[start:start + chunk_size], top_k=1)
+        categories.append(columns['category'])
+        confidences.append(columns['confidence'])
+    return {
+        "user_id": user_id,
+        "status": "categorized",
+        "version": categorizer.version,
+        "category": np.concatenate(categories) if categories else np.empty(0, dtype=object),
+        "confidence": np.concatenate(confidences) if confidences else np.empty(0)
+    }
+
+
+def to_object_ids(ids) -> List:
+    """Export ids as MongoDB ``_id`` values (24-hex strings become ObjectIds)"""
+    from bson import ObjectId
+    return [ObjectId(i) if isinstance(i, str) and ObjectId.is_valid(i) else i for i in ids]
+
+
+class Checkpoint:
+    """Users whose results have been written, saved atomically after every flush"""
+    
+    def __init__(self, path: Path, job: Dict, resume: bool):
+        self.path = Path(path)
+        self.job = job
+        self.done: Set[str] = set()
+        self.next_part = 0
+        self.stats = {"categorized_users": 0, "no_model_users": 0, "failed_users": 0,
+                      "transactions": 0, "seconds": 0.0}
+        
+        if resume and self.path.exists():
+            with open(self.path) as f:
+                state = json.load(f)
+            if state['job'] != job:
+                raise ValueError(f"Checkpoint {self.path} belongs to a different job: {state['job']}")
+            self.done = set(state['done'])
+            self.next_part = state['next_part']
+            self.stats.update(state['stats'])
+            # Failed users are retried by this run
+            self.stats['failed_users'] = 0
+    
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f".{self.path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                "job": self.job,
+                "done": sorted(self.done),
+                "next_part": self.next_part,
+                "stats": self.stats,
+                "saved_at": datetime.now().isoformat()
+            }, f)
+        os.replace(tmp_path, self.path)
+
+
+class MongoWriter:
+    """Sets ``field`` to ``{category, modelVersion, categorizedAt}`` with one update_many per category"""
+    
+    def __init__(self, field: str):
+        self.field = field
+    
+    async def write(self, results: List[Dict], part: int):
+        collection = data_access.get_db().transactions
+        categorized_at = datetime.now()
+        for result in results:
+            ids = pd.Series(to_object_ids(result['ids']), dtype=object)
+            for category, group in ids.groupby(result['category'], sort=False):
+                values = group.tolist()
+                update = {'$set': {self.field: {
+                    "category": category,
+                    "modelVersion": result['version'],
+                    "categorizedAt": categorized_at
+                }}}
+                for start in range(0, len(values), MAX_IDS_PER_UPDATE):
+                    await collection.update_many({'_id': {'$in': values[start:start + MAX_IDS_PER_UPDATE]}}, update)
+
+
+class FileWriter:
+    """Writes each flush as ``part-NNNNN.<format>`` in ``output_dir``
+    
+    A part is numbered from the checkpoint, so one left behind by an
+    interrupted run is overwritten when the job resumes.
+    """
+    
+    def __init__(self, output_dir: Path, file_format: str):
+        self.output_dir = Path(output_dir)
+        self.file_format = file_format
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+    
+    async def write(self, results: List[Dict], part: int):
+        frame = pd.concat([
+            pd.DataFrame({
+                "transaction_id": pd.Series(result['ids'], dtype=object).astype(str).values,
+                "user_id": result['user_id'],
+                "category": result['category'],
+                "confidence": result['confidence'],
+                "model_version": result['version']
+            })
+            for result in results
+        ], ignore_index=True)
+        
+        path = self.output_dir / f"part-{part:05d}.{self.file_format}"
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        if self.file_format == 'parquet':
+            frame.to_parquet(tmp_path, index=False)
+        else:
+            frame.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+
+def read_export(path: Path) -> pd.DataFrame:
+    """Load the columns needed for inference from a Parquet or CSV export"""
+    if path.suffix.lower() in ('.parquet', '.pq'):
+        import pyarrow.parquet as pq
+        available = pq.read_schema(path).names
+    else:
+        available = pd.read_csv(path, nrows=0).columns.tolist()
+    
+    user_column = next((c for c in USER_COLUMNS if c in available), None)
+    id_column = next((c for c in ID_COLUMNS if c in available), None)
+    missing = [c for c in INFERENCE_COLUMNS if c not in available]
+    if user_column is None or id_column is None or missing:
+        raise ValueError(f"{path} needs a user column ({'/'.join(USER_COLUMNS)}), an id column "
+                         f"({'/'.join(ID_COLUMNS)}) and {', '.join(INFERENCE_COLUMNS)}")
+    
+    columns = [user_column, id_column] + INFERENCE_COLUMNS
+    if path.suffix.lower() in ('.parquet', '.pq'):
+        frame = pd.read_parquet(path, columns=columns)
+    else:
+        frame = pd.read_csv(path, usecols=columns, dtype={user_column: str, id_column: str, 'description': str})
+    frame = frame.rename(columns={user_column: 'user_id', id_column: 'id'})
+    frame['user_id'] = frame['user_id'].astype(str)
+    frame['description'] = frame['description'].fillna('')
+    frame['amount'] = pd.to_numeric(frame['amount'], errors='coerce').fillna(0.0)
+    frame['date'] = pd.to_datetime(frame['date'], errors='coerce', utc=True).dt.tz_localize(None)
+    return frame
+
+
+async def mongo_users(done: Set[str], users: Optional[Set[str]], depth: int) -> AsyncIterator[Tuple[str, pd.DataFrame]]:
+    """``(user_id, transactions)`` from MongoDB, fetching ahead of the workers"""
+    stored = await data_access.list_transaction_users()
+    pending = sorted((u for u in stored if str(u) not in done and (users is None or str(u) in users)), key=str)
+    async for user_id, transactions in data_access.prefetch_users(
+            pending, depth, fetch=data_access.fetch_inference_transactions):
+        yield str(user_id), transactions
+
+
+async def file_users(path: Path, done: Set[str], users: Optional[Set[str]]) -> AsyncIterator[Tuple[str, pd.DataFrame]]:
+    """``(user_id, transactions)`` from an export, grouped by user"""
+    frame = read_export(path)
+    for user_id, transactions in frame.groupby('user_id', sort=True):
+        if user_id in done or (users is not None and user_id not in users):
+            continue
+        yield user_id, transactions.drop(columns='user_id').reset_index(drop=True)
+
+
+async def run_job(source: AsyncIterator[Tuple[str, pd.DataFrame]], writer, checkpoint: Checkpoint,
+                  workers: int, chunk_size: int, flush_rows: int):
+    """Categorize every user from ``source`` on a process pool, flushing every ``flush_rows`` results"""
+    loop = asyncio.get_running_loop()
+    stats = checkpoint.stats
+    started = time.perf_counter() - stats['seconds']
+    ids: Dict[str, pd.Series] = {}
+    in_flight: Dict[asyncio.Future, str] = {}
+    buffer: List[Dict] = []
+    finished: List[str] = []
+    buffered_rows = 0
+    
+    def collect(tasks):
+        nonlocal buffered_rows
+        for task in tasks:
+            try:
+                result = task.result()
+            except Exception as e:
+                # Not marked done, so a resumed run retries the user
+                user_id = in_flight.pop(task)
+                ids.pop(user_id, None)
+                stats['failed_users'] += 1
+                print(f"   [ERROR] User {user_id}: {e}")
+                continue
+            user_id = in_flight.pop(task)
+            user_ids = ids.pop(user_id)
+            finished.append(user_id)
+            if result['status'] != 'categorized':
+                stats['no_model_users'] += 1
+                continue
+            result['ids'] = user_ids.to_numpy(dtype=object)
+            buffer.append(result)
+            buffered_rows += len(user_ids)
+            stats['categorized_users'] += 1
+            stats['transactions'] += len(user_ids)
+    
+    async def flush():
+        nonlocal buffer, buffered_rows
+        if buffer:
+            await writer.write(buffer, checkpoint.next_part)
+            checkpoint.next_part += 1
+        checkpoint.done.update(finished)
+        finished.clear()
+        buffer, buffered_rows = [], 0
+        stats['seconds'] = time.perf_counter() - started
+        checkpoint.save()
+        print(f"   {len(checkpoint.done)} users done, {stats['transactions']} transactions categorized "
+              f"({stats['transactions'] / max(stats['seconds'], 1e-9):.0f}/s)")
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        async for user_id, transactions in source:
+            if len(transactions) == 0:
+                finished.append(user_id)
+                continue
+            # Document ids stay here; workers only see the inference columns
+            ids[user_id] = transactions['id']
+            task = loop.run_in_executor(pool, categorize_user, user_id, transactions[INFERENCE_COLUMNS], chunk_size)
+            in_flight[task] = user_id
+            
+            # Keep a couple of users queued per worker without reading the whole source ahead
+            if len(in_flight) >= workers * 2:
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                collect(done)
+            if buffered_rows >= flush_rows:
+                await flush()
+        
+        if in_flight:
+            done, _ = await asyncio.wait(in_flight)
+            collect(done)
+    await flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-categorize historical transactions with the current models')
+    parser.add_argument('--input', type=Path,
+                        help='Parquet or CSV export to read instead of MongoDB '
+                             f"(columns: {'/'.join(USER_COLUMNS)}, {'/'.join(ID_COLUMNS)}, "
+                             f"{', '.join(INFERENCE_COLUMNS)})")
+    parser.add_argument('--output-dir', type=Path,
+                        help='Write part files here instead of updating MongoDB')
+    parser.add_argument('--format', choices=['parquet', 'csv'], default='parquet',
+                        help='Part file format with --output-dir (default: parquet)')
+    parser.add_argument('--field', default='mlCategory',
+                        help='Transaction field updated in MongoDB (default: mlCategory)')
+    parser.add_argument('--users', nargs='+', help='Only these user IDs')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Inference processes (default: CPU count)')
+    parser.add_argument('--chunk-size', type=int, default=50000,
+                        help='Rows per predict call within a user (default: 50000)')
+    parser.add_argument('--flush-rows', type=int, default=100000,
+                        help='Write results and checkpoint every N transactions (default: 100000)')
+    parser.add_argument('--prefetch', type=int, default=4,
+                        help='Users fetched from MongoDB ahead of the workers (default: 4)')
+    parser.add_argument('--checkpoint', type=Path, default=MODEL_PATH / 'bulk_categorize.checkpoint.json',
+                        help='Progress file (default: MODEL_PATH/bulk_categorize.checkpoint.json)')
+    parser.add_argument('--resume', action='store_true', help='Skip users completed by a previous run')
+    args = parser.parse_args()
+    
+    job = {
+        "input": str(args.input) if args.input else "mongodb",
+        "output": str(args.output_dir) if args.output_dir else f"mongodb:{args.field}",
+        "format": args.format if args.output_dir else None
+    }
+    
+    print("\n" + "="*60)
+    print("BULK TRANSACTION CATEGORIZATION")
+    print("="*60)
+    print(f"Source: {job['input']}  ->  Output: {job['output']}")
+    
+    try:
+        checkpoint = Checkpoint(args.checkpoint, job, args.resume)
+        if checkpoint.done:
+            print(f"Resuming: {len(checkpoint.done)} users already done")
+        
+        users = set(args.users) if args.users else None
+        if args.input:
+            source = file_users(args.input, checkpoint.done, users)
+        else:
+            source = mongo_users(checkpoint.done, users, args.prefetch)
+        writer = FileWriter(args.output_dir, args.format) if args.output_dir else MongoWriter(args.field)
+        
+        data_access.run(run_job(source, writer, checkpoint, args.workers, args.chunk_size, args.flush_rows))
+        
+        stats = checkpoint.stats
+        print("\n" + "="*60)
+        print("CATEGORIZATION SUMMARY")
+        print("="*60)
+        print(f"[SUCCESS] Categorized: {stats['categorized_users']} users, {stats['transactions']} transactions")
+        print(f"[WARNING] No trained model: {stats['no_model_users']} users")
+        print(f"[ERROR] Failed: {stats['failed_users']} users (retried with --resume)")
+        print(f"Time: {stats['seconds']:.1f}s ({stats['transactions'] / max(stats['seconds'], 1e-9):.0f} transactions/s)")
+        print("="*60 + "\n")
+    except KeyboardInterrupt:
+        print("\n\nInterrupted; run again with --resume to continue")
+    except Exception as e:
+        print(f"\nError: {e}")
+    finally:
+        data_access.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -9,18 +9,78 @@ load_dotenv()
 PORT = int(os.getenv("PORT", "8000"))
 HOST = os.getenv("HOST", "0.0.0.0")
 
+# Production Serving (gunicorn, see gunicorn.conf.py)
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", str(os.cpu_count() or 1)))
+SERVE_MAX_REQUESTS = int(os.getenv("SERVE_MAX_REQUESTS", "5000"))  # recycle workers after this many requests
+SERVE_MAX_REQUESTS_JITTER = int(os.getenv("SERVE_MAX_REQUESTS_JITTER", "500"))
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "true").lower() == "true"
+PRELOAD_MEMORY_MB = float(os.getenv("PRELOAD_MEMORY_MB", "1024"))  # on-disk size of models loaded at startup
+SERVICE_ROLE = os.getenv("SERVICE_ROLE", "all").lower()  # categorize | forecast | all
+
+# User Sharding (consistent hashing across instances; disabled when SHARD_NODES is empty)
+SHARD_NODES = [node.strip().rstrip("/") for node in os.getenv("SHARD_NODES", "").split(",") if node.strip()]
+SHARD_SELF = os.getenv("SHARD_SELF", "").strip().rstrip("/")  # this instance's URL as listed in SHARD_NODES
+SHARD_VIRTUAL_NODES = int(os.getenv("SHARD_VIRTUAL_NODES", "160"))
+SHARD_MODE = os.getenv("SHARD_MODE", "forward").lower()  # forward | redirect
+SHARD_FORWARD_TIMEOUT = float(os.getenv("SHARD_FORWARD_TIMEOUT", "600"))
+
 # Database Configuration
 DATABASE_URL = os.getenv("DATABASE_URL", "mongodb://localhost:27017/finance_db")
+MONGODB_URI = os.getenv("MONGODB_URI") or DATABASE_URL
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "20"))
+MONGO_BATCH_SIZE = int(os.getenv("MONGO_BATCH_SIZE", "1000"))
 
 # Model Configuration
 BASE_DIR = Path(__file__).parent
-MODEL_PATH = Path(os.getenv("MODEL_PATH", BASE_DIR / "models"))
-MODEL_PATH.mkdir(exist_ok=True)
+MODEL_PATH = Path(os.getenv("MODEL_PATH", BASE_DIR / "models"))  # created on first use
 
 # Training Configuration
 MIN_TRANSACTIONS_FOR_TRAINING = int(os.getenv("MIN_TRANSACTIONS_FOR_TRAINING", "50"))
 RETRAIN_INTERVAL_DAYS = int(os.getenv("RETRAIN_INTERVAL_DAYS", "7"))
 
+# Model Versioning and Caching
+MODEL_KEEP_VERSIONS = int(os.getenv("MODEL_KEEP_VERSIONS", "3"))
+MODEL_CACHE_SIZE = int(os.getenv("MODEL_CACHE_SIZE", "256"))  # loaded models kept in memory by the API
+
+# Model Access History (startup prewarm order)
+ACCESS_HISTORY_FILE = Path(os.getenv("ACCESS_HISTORY_FILE", MODEL_PATH / "access_history.json"))
+ACCESS_HISTORY_HALF_LIFE_HOURS = float(os.getenv("ACCESS_HISTORY_HALF_LIFE_HOURS", "72"))
+ACCESS_HISTORY_MAX_ENTRIES = int(os.getenv("ACCESS_HISTORY_MAX_ENTRIES", "10000"))
+ACCESS_HISTORY_FLUSH_SECONDS = float(os.getenv("ACCESS_HISTORY_FLUSH_SECONDS", "60"))
+
+# Training Data Snapshots
+SNAPSHOT_CACHE = os.getenv("SNAPSHOT_CACHE", "true").lower() == "true"
+SNAPSHOT_PATH = Path(os.getenv("SNAPSHOT_PATH", MODEL_PATH / "snapshots"))
+SNAPSHOT_MAX_AGE_HOURS = float(os.getenv("SNAPSHOT_MAX_AGE_HOURS", "168"))  # full rebuild drops deletions
+
+# Categorizer Configuration
+CATEGORIZER_ENGINE = os.getenv("CATEGORIZER_ENGINE", "random_forest")  # random_forest | xgboost
+CATEGORIZER_N_JOBS = int(os.getenv("CATEGORIZER_N_JOBS", "-1"))
+XGBOOST_EARLY_STOPPING_ROUNDS = int(os.getenv("XGBOOST_EARLY_STOPPING_ROUNDS", "20"))
+CATEGORIZER_FEATURIZER = os.getenv("CATEGORIZER_FEATURIZER", "tfidf")  # tfidf | hashing
+HASHING_N_FEATURES = int(os.getenv("HASHING_N_FEATURES", "4096"))
+HASHING_USE_IDF = os.getenv("HASHING_USE_IDF", "true").lower() == "true"
+CATEGORIZER_EVAL_MODE = os.getenv("CATEGORIZER_EVAL_MODE", "holdout")  # holdout | oob | cv
+CATEGORIZER_CV_FOLDS = int(os.getenv("CATEGORIZER_CV_FOLDS", "5"))
+CATEGORIZER_TUNE = os.getenv("CATEGORIZER_TUNE", "false").lower() == "true"
+
+# Forecaster Configuration
+FORECAST_BATCHED = os.getenv("FORECAST_BATCHED", "true").lower() == "true"  # vectorized multi-category forecasts
+FORECAST_WARM_START = os.getenv("FORECAST_WARM_START", "true").lower() == "true"  # refit from the previous parameters
+
+# Precomputed Forecasts (written after training, served before live Prophet prediction)
+FORECAST_MATERIALIZE = os.getenv("FORECAST_MATERIALIZE", "true").lower() == "true"
+FORECAST_STORE_PATH = Path(os.getenv("FORECAST_STORE_PATH", MODEL_PATH / "forecasts"))
+FORECAST_MATERIALIZE_DAYS = int(os.getenv("FORECAST_MATERIALIZE_DAYS", "92"))  # covers next-month forecasts
+FORECAST_MATERIALIZE_WORKERS = int(os.getenv("FORECAST_MATERIALIZE_WORKERS", str(os.cpu_count() or 1)))
+
+# Metrics
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# Admin Profiling (disabled unless enabled and an admin token is set)
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
 # Logging
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 
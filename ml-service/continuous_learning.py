@@ -1,12 +1,13 @@
 """
 Continuous Learning Service for ML Models
-Automatically retrains models periodically based on new transaction data
+Automatically retrains models based on new transaction data, either on a daily
+schedule or event-driven as new transactions arrive
 """
 import schedule
 import time
+import json
 import logging
 from datetime import datetime, timedelta
-from pymongo import MongoClient
 import os
 from dotenv import load_dotenv
 from pathlib import Path
@@ -15,8 +16,16 @@ import sys
 # Add parent directory to path
 sys.path.append(str(Path(__file__).parent))
 
+from config import MODEL_PATH, FORECAST_MATERIALIZE
 from services.transaction_categorizer import TransactionCategorizer
 from services.expense_forecaster import ExpenseForecaster
+from services.forecast_store import ForecastStore
+from services.model_store import published_users
+from materialize_forecasts import materialize_users
+from retrain_trigger import RetrainTrigger
+import data_access
+import drift_check
+import snapshot_store
 
 # Load environment variables
 load_dotenv()
@@ -33,72 +42,193 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Configuration
-MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/finance_db')
 MIN_TRANSACTIONS = int(os.getenv('MIN_TRANSACTIONS_FOR_TRAINING', '50'))
 MIN_NEW_TRANSACTIONS = int(os.getenv('MIN_NEW_TRANSACTIONS_FOR_RETRAIN', '20'))
 RETRAIN_INTERVAL_DAYS = int(os.getenv('RETRAIN_INTERVAL_DAYS', '7'))
-
-# MongoDB connection
-client = MongoClient(MONGODB_URI)
-db = client.get_database()
+LEARNING_MODE = os.getenv('LEARNING_MODE', 'schedule')  # schedule | events
+RETRAIN_DEBOUNCE_SECONDS = float(os.getenv('RETRAIN_DEBOUNCE_SECONDS', '60'))
+RETRAIN_MAX_DELAY_SECONDS = float(os.getenv('RETRAIN_MAX_DELAY_SECONDS', '600'))
+RETRAIN_POLL_SECONDS = float(os.getenv('RETRAIN_POLL_SECONDS', '5'))
+TRAINING_STATE_FILE = Path(os.getenv('TRAINING_STATE_FILE', MODEL_PATH / 'training_state.json'))
+# Periodic retrains only refit when the new transactions show drift
+DRIFT_GATING = os.getenv('DRIFT_GATING', 'true').lower() == 'true'
+DRIFT_MAX_ACCURACY_DROP = float(os.getenv('DRIFT_MAX_ACCURACY_DROP', '0.05'))
+DRIFT_MAX_SPEND_SHIFT = float(os.getenv('DRIFT_MAX_SPEND_SHIFT', '3.0'))  # standard errors of mean daily spend
 
 
 class ContinuousLearningService:
     """Service for continuous model training and improvement"""
     
     def __init__(self):
+        self.db = data_access.get_sync_db()
         self.last_training_times = {}  # user_id -> last_training_datetime
+        self.last_training_records = {}  # user_id -> model_type -> {'accuracy', 'durationSeconds'}
+        self.last_evaluation_times = {}  # user_id -> last drift check that skipped a retrain
+        self.history_synced_at = None  # training history is aggregated from here on
+        self.pending_records = []
+        self.fit_totals = {}  # 'warm'/'cold' -> forecaster fit totals of the current cycle
+        self.forecast_store = ForecastStore()
+        self.load_state()
         logger.info("Continuous Learning Service initialized")
     
     def get_user_transactions(self, user_id: str, since_date=None):
         """Fetch transactions for a user, optionally since a specific date"""
-        query = {'userId': user_id}
-        if since_date:
-            query['createdAt'] = {'$gte': since_date}
+        if since_date is None:
+            # Full histories come from the local snapshot plus a delta query
+            return data_access.run(snapshot_store.load_user_transactions(user_id))
+        return data_access.run(data_access.fetch_user_transactions(user_id, since=since_date))
+    
+    def count_user_transactions(self, user_id: str, since_date=None) -> int:
+        """Count transactions for a user without fetching them"""
+        return data_access.run(data_access.count_user_transactions(user_id, since=since_date))
+    
+    def load_state(self):
+        """Restore last training times saved by a previous run"""
+        if not TRAINING_STATE_FILE.exists():
+            return
+        try:
+            with open(TRAINING_STATE_FILE) as f:
+                state = json.load(f)
+            # Files without the last records predate them and are re-synced in full
+            self.last_training_records = state['last_training_records']
+            self.last_evaluation_times = {
+                user_id: datetime.fromisoformat(evaluated_at)
+                for user_id, evaluated_at in state['last_evaluation_times'].items()
+            }
+            self.history_synced_at = datetime.fromisoformat(state['synced_at'])
+            self.last_training_times = {
+                user_id: datetime.fromisoformat(trained_at)
+                for user_id, trained_at in state['last_training_times'].items()
+            }
+            logger.info(f"Loaded training state for {len(self.last_training_times)} users")
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable training state file: {e}")
+            self.history_synced_at = None
+            self.last_training_times = {}
+            self.last_training_records = {}
+            self.last_evaluation_times = {}
+    
+    def save_state(self):
+        """Write last training times to the local state file"""
+        if self.history_synced_at is None:
+            return
+        state = {
+            'synced_at': self.history_synced_at.isoformat(),
+            'last_training_times': {
+                user_id: trained_at.isoformat() for user_id, trained_at in self.last_training_times.items()
+            },
+            'last_training_records': self.last_training_records,
+            'last_evaluation_times': {
+                user_id: evaluated_at.isoformat() for user_id, evaluated_at in self.last_evaluation_times.items()
+            }
+        }
+        TRAINING_STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = TRAINING_STATE_FILE.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, TRAINING_STATE_FILE)
+    
+    def load_training_times(self):
+        """Bulk-load the latest training per user and model type with one aggregation
         
-        transactions = list(db.transactions.find(query))
+        Besides each user's last trainedAt this keeps the accuracy and duration
+        of their latest fit of each model, which the drift check compares
+        against, and the last time a drift check skipped their retrain. Only
+        history recorded since the last sync is aggregated, so after a restart
+        the state file covers everything older.
+        """
+        synced_at = datetime.now()
+        trained = {'trainedAt': {'$exists': True, '$ne': None}}
+        evaluated = {'modelType': 'retrain_skipped', 'evaluatedAt': {'$exists': True, '$ne': None}}
+        if self.history_synced_at is not None:
+            trained['trainedAt']['$gte'] = self.history_synced_at
+            evaluated['evaluatedAt']['$gte'] = self.history_synced_at
+        pipeline = [
+            {'$match': {'$or': [trained, evaluated]}},
+            {'$sort': {'trainedAt': 1}},
+            {'$group': {
+                '_id': {'userId': '$userId', 'modelType': '$modelType'},
+                'trainedAt': {'$last': '$trainedAt'},
+                'evaluatedAt': {'$max': '$evaluatedAt'},
+                'accuracy': {'$last': '$metrics.accuracy'},
+                'durationSeconds': {'$last': '$durationSeconds'}
+            }}
+        ]
         
-        # Convert MongoDB documents to dict format
-        formatted_transactions = []
-        for txn in transactions:
-            formatted_transactions.append({
-                'description': txn.get('description', ''),
-                'amount': float(txn.get('amount', 0)),
-                'date': txn.get('date').isoformat() if txn.get('date') else None,
-                'category': txn.get('category', '')
-            })
+        for row in self.db.model_training_history.aggregate(pipeline, allowDiskUse=True):
+            user_id, trained_at = row['_id']['userId'], row['trainedAt']
+            if row['_id']['modelType'] == 'retrain_skipped':
+                previous = self.last_evaluation_times.get(user_id)
+                if previous is None or row['evaluatedAt'] > previous:
+                    self.last_evaluation_times[user_id] = row['evaluatedAt']
+                continue
+            previous = self.last_training_times.get(user_id)
+            if previous is None or trained_at > previous:
+                self.last_training_times[user_id] = trained_at
+            self.last_training_records.setdefault(user_id, {})[row['_id']['modelType']] = {
+                'accuracy': row.get('accuracy'),
+                'durationSeconds': row.get('durationSeconds')
+            }
         
-        return formatted_transactions
+        self.history_synced_at = synced_at
+        self.save_state()
     
     def get_last_training_time(self, user_id: str):
         """Get the last time models were trained for a user"""
-        # Check in-memory cache first
-        if user_id in self.last_training_times:
-            return self.last_training_times[user_id]
-        
-        # Check database for training history
-        training_record = db.model_training_history.find_one(
-            {'userId': user_id},
-            sort=[('trainedAt', -1)]
-        )
-        
-        if training_record:
-            last_time = training_record['trainedAt']
-            self.last_training_times[user_id] = last_time
-            return last_time
-        
-        return None
+        if self.history_synced_at is None:
+            self.load_training_times()
+        return self.last_training_times.get(user_id)
     
-    def save_training_record(self, user_id: str, model_type: str, metrics: dict):
-        """Save training record to database"""
+    def save_training_record(self, user_id: str, model_type: str, metrics: dict, duration: float = None):
+        """Buffer a training record; written by flush_training_records()"""
         record = {
             'userId': user_id,
             'modelType': model_type,
             'trainedAt': datetime.now(),
             'metrics': metrics
         }
-        db.model_training_history.insert_one(record)
+        if duration is not None:
+            record['durationSeconds'] = round(duration, 3)
+        self.pending_records.append(record)
         self.last_training_times[user_id] = record['trainedAt']
+        self.last_training_records.setdefault(user_id, {})[model_type] = {
+            'accuracy': metrics.get('accuracy'),
+            'durationSeconds': record.get('durationSeconds')
+        }
+    
+    def save_skip_record(self, user_id: str, reason: str, drift: dict, evaluation_seconds: float,
+                         saved_seconds: float = None):
+        """Buffer a record of a retrain skipped by the drift check
+        
+        Skip records have no trainedAt, so they never count as a training time.
+        Their evaluatedAt restarts the retrain interval instead, so a user whose
+        models held up is not scored again every cycle.
+        """
+        evaluated_at = datetime.now()
+        self.last_evaluation_times[user_id] = evaluated_at
+        self.pending_records.append({
+            'userId': user_id,
+            'modelType': 'retrain_skipped',
+            'evaluatedAt': evaluated_at,
+            'reason': reason,
+            'drift': drift,
+            'evaluationSeconds': round(evaluation_seconds, 3),
+            'savedSeconds': None if saved_seconds is None else round(saved_seconds, 3)
+        })
+    
+    def get_last_training_record(self, user_id: str, model_type: str) -> dict:
+        """Accuracy and duration of a user's latest fit of one model type (empty if never trained)"""
+        if self.history_synced_at is None:
+            self.load_training_times()
+        return self.last_training_records.get(user_id, {}).get(model_type, {})
+    
+    def flush_training_records(self):
+        """Write buffered training records in one insert_many and persist state"""
+        records, self.pending_records = self.pending_records, []
+        if records:
+            self.db.model_training_history.insert_many(records, ordered=False)
+            logger.info(f"Saved {len(records)} training records")
+        self.save_state()
     
     def should_retrain(self, user_id: str):
         """Determine if models should be retrained for a user"""
@@ -106,32 +236,73 @@ class ContinuousLearningService:
         
         # If never trained, check if enough data exists
         if not last_training:
-            total_transactions = len(self.get_user_transactions(user_id))
+            total_transactions = self.count_user_transactions(user_id)
             if total_transactions >= MIN_TRANSACTIONS:
                 logger.info(f"User {user_id}: Never trained, {total_transactions} transactions available")
                 return True, "initial_training"
             return False, "insufficient_data"
         
+        # A drift check that found nothing counts like a training for the interval
+        last_evaluation = self.last_evaluation_times.get(user_id)
+        last_check = max(last_training, last_evaluation) if last_evaluation else last_training
+        
         # Check if enough time has passed
-        days_since_training = (datetime.now() - last_training).days
-        if days_since_training < RETRAIN_INTERVAL_DAYS:
+        days_since_check = (datetime.now() - last_check).days
+        if days_since_check < RETRAIN_INTERVAL_DAYS:
             return False, "too_soon"
         
         # Check if enough new transactions exist
-        new_transactions = self.get_user_transactions(user_id, since_date=last_training)
-        if len(new_transactions) >= MIN_NEW_TRANSACTIONS:
-            logger.info(f"User {user_id}: {len(new_transactions)} new transactions since last training")
+        new_transactions = self.count_user_transactions(user_id, since_date=last_check)
+        if new_transactions >= MIN_NEW_TRANSACTIONS:
+            logger.info(f"User {user_id}: {new_transactions} new transactions since last check")
             return True, "periodic_retrain"
         
         return False, "insufficient_new_data"
     
-    def train_user_models(self, user_id: str):
+    def check_drift(self, user_id: str):
+        """Score the current models on transactions since the last fit
+        
+        Returns ``(should_train, reason)``. Skipped refits are recorded in
+        model_training_history with the drift report, the evaluation time and
+        the fit time saved (the durations of the last recorded fits).
+        """
+        start = time.perf_counter()
+        last_training = self.get_last_training_time(user_id)
+        new_transactions = self.get_user_transactions(user_id, since_date=last_training)
+        
+        last_records = {
+            model_type: self.get_last_training_record(user_id, model_type)
+            for model_type in ('categorizer', 'forecaster')
+        }
+        report = drift_check.evaluate(
+            TransactionCategorizer(user_id),
+            ExpenseForecaster.load_category_stats(user_id),
+            new_transactions,
+            last_records['categorizer'].get('accuracy'),
+            max_accuracy_drop=DRIFT_MAX_ACCURACY_DROP,
+            max_spend_shift=DRIFT_MAX_SPEND_SHIFT
+        )
+        evaluation_seconds = time.perf_counter() - start
+        
+        if report['drifted']:
+            logger.info(f"User {user_id}: drift detected ({', '.join(report['reasons'])})")
+            return True, "drift"
+        
+        durations = [record.get('durationSeconds') for record in last_records.values()]
+        saved_seconds = sum(durations) if all(d is not None for d in durations) else None
+        self.save_skip_record(user_id, "no_drift", report, evaluation_seconds, saved_seconds)
+        logger.info(f"User {user_id}: no drift in {report['new_transactions']} new transactions, "
+                    f"skipping retrain (checked in {evaluation_seconds:.2f}s)")
+        return False, "no_drift"
+    
+    def train_user_models(self, user_id: str, transactions=None):
         """Train both categorizer and forecaster for a user"""
         logger.info(f"Starting training for user {user_id}")
         
         try:
-            # Get all transactions
-            transactions = self.get_user_transactions(user_id)
+            # Get all transactions (unless already prefetched)
+            if transactions is None:
+                transactions = self.get_user_transactions(user_id)
             
             if len(transactions) < MIN_TRANSACTIONS:
                 logger.warning(f"User {user_id}: Insufficient data ({len(transactions)} transactions)")
@@ -139,17 +310,20 @@ class ContinuousLearningService:
             
             # Train categorizer
             logger.info(f"Training categorizer for user {user_id}...")
+            start = time.perf_counter()
             categorizer = TransactionCategorizer(user_id)
             cat_result = categorizer.train(transactions)
-            self.save_training_record(user_id, 'categorizer', cat_result)
+            self.save_training_record(user_id, 'categorizer', cat_result, time.perf_counter() - start)
             logger.info(f"Categorizer trained: Accuracy={cat_result.get('accuracy', 0):.2%}")
             
             # Train forecaster
             logger.info(f"Training forecaster for user {user_id}...")
+            start = time.perf_counter()
             forecaster = ExpenseForecaster(user_id)
             fore_result = forecaster.train(transactions)
-            self.save_training_record(user_id, 'forecaster', fore_result)
+            self.save_training_record(user_id, 'forecaster', fore_result, time.perf_counter() - start)
             logger.info(f"Forecaster trained: {fore_result.get('categories_trained', 0)} categories")
+            self.add_fit_summary(fore_result.get('fit_summary', {}))
             
             logger.info(f"✅ Successfully trained models for user {user_id}")
             return True
@@ -158,39 +332,95 @@ class ContinuousLearningService:
             logger.error(f"Error training user {user_id}: {e}", exc_info=True)
             return False
     
+    def add_fit_summary(self, summary: dict):
+        """Add a forecaster training's warm/cold fit summary to the cycle totals"""
+        for mode, fits in summary.items():
+            totals = self.fit_totals.setdefault(mode, {"fits": 0, "fit_seconds": 0.0, "optimizer_iterations": 0})
+            for key in totals:
+                totals[key] += fits[key]
+    
+    def log_fit_totals(self):
+        """Log mean forecaster fit time and iterations per category, warm vs cold"""
+        means = {}
+        for mode in ('warm', 'cold'):
+            totals = self.fit_totals.get(mode)
+            if not totals or not totals['fits']:
+                continue
+            means[mode] = totals['fit_seconds'] / totals['fits']
+            logger.info(
+                f"Forecaster {mode} starts: {totals['fits']} fits, "
+                f"{means[mode]:.3f}s and {totals['optimizer_iterations'] / totals['fits']:.0f} iterations per fit"
+            )
+        if len(means) == 2 and means['warm'] > 0:
+            logger.info(f"Warm-start fit speedup: {means['cold'] / means['warm']:.1f}x")
+    
+    def materialize_forecasts(self, user_ids=None):
+        """Precompute forecasts for the API, for ``user_ids`` or every user whose stored forecasts are outdated"""
+        if not FORECAST_MATERIALIZE:
+            return
+        if user_ids is None:
+            user_ids = self.forecast_store.stale_users(published_users("forecaster_"))
+        if not user_ids:
+            return
+        
+        start = time.perf_counter()
+        results = materialize_users(user_ids)
+        materialized = sum(1 for r in results.values() if r['status'] == 'materialized')
+        logger.info(f"Materialized forecasts for {materialized}/{len(user_ids)} users "
+                    f"in {time.perf_counter() - start:.1f}s")
+    
     def check_and_train_all_users(self):
         """Check all users and train models if needed"""
         logger.info("="*60)
         logger.info("Starting periodic model training check")
         logger.info("="*60)
         
+        self.fit_totals = {}
         try:
+            # Latest training time of every user in one query
+            self.load_training_times()
+            
             # Get all users
-            users = list(db.users.find({}, {'_id': 1}))
+            users = list(self.db.users.find({}, {'_id': 1}))
             logger.info(f"Found {len(users)} users")
             
-            trained_count = 0
+            to_train = []
             skipped_count = 0
             
             for user in users:
                 user_id = str(user['_id'])
                 
                 should_train, reason = self.should_retrain(user_id)
+                if should_train and reason == "periodic_retrain" and DRIFT_GATING:
+                    should_train, reason = self.check_drift(user_id)
                 
                 if should_train:
                     logger.info(f"Training user {user_id} (Reason: {reason})")
-                    if self.train_user_models(user_id):
-                        trained_count += 1
+                    to_train.append(user_id)
                 else:
                     logger.debug(f"Skipping user {user_id} (Reason: {reason})")
                     skipped_count += 1
             
+            # Fetch the next users' transactions while the current one trains
+            results = data_access.run(
+                data_access.train_with_prefetch(
+                    to_train, self.train_user_models, fetch=snapshot_store.load_user_transactions
+                )
+            )
+            trained_count = sum(1 for ok in results.values() if ok)
+            
             logger.info("="*60)
             logger.info(f"Training cycle complete: {trained_count} trained, {skipped_count} skipped")
+            self.log_fit_totals()
             logger.info("="*60)
             
+            # Retrained users (and any without stored forecasts) get new ones
+            self.materialize_forecasts()
+            
         except Exception as e:
             logger.error(f"Error in training cycle: {e}", exc_info=True)
+        finally:
+            self.flush_training_records()
     
     def run_continuous_learning(self):
         """Run continuous learning service with scheduled tasks"""
@@ -199,6 +429,9 @@ class ContinuousLearningService:
         logger.info(f"  - Minimum transactions: {MIN_TRANSACTIONS}")
         logger.info(f"  - Minimum new transactions for retrain: {MIN_NEW_TRANSACTIONS}")
         logger.info(f"  - Retrain interval: {RETRAIN_INTERVAL_DAYS} days")
+        logger.info(f"  - Drift gating: {DRIFT_GATING} (max accuracy drop {DRIFT_MAX_ACCURACY_DROP:.0%}, "
+                    f"max spend shift {DRIFT_MAX_SPEND_SHIFT} SE)")
+        logger.info(f"  - Forecast materialization: {FORECAST_MATERIALIZE}")
         logger.info(f"  - Check schedule: Daily at 02:00 AM")
         
         # Schedule daily training check at 2 AM
@@ -217,13 +450,68 @@ class ContinuousLearningService:
         except KeyboardInterrupt:
             logger.info("Service stopped by user")
         finally:
-            client.close()
+            data_access.close()
+    
+    def retrain_from_event(self, user_id: str):
+        """Retrain a user queued by the event trigger"""
+        logger.info(f"Event-driven retrain for user {user_id}")
+        try:
+            if DRIFT_GATING and self.get_last_training_time(user_id) is not None:
+                should_train, _ = self.check_drift(user_id)
+                if not should_train:
+                    return
+            if self.train_user_models(user_id):
+                self.materialize_forecasts([user_id])
+        finally:
+            self.flush_training_records()
+    
+    def run_event_driven(self):
+        """Run continuous learning driven by new transaction events"""
+        logger.info("Starting Continuous Learning Service (event-driven)")
+        logger.info(f"Configuration:")
+        logger.info(f"  - Minimum transactions: {MIN_TRANSACTIONS}")
+        logger.info(f"  - New transactions per retrain: {MIN_NEW_TRANSACTIONS}")
+        logger.info(f"  - Debounce: {RETRAIN_DEBOUNCE_SECONDS}s (max delay {RETRAIN_MAX_DELAY_SECONDS}s)")
+        
+        trigger = RetrainTrigger(
+            self.db,
+            on_retrain=self.retrain_from_event,
+            threshold=MIN_NEW_TRANSACTIONS,
+            debounce_seconds=RETRAIN_DEBOUNCE_SECONDS,
+            max_delay_seconds=RETRAIN_MAX_DELAY_SECONDS,
+            poll_interval=RETRAIN_POLL_SECONDS
+        )
+        
+        # Pick up users who were never trained before events start flowing
+        logger.info("Running initial training check...")
+        self.check_and_train_all_users()
+        
+        threads = trigger.start()
+        logger.info("Service running. Press Ctrl+C to stop.")
+        try:
+            while all(t.is_alive() for t in threads):
+                time.sleep(1)
+        except KeyboardInterrupt:
+            logger.info("Service stopped by user")
+        finally:
+            trigger.stop()
+            data_access.close()
 
 
 def main():
     """Main entry point"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Continuous learning for ML models')
+    parser.add_argument('--mode', choices=['schedule', 'events'], default=LEARNING_MODE,
+                        help='Daily scheduled scan or event-driven retraining (default: LEARNING_MODE)')
+    args = parser.parse_args()
+    
     service = ContinuousLearningService()
-    service.run_continuous_learning()
+    if args.mode == 'events':
+        service.run_event_driven()
+    else:
+        service.run_continuous_learning()
 
 
 if __name__ == "__main__":
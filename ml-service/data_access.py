@@ -0,0 +1,227 @@
+"""
+Shared MongoDB data access for the ML trainers
+One pooled async (motor) client serves projected, batched transaction queries.
+Synchronous scripts submit coroutines to a background event loop with run(),
+so the pool survives across calls and threads.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+
+from config import MONGODB_URI, MONGO_MAX_POOL_SIZE, MONGO_BATCH_SIZE
+
+# Only the fields the models train on
+TRANSACTION_PROJECTION = {'_id': 0, 'description': 1, 'amount': 1, 'date': 1, 'category': 1}
+TRANSACTION_COLUMNS = ['description', 'amount', 'date', 'category']
+
+# Training fields plus what incremental snapshots need to merge changes
+CHANGE_PROJECTION = {**TRANSACTION_PROJECTION, '_id': 1, 'updatedAt': 1}
+CHANGE_COLUMNS = ['id'] + TRANSACTION_COLUMNS + ['updated_at']
+
+# Inference fields plus the raw document id, for writing predictions back
+INFERENCE_PROJECTION = {'_id': 1, 'description': 1, 'amount': 1, 'date': 1}
+
+_client: Optional[AsyncIOMotorClient] = None
+_sync_client: Optional[MongoClient] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_lock = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """Event loop owned by a daemon thread, created on first use"""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="mongo-io", daemon=True).start()
+        return _loop
+
+
+def run(coro):
+    """Run a coroutine on the shared loop and wait for its result"""
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result()
+
+
+def get_client() -> AsyncIOMotorClient:
+    """Pooled motor client; must be used from coroutines passed to run()"""
+    global _client
+    if _client is None:
+        _client = AsyncIOMotorClient(MONGODB_URI, maxPoolSize=MONGO_MAX_POOL_SIZE)
+    return _client
+
+
+def get_db():
+    return get_client().get_database()
+
+
+def get_sync_db():
+    """Blocking database handle for change streams and small bookkeeping writes"""
+    global _sync_client
+    with _lock:
+        if _sync_client is None:
+            _sync_client = MongoClient(MONGODB_URI, maxPoolSize=MONGO_MAX_POOL_SIZE)
+    return _sync_client.get_database()
+
+
+def close():
+    """Close both clients and stop the background loop"""
+    global _client, _sync_client, _loop
+    if _client is not None:
+        _client.close()
+        _client = None
+    if _sync_client is not None:
+        _sync_client.close()
+        _sync_client = None
+    if _loop is not None:
+        _loop.call_soon_threadsafe(_loop.stop)
+        _loop = None
+
+
+def _to_datetime64(values: List) -> np.ndarray:
+    # Legacy documents may hold dates as strings; unparseable values become NaT
+    return pd.to_datetime(pd.Series(values, dtype=object), errors='coerce', utc=True) \
+        .dt.tz_localize(None).values
+
+
+def _columns_from_batch(docs: List[Dict], with_changes: bool = False) -> Dict[str, np.ndarray]:
+    """Turn one cursor batch into NumPy columns"""
+    columns = {
+        'description': np.array([d.get('description', '') for d in docs], dtype=object),
+        'amount': np.array([float(d.get('amount', 0)) for d in docs], dtype=np.float64),
+        'date': _to_datetime64([d.get('date') for d in docs]),
+        'category': np.array([d.get('category', '') for d in docs], dtype=object),
+    }
+    if with_changes:
+        columns['id'] = np.array([str(d['_id']) for d in docs], dtype=object)
+        columns['updated_at'] = _to_datetime64([d.get('updatedAt') for d in docs])
+    return columns
+
+
+async def _read_columns(cursor, columns: List[str], batch_size: int, with_changes: bool = False) -> pd.DataFrame:
+    """Drain a cursor batch by batch into a DataFrame"""
+    chunks = []
+    while True:
+        docs = await cursor.to_list(length=batch_size)
+        if not docs:
+            break
+        chunks.append(_columns_from_batch(docs, with_changes))
+    
+    if not chunks:
+        return pd.DataFrame({column: [] for column in columns})
+    return pd.DataFrame({
+        column: np.concatenate([chunk[column] for chunk in chunks])
+        for column in columns
+    })
+
+
+async def fetch_user_transactions(user_id, since=None, batch_size: int = MONGO_BATCH_SIZE) -> pd.DataFrame:
+    """Fetch a user's transactions as a DataFrame of training columns
+    
+    ``user_id`` is matched as given (string or ObjectId). ``since`` limits the
+    result to documents created at or after that datetime.
+    """
+    query = {'userId': user_id}
+    if since:
+        query['createdAt'] = {'$gte': since}
+    
+    cursor = get_db().transactions.find(query, TRANSACTION_PROJECTION, batch_size=batch_size)
+    return await _read_columns(cursor, TRANSACTION_COLUMNS, batch_size)
+
+
+def any_user_id(user_id) -> Dict:
+    """``userId`` filter matching both the string and the ObjectId form of an id"""
+    text = str(user_id)
+    forms = [text, ObjectId(text)] if ObjectId.is_valid(text) else [user_id]
+    return {'$in': forms}
+
+
+async def fetch_transaction_changes(user_id, since=None, batch_size: int = MONGO_BATCH_SIZE) -> pd.DataFrame:
+    """Fetch a user's transactions updated at or after ``since`` (all when None)
+    
+    Includes the document ``id`` and ``updated_at`` so snapshots can merge the
+    changes and advance their watermark. Snapshots are keyed by ``str(user_id)``,
+    so ``user_id`` matches both of its forms and callers passing a string or an
+    ObjectId see the same documents.
+    """
+    query = {'userId': any_user_id(user_id)}
+    if since is not None:
+        query['updatedAt'] = {'$gte': since}
+    
+    cursor = get_db().transactions.find(query, CHANGE_PROJECTION, batch_size=batch_size)
+    return await _read_columns(cursor, CHANGE_COLUMNS, batch_size, with_changes=True)
+
+
+async def fetch_inference_transactions(user_id, batch_size: int = MONGO_BATCH_SIZE) -> pd.DataFrame:
+    """Fetch all of a user's transactions for bulk inference
+    
+    Returns ``id`` (the raw ``_id`` values, so results can be matched back),
+    ``description``, ``amount`` and ``date``.
+    """
+    cursor = get_db().transactions.find({'userId': user_id}, INFERENCE_PROJECTION, batch_size=batch_size)
+    ids = []
+    chunks = []
+    while True:
+        docs = await cursor.to_list(length=batch_size)
+        if not docs:
+            break
+        ids.extend(d['_id'] for d in docs)
+        chunks.append(_columns_from_batch(docs))
+    
+    columns = ['description', 'amount', 'date']
+    if not chunks:
+        return pd.DataFrame({column: [] for column in ['id'] + columns})
+    frame = pd.DataFrame({column: np.concatenate([chunk[column] for chunk in chunks]) for column in columns})
+    frame.insert(0, 'id', pd.Series(ids, dtype=object))
+    return frame
+
+
+async def list_transaction_users() -> List:
+    """Distinct ``userId`` values in the transactions collection, as stored"""
+    return await get_db().transactions.distinct('userId')
+
+
+async def count_user_transactions(user_id, since=None) -> int:
+    query = {'userId': user_id}
+    if since:
+        query['createdAt'] = {'$gte': since}
+    return await get_db().transactions.count_documents(query)
+
+
+async def list_users(projection: Optional[Dict] = None) -> List[Dict]:
+    return await get_db().users.find({}, projection or {'_id': 1}).to_list(length=None)
+
+
+async def prefetch_users(user_ids: Iterable, depth: int = 2,
+                         fetch: Callable = fetch_user_transactions) -> AsyncIterator[Tuple[object, pd.DataFrame]]:
+    """Yield ``(user_id, transactions)`` in order, keeping ``depth`` fetches in flight"""
+    pending = []
+    for user_id in user_ids:
+        pending.append((user_id, asyncio.ensure_future(fetch(user_id))))
+        if len(pending) > depth:
+            next_id, task = pending.pop(0)
+            yield next_id, await task
+    
+    for next_id, task in pending:
+        yield next_id, await task
+
+
+async def train_with_prefetch(user_ids: Iterable, train_fn: Callable[[object, pd.DataFrame], object],
+                              depth: int = 2, fetch: Callable = fetch_user_transactions) -> Dict:
+    """Call ``train_fn(user_id, transactions)`` per user in a worker thread
+    
+    Training runs off the event loop, so the next users' transactions are
+    fetched while the current user trains. Returns ``{user_id: result}``.
+    """
+    loop = asyncio.get_running_loop()
+    results = {}
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="trainer") as executor:
+        async for user_id, transactions in prefetch_users(user_ids, depth, fetch):
+            results[user_id] = await loop.run_in_executor(executor, train_fn, user_id, transactions)
+    return results
@@ -0,0 +1,95 @@
+"""
+Drift checks that gate periodic retraining
+Scores a user's current categorizer on the labelled transactions that arrived
+since its last fit and compares their daily spend per category with the
+forecaster's stored category_stats, so a refit only runs when the models no
+longer describe the new data
+"""
+import math
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from services.date_features import parse_dates
+
+
+def categorizer_accuracy(categorizer, transactions: pd.DataFrame) -> Dict:
+    """Accuracy of the current categorizer on new labelled transactions"""
+    labelled = transactions[transactions['category'].notna()]
+    known = set(categorizer.classifier.classes_)
+    unseen = sorted(set(labelled['category']) - known)
+    if len(labelled) == 0:
+        return {"evaluated": 0, "accuracy": None, "unseen_categories": unseen}
+    
+    predicted = categorizer.predict_columns(labelled[['description', 'amount', 'date']])['category']
+    return {
+        "evaluated": len(labelled),
+        "accuracy": float(np.mean(predicted == labelled['category'].values)),
+        "unseen_categories": unseen
+    }
+
+
+def spend_shift(transactions: pd.DataFrame, category_stats: Dict) -> Dict:
+    """Shift of mean daily spend per category, in standard errors of the stored mean
+    
+    Daily totals are built like ExpenseForecaster.prepare_data. A category's
+    shift is ``|new mean - stored mean| / (stored std / sqrt(new days))``.
+    """
+    df = transactions[transactions['category'].notna()].copy()
+    df['date'] = parse_dates(df['date'].values)
+    daily = df.groupby(['category', 'date'])['amount'].sum().abs()
+    
+    shifts = {}
+    for category, values in daily.groupby(level=0):
+        stats = category_stats.get(category)
+        # Categories without a forecaster model (or spread) can't be compared
+        if not stats or not stats.get('std') or math.isnan(stats['std']):
+            continue
+        difference = abs(float(values.mean()) - stats['mean'])
+        shifts[category] = difference / (stats['std'] / math.sqrt(len(values)))
+    
+    return {
+        "max_shift": max(shifts.values()) if shifts else 0.0,
+        "category_shifts": {category: round(shift, 3) for category, shift in shifts.items()}
+    }
+
+
+def evaluate(categorizer, category_stats: Dict, transactions: Union[pd.DataFrame, List[Dict]],
+             baseline_accuracy: Optional[float], max_accuracy_drop: float, max_spend_shift: float) -> Dict:
+    """Decide whether new transactions call for a refit
+    
+    Returns a report with ``drifted`` and the ``reasons`` behind it:
+    ``no_model``, ``no_baseline``, ``accuracy_drop``, ``unseen_categories`` or
+    ``spend_shift``.
+    """
+    reasons = []
+    report = {"new_transactions": len(transactions), "baseline_accuracy": baseline_accuracy}
+    if len(transactions) == 0:
+        return {**report, "drifted": False, "reasons": reasons}
+    df = pd.DataFrame(transactions)
+    for column in ('category', 'date'):
+        if column not in df.columns:
+            df[column] = None
+    
+    if not categorizer.is_trained():
+        reasons.append("no_model")
+    else:
+        accuracy = categorizer_accuracy(categorizer, df)
+        report.update(accuracy)
+        if accuracy['accuracy'] is not None:
+            if baseline_accuracy is None:
+                reasons.append("no_baseline")
+            else:
+                report["accuracy_drop"] = baseline_accuracy - accuracy['accuracy']
+                if report["accuracy_drop"] > max_accuracy_drop:
+                    reasons.append("accuracy_drop")
+        if accuracy['unseen_categories']:
+            reasons.append("unseen_categories")
+    
+    shift = spend_shift(df, category_stats)
+    report.update(shift)
+    if shift['max_shift'] > max_spend_shift:
+        reasons.append("spend_shift")
+    
+    return {**report, "drifted": bool(reasons), "reasons": reasons}
@@ -1,32 +1,25 @@
 """
 Find and train users with transaction data
 """
-from pymongo import MongoClient
-from bson import ObjectId
-import os
-from dotenv import load_dotenv
 from pathlib import Path
 import sys
 
 sys.path.append(str(Path(__file__).parent))
+from config import MONGODB_URI
 from services.transaction_categorizer import TransactionCategorizer
 from services.expense_forecaster import ExpenseForecaster
+import data_access
+import snapshot_store
 
-load_dotenv()
-
-MONGODB_URI = os.getenv('MONGODB_URI') or os.getenv('DATABASE_URL', 'mongodb://localhost:27017/finance_db')
 print(f"Connecting to: {MONGODB_URI.split('@')[-1] if '@' in MONGODB_URI else MONGODB_URI}\n")
 
-client = MongoClient(MONGODB_URI)
-db = client.get_database()
-
 # Find all users with their transaction counts
 print("="*60)
 print("FINDING USERS WITH TRANSACTION DATA")
 print("="*60)
 
 users_with_data = []
-all_users = list(db.users.find({}, {'_id': 1, 'email': 1, 'name': 1}))
+all_users = data_access.run(data_access.list_users({'_id': 1, 'email': 1, 'name': 1}))
 
 print(f"\nChecking {len(all_users)} users...\n")
 
@@ -36,7 +29,7 @@ for user in all_users:
     email = user.get('email', 'N/A')
     name = user.get('name', 'N/A')
     # Query with ObjectId type
-    txn_count = db.transactions.count_documents({'userId': user_id_obj})
+    txn_count = data_access.run(data_access.count_user_transactions(user_id_obj))
     
     if txn_count > 0:
         users_with_data.append({
@@ -56,7 +49,7 @@ if not users_with_data:
     print("\nPlease ensure:")
     print("1. Database is seeded: npm run db:seed")
     print("2. Users have added transactions via the app")
-    client.close()
+    data_access.close()
     sys.exit(0)
 
 print("="*60)
@@ -71,52 +64,55 @@ MIN_TRANSACTIONS = 30  # Lower threshold for initial training
 trained = 0
 skipped = 0
 
+to_train = []
 for user_data in users_with_data:
-    user_id = user_data['id']
-    email = user_data['email']
-    txn_count = user_data['transactions']
-    
-    if txn_count < MIN_TRANSACTIONS:
-        print(f"[SKIP] {email}: Only {txn_count} transactions (need {MIN_TRANSACTIONS}+)")
+    if user_data['transactions'] < MIN_TRANSACTIONS:
+        print(f"[SKIP] {user_data['email']}: Only {user_data['transactions']} transactions (need {MIN_TRANSACTIONS}+)")
         skipped += 1
-        continue
+    else:
+        to_train.append(user_data)
+
+emails = {user_data['id_obj']: user_data['email'] for user_data in to_train}
+
+
+def train_user(user_id_obj, transactions):
+    """Train both models on prefetched transactions"""
+    user_id = str(user_id_obj)
+    email = emails[user_id_obj]
     
     print("="*60)
     print(f"Training: {email}")
     print("="*60)
     
     try:
-        # Get transactions using ObjectId
-        transactions = list(db.transactions.find({'userId': user_data['id_obj']}))
-        formatted_transactions = []
-        for txn in transactions:
-            formatted_transactions.append({
-                'description': txn.get('description', ''),
-                'amount': float(txn.get('amount', 0)),
-                'date': txn.get('date').isoformat() if txn.get('date') else None,
-                'category': txn.get('category', '')
-            })
-        
         # Train categorizer
-        print(f"\n1. Training Categorizer ({len(formatted_transactions)} transactions)...")
+        print(f"\n1. Training Categorizer ({len(transactions)} transactions)...")
         categorizer = TransactionCategorizer(user_id)
-        cat_result = categorizer.train(formatted_transactions)
+        cat_result = categorizer.train(transactions)
         print(f"   [OK] Accuracy: {cat_result.get('accuracy', 0):.2%}")
         print(f"   [OK] Categories: {len(cat_result.get('categories', []))}")
         
         # Train forecaster
         print(f"\n2. Training Forecaster...")
         forecaster = ExpenseForecaster(user_id)
-        fore_result = forecaster.train(formatted_transactions)
+        fore_result = forecaster.train(transactions)
         print(f"   [OK] Categories trained: {fore_result.get('categories_trained', 0)}")
         
         print(f"\n[SUCCESS] Models trained for {email}")
-        trained += 1
+        return True
         
     except Exception as e:
         print(f"\n[ERROR] Training failed: {e}")
         import traceback
         traceback.print_exc()
+        return False
+
+
+# Transactions are queried by ObjectId; the next users are fetched while one trains
+results = data_access.run(data_access.train_with_prefetch(
+    [u['id_obj'] for u in to_train], train_user, fetch=snapshot_store.load_user_transactions
+))
+trained = sum(1 for ok in results.values() if ok)
 
 print("\n" + "="*60)
 print("TRAINING COMPLETE")
@@ -125,4 +121,4 @@ print(f"[SUCCESS] Trained: {trained} users")
 print(f"[SKIP] Skipped: {skipped} users (insufficient data)")
 print("="*60)
 
-client.close()
+data_access.close()
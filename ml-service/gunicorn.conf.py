@@ -0,0 +1,36 @@
+"""
+Gunicorn settings for production serving
+Usage (from ml-service/): gunicorn main:app
+
+The app and the saved user models are loaded once in the master process before
+the workers fork, so the model memory is shared copy-on-write between workers.
+Workers are recycled gracefully after SERVE_MAX_REQUESTS requests (with jitter
+so they do not all restart at once).
+"""
+import gc
+
+from config import HOST, PORT, SERVE_WORKERS, SERVE_MAX_REQUESTS, SERVE_MAX_REQUESTS_JITTER, PRELOAD_MODELS
+
+bind = f"{HOST}:{PORT}"
+workers = SERVE_WORKERS
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+max_requests = SERVE_MAX_REQUESTS
+max_requests_jitter = SERVE_MAX_REQUESTS_JITTER
+graceful_timeout = 30
+# Training endpoints can run for minutes
+timeout = 600
+
+
+def when_ready(server):
+    """Load models in the master, then freeze them out of the garbage collector"""
+    import main
+
+    if PRELOAD_MODELS:
+        loaded = main.preload_models()
+        server.log.info(f"Preloaded {loaded} user models before forking workers")
+
+    # Collections in the workers would otherwise touch (and so copy) every
+    # preloaded object's page
+    gc.freeze()
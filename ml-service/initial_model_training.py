@@ -2,62 +2,50 @@
 Initial ML Model Training Script
 Run this script to train models for the first time or manually retrain
 """
-import asyncio
 import sys
 from pathlib import Path
-from pymongo import MongoClient
 from datetime import datetime
-import os
-from dotenv import load_dotenv
 
 # Add parent directory to path
 sys.path.append(str(Path(__file__).parent))
 
+from config import MONGODB_URI
 from services.transaction_categorizer import TransactionCategorizer
 from services.expense_forecaster import ExpenseForecaster
+import data_access
+import snapshot_store
 
-# Load environment variables
-load_dotenv()
-
-# MongoDB connection - try multiple sources
-MONGODB_URI = os.getenv('MONGODB_URI') or os.getenv('DATABASE_URL', 'mongodb://localhost:27017/finance_db')
 print(f"Connecting to: {MONGODB_URI.split('@')[-1] if '@' in MONGODB_URI else MONGODB_URI}")
 
-client = MongoClient(MONGODB_URI)
-db = client.get_database()
-
 
-def get_user_transactions(user_id: str):
-    """Fetch all transactions for a user from MongoDB"""
-    transactions = list(db.transactions.find({'userId': user_id}))
-    
-    # Convert MongoDB documents to dict format
-    formatted_transactions = []
-    for txn in transactions:
-        formatted_transactions.append({
-            'description': txn.get('description', ''),
-            'amount': float(txn.get('amount', 0)),
-            'date': txn.get('date').isoformat() if txn.get('date') else None,
-            'category': txn.get('category', '')
-        })
-    
-    return formatted_transactions
+def get_user_transactions(user_id: str, offline: bool = False):
+    """Fetch all transactions for a user (snapshot cache + MongoDB delta)"""
+    if offline:
+        transactions = snapshot_store.load_offline(user_id)
+        if transactions is None:
+            raise ValueError(f"No local snapshot for user {user_id}")
+        return transactions
+    return data_access.run(snapshot_store.load_user_transactions(user_id))
 
 
-def get_all_users():
-    """Get all user IDs from database"""
-    users = db.users.find({}, {'_id': 1})
+def get_all_users(offline: bool = False):
+    """Get all user IDs from database (or from local snapshots when offline)"""
+    if offline:
+        return snapshot_store.snapshots.list_users()
+    users = data_access.run(data_access.list_users())
     return [str(user['_id']) for user in users]
 
 
-def train_user_models(user_id: str, min_transactions: int = 50):
+def train_user_models(user_id: str, min_transactions: int = 50, tune: bool = False, transactions=None,
+                      offline: bool = False):
     """Train both categorizer and forecaster for a user"""
     print(f"\n{'='*60}")
     print(f"Training models for user: {user_id}")
     print(f"{'='*60}")
     
-    # Get transactions
-    transactions = get_user_transactions(user_id)
+    # Get transactions (unless already prefetched)
+    if transactions is None:
+        transactions = get_user_transactions(user_id, offline)
     
     if len(transactions) < min_transactions:
         print(f"[WARNING] Insufficient data: {len(transactions)} transactions (minimum {min_transactions} required)")
@@ -69,11 +57,13 @@ def train_user_models(user_id: str, min_transactions: int = 50):
     print("\n1. Training Transaction Categorizer...")
     try:
         categorizer = TransactionCategorizer(user_id)
-        result = categorizer.train(transactions)
+        result = categorizer.train(transactions, tune=tune or None)
         print(f"   [OK] Categorizer trained successfully!")
         print(f"   - Accuracy: {result.get('accuracy', 0):.2%}")
         print(f"   - Transactions used: {result.get('num_transactions', 0)}")
         print(f"   - Categories: {len(result.get('categories', []))}")
+        if result.get('tuned_params'):
+            print(f"   - Tuned settings: {result['tuned_params']}")
     except Exception as e:
         print(f"   [ERROR] Categorizer training failed: {e}")
         return False
@@ -95,41 +85,46 @@ def train_user_models(user_id: str, min_transactions: int = 50):
     return True
 
 
-def train_all_users(min_transactions: int = 50):
+def train_all_users(min_transactions: int = 50, tune: bool = False, offline: bool = False):
     """Train models for all users with sufficient data"""
     print("\n" + "="*60)
     print("TRAINING ML MODELS FOR ALL USERS")
     print("="*60)
     
-    users = get_all_users()
-    print(f"\nFound {len(users)} users in database")
+    users = get_all_users(offline)
+    print(f"\nFound {len(users)} users in {'local snapshots' if offline else 'database'}")
     
     # First, show transaction counts for all users
     print("\nTransaction counts per user:")
+    counts = {}
     for user_id in users:
-        txn_count = len(get_user_transactions(user_id))
-        print(f"  User {user_id[:8]}...: {txn_count} transactions")
+        if offline:
+            counts[user_id] = snapshot_store.snapshots.read_meta(user_id)['count']
+        else:
+            counts[user_id] = data_access.run(data_access.count_user_transactions(user_id))
+        print(f"  User {user_id[:8]}...: {counts[user_id]} transactions")
     
     print(f"\nTraining users with {min_transactions}+ transactions...")
     
-    successful = 0
-    failed = 0
-    insufficient_data = 0
+    eligible = [user_id for user_id in users if counts[user_id] >= min_transactions]
+    insufficient_data = len(users) - len(eligible)
     
-    for user_id in users:
+    def train(user_id, transactions):
         try:
-            transactions = get_user_transactions(user_id)
-            if len(transactions) < min_transactions:
-                insufficient_data += 1
-                continue
-            
-            if train_user_models(user_id, min_transactions):
-                successful += 1
-            else:
-                failed += 1
+            return train_user_models(user_id, min_transactions, tune, transactions)
         except Exception as e:
             print(f"Error training user {user_id}: {e}")
-            failed += 1
+            return False
+    
+    # The next users' transactions are fetched while the current one trains
+    if offline:
+        results = {user_id: train(user_id, get_user_transactions(user_id, offline=True)) for user_id in eligible}
+    else:
+        results = data_access.run(
+            data_access.train_with_prefetch(eligible, train, fetch=snapshot_store.load_user_transactions)
+        )
+    successful = sum(1 for ok in results.values() if ok)
+    failed = len(results) - successful
     
     # Summary
     print("\n" + "="*60)
@@ -151,16 +146,20 @@ def main():
     parser.add_argument('--all', action='store_true', help='Train models for all users')
     parser.add_argument('--min-transactions', type=int, default=50, 
                        help='Minimum transactions required (default: 50)')
+    parser.add_argument('--tune', action='store_true',
+                       help='Search categorizer hyperparameters per user and save them for retrains')
+    parser.add_argument('--offline', action='store_true',
+                       help='Train from local transaction snapshots only, without connecting to MongoDB')
     
     args = parser.parse_args()
     
     try:
         if args.user:
             # Train specific user
-            train_user_models(args.user, args.min_transactions)
+            train_user_models(args.user, args.min_transactions, args.tune, offline=args.offline)
         elif args.all:
             # Train all users
-            train_all_users(args.min_transactions)
+            train_all_users(args.min_transactions, args.tune, args.offline)
         else:
             # Interactive mode
             print("\n" + "="*60)
@@ -175,9 +174,9 @@ def main():
             
             if choice == '1':
                 user_id = input("Enter user ID: ").strip()
-                train_user_models(user_id, args.min_transactions)
+                train_user_models(user_id, args.min_transactions, args.tune, offline=args.offline)
             elif choice == '2':
-                train_all_users(args.min_transactions)
+                train_all_users(args.min_transactions, args.tune, args.offline)
             else:
                 print("Exiting...")
     except KeyboardInterrupt:
@@ -185,7 +184,7 @@ def main():
     except Exception as e:
         print(f"\nError: {e}")
     finally:
-        client.close()
+        data_access.close()
 
 
 if __name__ == "__main__":
@@ -1,14 +1,34 @@
 """FastAPI ML Service for Personal Finance Assistant"""
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Header, Depends
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from fastapi.responses import PlainTextResponse, Response
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import Match
+from pydantic import BaseModel, Field, ValidationError
 from typing import List, Dict, Optional
 from datetime import datetime
+import asyncio
+import contextvars
+import hmac
 import logging
+import time
+import pandas as pd
 
-from services.transaction_categorizer import TransactionCategorizer
-from services.expense_forecaster import ExpenseForecaster
-from config import PORT, HOST
+import services
+from services.access_history import AccessHistory
+from services.forecast_store import ForecastStore
+from services.model_cache import ModelCache
+from services.prewarm import Prewarmer
+from services.sharding import HashRing, ShardRouter
+from services.single_flight import KeyedLocks, SingleFlight
+from services import metrics, wire
+from services.profiling import profiler, follow, StackSampler, MODES as PROFILING_MODES, pstats_bytes, pstats_text
+from config import (
+    PORT, HOST, METRICS_ENABLED, PROFILING_ENABLED, ADMIN_TOKEN, SERVICE_ROLE,
+    PRELOAD_MODELS, PRELOAD_MEMORY_MB, ACCESS_HISTORY_FLUSH_SECONDS, FORECAST_MATERIALIZE,
+    SHARD_NODES, SHARD_SELF, SHARD_VIRTUAL_NODES, SHARD_MODE, SHARD_FORWARD_TIMEOUT
+)
 
 # Configure logging
 logging.basicConfig(
@@ -17,13 +37,210 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+class TimedJSONResponse(wire.FastJSONResponse):
+    """JSON response that records serialization time"""
+    
+    def render(self, content) -> bytes:
+        with metrics.stage_timer('api', 'serialize'):
+            return super().render(content)
+
+
+DefaultResponse = TimedJSONResponse if METRICS_ENABLED else wire.FastJSONResponse
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Personal Finance ML Service",
     description="Machine Learning service for transaction categorization and expense forecasting",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=DefaultResponse
 )
 
+# Model kinds served by each SERVICE_ROLE; the engines behind the other kind's
+# routes (scikit-learn or Prophet/cmdstanpy) are never imported
+ROLE_KINDS = {
+    'categorize': ('categorizer',),
+    'forecast': ('forecaster',),
+    'all': ('categorizer', 'forecaster'),
+}
+if SERVICE_ROLE not in ROLE_KINDS:
+    raise ValueError(f"SERVICE_ROLE must be one of {', '.join(ROLE_KINDS)}, got {SERVICE_ROLE!r}")
+SERVED_KINDS = ROLE_KINDS[SERVICE_ROLE]
+
+# Users are split across the SHARD_NODES instances by consistent hashing; each
+# node only loads the models of the users it owns (see services/sharding.py)
+shard_ring = None
+if SHARD_NODES:
+    if SHARD_SELF not in SHARD_NODES:
+        raise ValueError(f"SHARD_SELF must be one of SHARD_NODES, got {SHARD_SELF!r}")
+    if SHARD_MODE not in ('forward', 'redirect'):
+        raise ValueError(f"SHARD_MODE must be forward or redirect, got {SHARD_MODE!r}")
+    shard_ring = HashRing(SHARD_NODES, SHARD_VIRTUAL_NODES)
+
+
+def owns(user_id: str) -> bool:
+    """Whether this node serves ``user_id`` (always, without sharding)"""
+    return shard_ring is None or shard_ring.owner(user_id) == SHARD_SELF
+
+# Model class per kind, resolved (and so imported) on first use
+ENGINES = {
+    'categorizer': 'TransactionCategorizer',
+    'forecaster': 'ExpenseForecaster',
+}
+
+
+def engine(kind: str):
+    return getattr(services, ENGINES[kind])
+
+
+# Loaded models, swapped to new versions as they are published; lookups feed
+# the access history that orders the next startup's prewarm
+access_history = AccessHistory()
+model_cache = ModelCache({
+    kind: (lambda user_id, kind=kind: engine(kind)(user_id)) for kind in ENGINES
+}, history=access_history)
+prewarmer = Prewarmer(model_cache, access_history, SERVED_KINDS, PRELOAD_MEMORY_MB * 2**20, owns=owns)
+
+# Forecasts precomputed after training (see materialize_forecasts.py)
+forecast_store = ForecastStore()
+
+# Identical forecasts and status lookups arriving together share one run, and
+# trainings of one user's model take turns instead of racing to publish
+forecast_flight = SingleFlight("forecast")
+status_flight = SingleFlight("model_status")
+training_locks = KeyedLocks("training")
+
+
+def get_forecaster(user_id: str, periods: int):
+    """Forecaster for ``periods`` days: the user's stored forecasts when current, else the live models"""
+    if FORECAST_MATERIALIZE:
+        entry = forecast_store.get(user_id, periods)
+        if entry is not None:
+            return services.MaterializedForecaster(user_id, entry)
+    return model_cache.get('forecaster', user_id)
+
+
+async def in_worker(fn, *args):
+    """Run blocking work in the threadpool, keeping the request's stage trace and profile capture"""
+    return await run_in_threadpool(contextvars.copy_context().run, follow, fn, *args)
+
+
+def serves(kind: str):
+    """Route dependency: 404 for model kinds outside this replica's SERVICE_ROLE"""
+    def check():
+        if kind not in SERVED_KINDS:
+            raise HTTPException(status_code=404, detail=f"{kind} is not served by this {SERVICE_ROLE} replica")
+    return Depends(check)
+
+
+def preload_models() -> int:
+    """Import this role's engines and prewarm the cache in this thread
+    
+    Run in the gunicorn master before workers fork, so every worker shares
+    these pages copy-on-write instead of loading its own copy, and starts
+    ready. Returns the number of models loaded.
+    """
+    for kind in SERVED_KINDS:
+        engine(kind)
+    return prewarmer.run()
+
+
+@app.on_event("startup")
+def start_background_tasks():
+    """Prewarm in the background (unless the gunicorn master already did) and
+    start flushing the access history"""
+    if PRELOAD_MODELS:
+        prewarmer.start()
+    else:
+        prewarmer.skip()
+    access_history.start(ACCESS_HISTORY_FLUSH_SECONDS)
+
+
+@app.on_event("shutdown")
+def stop_background_tasks():
+    access_history.stop()
+
+
+def model_cache_metrics() -> Dict:
+    return {(stat,): value for stat, value in model_cache.stats().items()}
+
+
+def forecast_store_metrics() -> Dict:
+    return {(stat,): value for stat, value in forecast_store.stats().items()}
+
+
+metrics.REGISTRY.register(metrics.Gauge(
+    "ml_model_cache", "Loaded-model cache size, capacity, pending reloads and lookup counts",
+    labels=("stat",), callback=model_cache_metrics
+))
+metrics.REGISTRY.register(metrics.Gauge(
+    "ml_forecast_store", "Forecast requests served from precomputed forecasts (hits) or live models (misses)",
+    labels=("stat",), callback=forecast_store_metrics
+))
+
+if METRICS_ENABLED:
+    @app.middleware("http")
+    async def record_request_latency(request: Request, call_next):
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # Label by route template so per-user paths share one series
+            route = request.scope.get("route")
+            metrics.REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                method=request.method,
+                route=route.path if route is not None else "unmatched",
+                status=status
+            )
+
+
+def is_admin(token: Optional[str]) -> bool:
+    return PROFILING_ENABLED and bool(ADMIN_TOKEN) and token is not None and \
+        hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints are hidden unless profiling is enabled with a token"""
+    if not PROFILING_ENABLED or not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+def route_template(scope) -> Optional[str]:
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return None
+
+if PROFILING_ENABLED:
+    @app.middleware("http")
+    async def profile_requests(request: Request, call_next):
+        """Profile armed captures and trace stages for admin X-Stage-Timing requests"""
+        trace = bool(request.headers.get("x-stage-timing")) and is_admin(request.headers.get("x-admin-token"))
+        capture = profiler.claim(route_template(request.scope)) if profiler.has_pending() else None
+        if not trace and capture is None:
+            return await call_next(request)
+        
+        stages, token = metrics.trace_request() if trace else (None, None)
+        capture_token = capture.begin() if capture is not None else None
+        try:
+            response = await call_next(request)
+        finally:
+            if capture is not None:
+                profiler.release(capture, capture_token)
+            if token is not None:
+                metrics.end_trace(token)
+        
+        if trace:
+            response.headers["Server-Timing"] = metrics.server_timing(stages)
+        return response
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -33,6 +250,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so a request for another node's user is handed over before any
+# local work (and is timed by the node that serves it)
+if shard_ring is not None:
+    app.add_middleware(
+        ShardRouter, ring=shard_ring, self_node=SHARD_SELF, routes=lambda: app.router.routes,
+        mode=SHARD_MODE, timeout=SHARD_FORWARD_TIMEOUT
+    )
+
 # Pydantic models
 class Transaction(BaseModel):
     description: str
@@ -55,6 +280,7 @@ class PredictBatchRequest(BaseModel):
 class TrainCategorizerRequest(BaseModel):
     user_id: str
     transactions: List[Transaction]
+    tune: Optional[bool] = None
 
 class TrainForecasterRequest(BaseModel):
     user_id: str
@@ -65,6 +291,9 @@ class ForecastRequest(BaseModel):
     category: Optional[str] = None
     periods: int = Field(default=30, ge=1, le=365)
 
+class ForecastNextMonthRequest(BaseModel):
+    user_id: str = Field(min_length=1)
+
 
 # Health check
 @app.get("/")
@@ -72,26 +301,64 @@ async def root():
     return {
         "service": "Personal Finance ML Service",
         "status": "running",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "role": SERVICE_ROLE
     }
 
 @app.get("/health")
 async def health_check():
+    """Liveness: the process is up"""
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: startup prewarming has finished (503 until then)"""
+    status = prewarmer.status()
+    if not prewarmer.ready:
+        return DefaultResponse({"status": "warming", "prewarm": status}, status_code=503)
+    return {"status": "ready", "prewarm": status}
+
+@app.get("/shard")
+async def shard_info(user_id: Optional[str] = None):
+    """Sharding membership, and the node owning ``user_id`` when given"""
+    if shard_ring is None:
+        return {"enabled": False}
+    data = {
+        "enabled": True,
+        "self": SHARD_SELF,
+        "nodes": shard_ring.nodes,
+        "virtual_nodes": shard_ring.virtual_nodes,
+        "mode": SHARD_MODE
+    }
+    if user_id is not None:
+        data["owner"] = shard_ring.owner(user_id)
+    return data
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus text-format metrics for this process"""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 
 # Transaction Categorization Endpoints
-@app.post("/categorize/train")
+@app.post("/categorize/train", dependencies=[serves('categorizer')])
 async def train_categorizer(request: TrainCategorizerRequest, background_tasks: BackgroundTasks):
     """Train transaction categorization model for a user"""
+    def train():
+        with training_locks.hold(('categorizer', request.user_id)):
+            categorizer = engine('categorizer')(request.user_id)
+            result = categorizer.train(transactions, tune=request.tune)
+            model_cache.put('categorizer', request.user_id, categorizer)
+            return result
+    
     try:
-        categorizer = TransactionCategorizer(request.user_id)
-        
         # Convert Pydantic models to dicts
         transactions = [t.dict() for t in request.transactions]
         
         # Train model
-        result = categorizer.train(transactions)
+        result = await in_worker(train)
         
         return {
             "success": True,
@@ -105,23 +372,38 @@ async def train_categorizer(request: TrainCategorizerRequest, background_tasks:
         raise HTTPException(status_code=500, detail="Failed to train categorization model")
 
 
-@app.post("/categorize/predict")
+def trained_categorizer(user_id: str):
+    """The user's categorizer (may wait for it to load, so not on the event loop)"""
+    categorizer = model_cache.get('categorizer', user_id)
+    
+    if not categorizer.is_trained():
+        raise HTTPException(
+            status_code=400,
+            detail="Model not trained. Please train the model first."
+        )
+    return categorizer
+
+
+def categorize(user_id: str, transaction: Dict) -> Dict:
+    return trained_categorizer(user_id).predict(transaction)
+
+
+def categorize_batch(user_id: str, transactions: pd.DataFrame, columnar: bool):
+    categorizer = trained_categorizer(user_id)
+    if columnar:
+        return categorizer.predict_columns(transactions)
+    return categorizer.predict_batch(transactions)
+
+
+@app.post("/categorize/predict", dependencies=[serves('categorizer')])
 async def predict_category(request: PredictRequest):
     """Predict category for a single transaction"""
     try:
-        categorizer = TransactionCategorizer(request.user_id)
-        
-        if not categorizer.is_trained():
-            raise HTTPException(
-                status_code=400,
-                detail="Model not trained. Please train the model first."
-            )
-        
         # Convert Pydantic model to dict
         transaction = request.transaction.dict()
         
         # Predict
-        result = categorizer.predict(transaction)
+        result = await in_worker(categorize, request.user_id, transaction)
         
         return {
             "success": True,
@@ -134,28 +416,59 @@ async def predict_category(request: PredictRequest):
         raise HTTPException(status_code=500, detail="Failed to predict category")
 
 
-@app.post("/categorize/predict-batch")
-async def predict_categories_batch(request: PredictBatchRequest):
-    """Predict categories for multiple transactions"""
+def negotiate_formats(request: Request):
+    """``(request format, response format)`` from Content-Type and Accept"""
+    try:
+        return (
+            wire.request_format(request.headers.get('content-type')),
+            wire.response_format(request.headers.get('accept'))
+        )
+    except wire.UnsupportedFormat as e:
+        raise HTTPException(status_code=415, detail=str(e))
+
+
+def encoded_response(content: bytes, fmt: str) -> Response:
+    return Response(content, media_type=wire.MEDIA_TYPES[fmt])
+
+
+@app.post("/categorize/predict-batch", dependencies=[serves('categorizer')])
+async def predict_categories_batch(request: Request):
+    """Predict categories for multiple transactions
+    
+    Takes a PredictBatchRequest as JSON, or columnar MessagePack / Arrow IPC
+    (see services/wire.py); the response format follows the Accept header.
+    """
+    request_format, response_format = negotiate_formats(request)
+    body = await request.body()
+    try:
+        with metrics.stage_timer('api', 'deserialize'):
+            if request_format == wire.JSON:
+                parsed = PredictBatchRequest.model_validate_json(body)
+                user_id = parsed.user_id
+                transactions = pd.DataFrame({
+                    "description": [t.description for t in parsed.transactions],
+                    "amount": [t.amount for t in parsed.transactions],
+                    "date": [t.date for t in parsed.transactions]
+                })
+            else:
+                user_id, transactions = wire.decode_batch_request(body, request_format)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    except wire.WireFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     try:
-        categorizer = TransactionCategorizer(request.user_id)
-        
-        if not categorizer.is_trained():
-            raise HTTPException(
-                status_code=400,
-                detail="Model not trained. Please train the model first."
-            )
-        
-        # Convert Pydantic models to dicts
-        transactions = [t.dict() for t in request.transactions]
-        
         # Predict
-        results = categorizer.predict_batch(transactions)
+        columnar = response_format != wire.JSON
+        results = await in_worker(categorize_batch, user_id, transactions, columnar)
+        if not columnar:
+            return DefaultResponse({
+                "success": True,
+                "data": results
+            })
         
-        return {
-            "success": True,
-            "data": results
-        }
+        with metrics.stage_timer('api', 'serialize'):
+            return encoded_response(wire.encode_predictions(results, response_format), response_format)
     except HTTPException:
         raise
     except Exception as e:
@@ -164,17 +477,22 @@ async def predict_categories_batch(request: PredictBatchRequest):
 
 
 # Expense Forecasting Endpoints
-@app.post("/forecast/train")
+@app.post("/forecast/train", dependencies=[serves('forecaster')])
 async def train_forecaster(request: TrainForecasterRequest):
     """Train expense forecasting model for a user"""
+    def train():
+        with training_locks.hold(('forecaster', request.user_id)):
+            forecaster = engine('forecaster')(request.user_id)
+            result = forecaster.train(transactions)
+            model_cache.put('forecaster', request.user_id, forecaster)
+            return result
+    
     try:
-        forecaster = ExpenseForecaster(request.user_id)
-        
         # Convert Pydantic models to dicts
         transactions = [t.dict() for t in request.transactions]
         
         # Train model
-        result = forecaster.train(transactions)
+        result = await in_worker(train)
         
         return {
             "success": True,
@@ -188,28 +506,56 @@ async def train_forecaster(request: TrainForecasterRequest):
         raise HTTPException(status_code=500, detail="Failed to train forecasting model")
 
 
-@app.post("/forecast/predict")
-async def forecast_expenses(request: ForecastRequest):
-    """Forecast expenses for a user"""
+def forecast(user_id: str, category: Optional[str], periods: int, columnar: bool):
+    forecaster = get_forecaster(user_id, periods)
+    
+    if not forecaster.is_trained():
+        raise HTTPException(
+            status_code=400,
+            detail="Model not trained. Please train the model first."
+        )
+    
+    if category:
+        return forecaster.forecast_category(category, periods, columnar)
+    return forecaster.forecast_all(periods, columnar)
+
+
+@app.post("/forecast/predict", dependencies=[serves('forecaster')])
+async def forecast_expenses(request: Request):
+    """Forecast expenses for a user
+    
+    Takes a ForecastRequest as JSON or MessagePack. MessagePack and Arrow IPC
+    responses carry the daily forecast as columns (see services/wire.py).
+    """
+    request_format, response_format = negotiate_formats(request)
+    if request_format == wire.ARROW:
+        raise HTTPException(status_code=415, detail="Forecast requests must be JSON or MessagePack")
+    body = await request.body()
     try:
-        forecaster = ExpenseForecaster(request.user_id)
-        
-        if not forecaster.is_trained():
-            raise HTTPException(
-                status_code=400,
-                detail="Model not trained. Please train the model first."
-            )
-        
-        # Forecast
-        if request.category:
-            result = forecaster.forecast_category(request.category, request.periods)
+        if request_format == wire.JSON:
+            forecast_request = ForecastRequest.model_validate_json(body)
         else:
-            result = forecaster.forecast_all(request.periods)
+            forecast_request = ForecastRequest.model_validate(wire.unpack(body, request_format))
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    except wire.WireFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    columnar = response_format != wire.JSON
+    try:
+        key = (forecast_request.user_id, forecast_request.category, forecast_request.periods, columnar)
+        result = await in_worker(
+            forecast_flight.do, key, forecast, forecast_request.user_id, forecast_request.category,
+            forecast_request.periods, columnar
+        )
         
-        return {
-            "success": True,
-            "data": result
-        }
+        if not columnar:
+            return DefaultResponse({
+                "success": True,
+                "data": result
+            })
+        with metrics.stage_timer('api', 'serialize'):
+            return encoded_response(wire.encode_forecast(result, response_format), response_format)
     except HTTPException:
         raise
     except Exception as e:
@@ -217,23 +563,26 @@ async def forecast_expenses(request: ForecastRequest):
         raise HTTPException(status_code=500, detail="Failed to forecast expenses")
 
 
-@app.post("/forecast/next-month")
-async def forecast_next_month(request: BaseModel):
+def forecast_next_month_for(user_id: str) -> Dict:
+    forecaster = get_forecaster(user_id, services.ExpenseForecaster.days_to_next_month_end())
+    
+    if not forecaster.is_trained():
+        raise HTTPException(
+            status_code=400,
+            detail="Model not trained. Please train the model first."
+        )
+    
+    return forecaster.forecast_next_month()
+
+
+@app.post("/forecast/next-month", dependencies=[serves('forecaster')])
+async def forecast_next_month(request: ForecastNextMonthRequest):
     """Forecast expenses for the next month"""
     try:
-        user_id = request.dict().get('user_id')
-        if not user_id:
-            raise HTTPException(status_code=400, detail="user_id is required")
-        
-        forecaster = ExpenseForecaster(user_id)
-        
-        if not forecaster.is_trained():
-            raise HTTPException(
-                status_code=400,
-                detail="Model not trained. Please train the model first."
-            )
-        
-        result = forecaster.forecast_next_month()
+        user_id = request.user_id
+        result = await in_worker(
+            forecast_flight.do, (user_id, 'next-month'), forecast_next_month_for, user_id
+        )
         
         return {
             "success": True,
@@ -246,27 +595,100 @@ async def forecast_next_month(request: BaseModel):
         raise HTTPException(status_code=500, detail="Failed to forecast next month")
 
 
+# Admin Profiling Endpoints
+class ProfileRequestsRequest(BaseModel):
+    route: str
+    count: int = Field(default=10, ge=1, le=1000)
+    mode: str = "cprofile"
+    interval_ms: float = Field(default=5, ge=1, le=1000)
+
+
+@app.post("/admin/profile/requests", dependencies=[Depends(require_admin)])
+async def start_request_profile(request: ProfileRequestsRequest):
+    """Profile the next ``count`` requests to ``route`` (a route path such as /categorize/predict)"""
+    if request.mode not in PROFILING_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(PROFILING_MODES)}")
+    if request.route not in {route.path for route in app.router.routes}:
+        raise HTTPException(status_code=400, detail=f"Unknown route: {request.route}")
+    
+    capture = profiler.arm(request.route, request.count, request.mode, request.interval_ms / 1000)
+    return {"success": True, "data": capture.summary()}
+
+
+@app.get("/admin/profile/requests", dependencies=[Depends(require_admin)])
+async def list_request_profiles():
+    return {"success": True, "data": [c.summary() for c in profiler.captures.values()]}
+
+
+@app.get("/admin/profile/requests/{capture_id}", dependencies=[Depends(require_admin)])
+async def get_request_profile(capture_id: str, format: str = "summary"):
+    """Capture status, or its result as ``pstats`` (binary), ``text`` or ``collapsed`` stacks"""
+    capture = profiler.captures.get(capture_id)
+    if capture is None:
+        raise HTTPException(status_code=404, detail="Unknown profile")
+    if format == "summary":
+        return {"success": True, "data": capture.summary()}
+    if not capture.done:
+        raise HTTPException(status_code=409, detail=f"Profile incomplete: {capture.captured}/{capture.count} requests")
+    
+    if capture.mode == "cprofile" and format == "pstats":
+        return Response(pstats_bytes(capture.stats()), media_type="application/octet-stream", headers={
+            "Content-Disposition": f'attachment; filename="profile-{capture.id}.pstats"'
+        })
+    if capture.mode == "cprofile" and format == "text":
+        return PlainTextResponse(pstats_text(capture.stats()))
+    if capture.mode == "sample" and format == "collapsed":
+        return PlainTextResponse(capture.collapsed())
+    raise HTTPException(status_code=400, detail=f"Format {format} is not available for {capture.mode} profiles")
+
+
+@app.post("/admin/profile/sample", dependencies=[Depends(require_admin)])
+async def sample_profile(seconds: float = 10, interval_ms: float = 5):
+    """Sample every thread's stack for ``seconds`` and return collapsed stacks"""
+    if not 0 < seconds <= 300 or not 1 <= interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail="seconds must be in (0, 300] and interval_ms in [1, 1000]")
+    
+    sampler = StackSampler(interval_ms / 1000).start()
+    try:
+        # The event loop keeps serving requests while they are sampled
+        await asyncio.sleep(seconds)
+    finally:
+        sampler.stop()
+    return PlainTextResponse(sampler.collapsed(), headers={"X-Samples": str(sampler.samples)})
+
+
 # Model Status Endpoints
+def model_status(user_id: str) -> Dict:
+    data = {"user_id": user_id}
+    
+    if 'categorizer' in SERVED_KINDS:
+        categorizer = model_cache.get('categorizer', user_id)
+        data["categorizer"] = {
+            "trained": categorizer.is_trained(),
+            "version": categorizer.version,
+            "categories": list(categorizer.classifier.classes_) if categorizer.is_trained() else []
+        }
+    
+    if 'forecaster' in SERVED_KINDS:
+        forecaster = model_cache.get('forecaster', user_id)
+        data["forecaster"] = {
+            "trained": forecaster.is_trained(),
+            "version": forecaster.version,
+            "categories": list(forecaster.models.keys()) if forecaster.is_trained() else []
+        }
+    
+    return data
+
+
 @app.get("/models/status/{user_id}")
 async def get_model_status(user_id: str):
-    """Get status of ML models for a user"""
+    """Get status of the ML models this replica serves for a user"""
     try:
-        categorizer = TransactionCategorizer(user_id)
-        forecaster = ExpenseForecaster(user_id)
+        data = await in_worker(status_flight.do, user_id, model_status, user_id)
         
         return {
             "success": True,
-            "data": {
-                "user_id": user_id,
-                "categorizer": {
-                    "trained": categorizer.is_trained(),
-                    "categories": list(categorizer.classifier.classes_) if categorizer.is_trained() else []
-                },
-                "forecaster": {
-                    "trained": forecaster.is_trained(),
-                    "categories": list(forecaster.models.keys()) if forecaster.is_trained() else []
-                }
-            }
+            "data": data
         }
     except Exception as e:
         logger.error(f"Error getting model status: {e}")
@@ -0,0 +1,113 @@
+"""
+Forecast Materialization Script
+Precompute each user's daily forecasts into the forecast store, which the API
+serves before falling back to live Prophet prediction. continuous_learning.py
+runs this after every training cycle; run it by hand after training users
+some other way, or to fill the store for the first time.
+
+Usage:
+    python materialize_forecasts.py                  # users without a current entry
+    python materialize_forecasts.py --all            # every trained user
+    python materialize_forecasts.py --users USER_ID
+"""
+import argparse
+import logging
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent))
+
+from config import FORECAST_MATERIALIZE_DAYS, FORECAST_MATERIALIZE_WORKERS
+from services.expense_forecaster import ExpenseForecaster
+from services.forecast_store import ForecastStore
+from services.model_store import published_users
+
+logger = logging.getLogger(__name__)
+
+
+def materialize_user(user_id: str, horizon: int = FORECAST_MATERIALIZE_DAYS) -> Dict:
+    """Forecast one user's categories for ``horizon`` days and save them (runs in a worker process)"""
+    start = time.perf_counter()
+    forecaster = ExpenseForecaster(user_id)
+    if not forecaster.is_trained():
+        return {"user_id": user_id, "status": "not_trained"}
+    categories = forecaster.materialize(ForecastStore(), horizon)
+    return {
+        "user_id": user_id,
+        "status": "materialized",
+        "categories": categories,
+        "seconds": round(time.perf_counter() - start, 4)
+    }
+
+
+def materialize_users(user_ids: List[str], horizon: int = FORECAST_MATERIALIZE_DAYS,
+                      workers: int = FORECAST_MATERIALIZE_WORKERS) -> Dict[str, Dict]:
+    """Materialize several users' forecasts across ``workers`` processes; returns ``{user_id: result}``"""
+    results = {}
+    if workers <= 1 or len(user_ids) <= 1:
+        for user_id in user_ids:
+            try:
+                results[user_id] = materialize_user(user_id, horizon)
+            except Exception as e:
+                logger.error(f"Error materializing forecasts for user {user_id}: {e}")
+                results[user_id] = {"user_id": user_id, "status": "failed", "error": str(e)}
+        return results
+    
+    with ProcessPoolExecutor(max_workers=min(workers, len(user_ids))) as pool:
+        futures = {user_id: pool.submit(materialize_user, user_id, horizon) for user_id in user_ids}
+        for user_id, future in futures.items():
+            try:
+                results[user_id] = future.result()
+            except Exception as e:
+                logger.error(f"Error materializing forecasts for user {user_id}: {e}")
+                results[user_id] = {"user_id": user_id, "status": "failed", "error": str(e)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute forecasts for the API to serve')
+    parser.add_argument('--users', nargs='+', help='Materialize these user IDs')
+    parser.add_argument('--all', action='store_true',
+                        help='Materialize every trained user, not only those without a current entry')
+    parser.add_argument('--horizon', type=int, default=FORECAST_MATERIALIZE_DAYS,
+                        help=f'Days to forecast (default: {FORECAST_MATERIALIZE_DAYS})')
+    parser.add_argument('--workers', type=int, default=FORECAST_MATERIALIZE_WORKERS,
+                        help=f'Worker processes (default: {FORECAST_MATERIALIZE_WORKERS})')
+    args = parser.parse_args()
+    
+    if args.users:
+        users = args.users
+    else:
+        users = published_users("forecaster_")
+        if not args.all:
+            users = ForecastStore().stale_users(users)
+    
+    print("\n" + "="*60)
+    print("MATERIALIZING FORECASTS")
+    print("="*60)
+    print(f"{len(users)} users, {args.horizon} days, {args.workers} workers")
+    
+    start = time.perf_counter()
+    results = materialize_users(users, args.horizon, args.workers)
+    seconds = time.perf_counter() - start
+    
+    counts = {}
+    for result in results.values():
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    
+    print("\n" + "="*60)
+    print("MATERIALIZATION SUMMARY")
+    print("="*60)
+    print(f"[SUCCESS] Materialized: {counts.get('materialized', 0)} users")
+    print(f"[WARNING] Not trained: {counts.get('not_trained', 0)} users")
+    print(f"[ERROR] Failed: {counts.get('failed', 0)} users")
+    print(f"Time: {seconds:.1f}s")
+    print("="*60 + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Event-driven retraining trigger
+Tails new transactions (MongoDB change streams, or an _id high-water-mark poll when
+change streams are unavailable) and fires a debounced retrain per user once enough
+new transactions have arrived
+"""
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+class RetrainTrigger:
+    """Counts new transactions per user and enqueues debounced retrains
+    
+    A user is queued once their new-transaction count reaches ``threshold`` and no
+    further transactions have arrived for ``debounce_seconds`` (so a bulk import
+    triggers one retrain, not many), but never later than ``max_delay_seconds``
+    after crossing the threshold.
+    """
+    
+    def __init__(self, db, on_retrain: Callable[[str], object], threshold: int = 20,
+                 debounce_seconds: float = 60, max_delay_seconds: float = 600,
+                 poll_interval: float = 5, batch_size: int = 1000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.db = db
+        self.on_retrain = on_retrain
+        self.threshold = threshold
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.clock = clock
+        
+        self.new_counts: Dict[str, int] = defaultdict(int)
+        self.last_event: Dict[str, float] = {}
+        self.crossed_at: Dict[str, float] = {}
+        self.high_water_mark = None
+        
+        self.retrain_queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self.stop_event = threading.Event()
+        self._lock = threading.Lock()
+    
+    # Counting and debouncing
+    
+    def record(self, user_id: str, count: int = 1):
+        """Register new transactions for a user"""
+        now = self.clock()
+        with self._lock:
+            self.new_counts[user_id] += count
+            self.last_event[user_id] = now
+            if self.new_counts[user_id] >= self.threshold and user_id not in self.crossed_at:
+                self.crossed_at[user_id] = now
+    
+    def due_users(self) -> List[str]:
+        """Users whose debounce window has elapsed; their counters are reset"""
+        now = self.clock()
+        due = []
+        with self._lock:
+            for user_id, crossed in list(self.crossed_at.items()):
+                quiet = now - self.last_event[user_id] >= self.debounce_seconds
+                overdue = now - crossed >= self.max_delay_seconds
+                if quiet or overdue:
+                    due.append(user_id)
+                    del self.crossed_at[user_id]
+                    self.new_counts.pop(user_id, None)
+                    self.last_event.pop(user_id, None)
+        return due
+    
+    def enqueue_due(self) -> List[str]:
+        """Move due users onto the retrain queue"""
+        due = self.due_users()
+        for user_id in due:
+            logger.info(f"User {user_id}: {self.threshold}+ new transactions, queueing retrain")
+            self.retrain_queue.put(user_id)
+        return due
+    
+    # Sources
+    
+    def init_high_water_mark(self):
+        """Start polling after the newest existing transaction"""
+        latest = self.db.transactions.find_one({}, {'_id': 1}, sort=[('_id', -1)])
+        self.high_water_mark = latest['_id'] if latest else None
+    
+    def advance_high_water_mark(self, _id):
+        """Move the mark past a transaction already counted, so a fallback to polling skips it"""
+        if self.high_water_mark is None or _id > self.high_water_mark:
+            self.high_water_mark = _id
+    
+    def poll_once(self) -> int:
+        """Count transactions inserted since the high-water mark"""
+        query = {'_id': {'$gt': self.high_water_mark}} if self.high_water_mark is not None else {}
+        cursor = self.db.transactions.find(query, {'_id': 1, 'userId': 1}) \
+            .sort('_id', 1).limit(self.batch_size)
+        
+        seen = 0
+        batch_counts: Dict[str, int] = defaultdict(int)
+        for doc in cursor:
+            batch_counts[str(doc.get('userId'))] += 1
+            self.high_water_mark = doc['_id']
+            seen += 1
+        
+        for user_id, count in batch_counts.items():
+            self.record(user_id, count)
+        return seen
+    
+    def run_polling(self):
+        """High-water-mark polling loop"""
+        logger.info(f"Polling transactions every {self.poll_interval}s")
+        if self.high_water_mark is None:
+            self.init_high_water_mark()
+        
+        while not self.stop_event.is_set():
+            # Drain backlogs without sleeping between full batches
+            while self.poll_once() == self.batch_size:
+                pass
+            self.enqueue_due()
+            self.stop_event.wait(self.poll_interval)
+    
+    def run_change_stream(self):
+        """Change stream loop; raises if the deployment does not support it"""
+        pipeline = [{'$match': {'operationType': 'insert'}}]
+        with self.db.transactions.watch(pipeline, max_await_time_ms=int(self.poll_interval * 1000)) as stream:
+            logger.info("Watching transactions change stream")
+            while not self.stop_event.is_set() and stream.alive:
+                change = stream.try_next()
+                while change is not None:
+                    self.record(str(change['fullDocument'].get('userId')))
+                    self.advance_high_water_mark(change['documentKey']['_id'])
+                    change = stream.try_next()
+                self.enqueue_due()
+    
+    def run(self):
+        """Tail new transactions until stopped, preferring change streams"""
+        if self.high_water_mark is None:
+            self.init_high_water_mark()
+        
+        # In-memory stand-ins such as mongomock have no watch() at all
+        if not hasattr(type(self.db.transactions), 'watch'):
+            self.run_polling()
+            return
+        
+        try:
+            self.run_change_stream()
+        except (OperationFailure, NotImplementedError) as e:
+            # Standalone mongod has no change streams
+            logger.warning(f"Change streams unavailable ({e}), falling back to polling")
+            self.run_polling()
+        except PyMongoError as e:
+            logger.error(f"Change stream failed ({e}), falling back to polling")
+            self.run_polling()
+    
+    # Retrain worker
+    
+    def run_worker(self):
+        """Run queued retrains one at a time until stopped"""
+        while True:
+            user_id = self.retrain_queue.get()
+            if user_id is None:
+                break
+            try:
+                self.on_retrain(user_id)
+            except Exception as e:
+                logger.error(f"Error retraining user {user_id}: {e}", exc_info=True)
+            finally:
+                self.retrain_queue.task_done()
+    
+    def start(self) -> List[threading.Thread]:
+        """Start the watcher and worker threads"""
+        threads = [
+            threading.Thread(target=self.run, name="retrain-watcher", daemon=True),
+            threading.Thread(target=self.run_worker, name="retrain-worker", daemon=True)
+        ]
+        for thread in threads:
+            thread.start()
+        return threads
+    
+    def stop(self):
+        """Stop watching and let the worker finish its current retrain"""
+        self.stop_event.set()
+        self.retrain_queue.put(None)
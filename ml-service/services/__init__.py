@@ -1,5 +1,18 @@
 # Services package
-from .transaction_categorizer import TransactionCategorizer
-from .expense_forecaster import ExpenseForecaster
+# The engines are imported on first access (PEP 562), so importing a light
+# module such as services.metrics does not pull in scikit-learn or Prophet
+import importlib
 
-__all__ = ['TransactionCategorizer', 'ExpenseForecaster']
+_ENGINES = {
+    'TransactionCategorizer': '.transaction_categorizer',
+    'ExpenseForecaster': '.expense_forecaster',
+    'MaterializedForecaster': '.expense_forecaster',
+}
+
+__all__ = ['TransactionCategorizer', 'ExpenseForecaster', 'MaterializedForecaster']
+
+
+def __getattr__(name):
+    if name in _ENGINES:
+        return getattr(importlib.import_module(_ENGINES[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
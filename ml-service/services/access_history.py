@@ -0,0 +1,133 @@
+"""
+Persistent record of which users' models are requested
+Each ``(kind, user_id)`` keeps an exponentially decayed request count and its
+last access time, so a user requested often and recently ranks first and
+inactive users fade out. The record is flushed to a small JSON file and used
+at startup to prewarm the model cache in priority order.
+
+Several worker processes may flush to the same file; each merges its new
+accesses into what is on disk, so concurrent flushes can at worst drop a few
+counts from a heuristic ranking.
+"""
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+
+from config import ACCESS_HISTORY_FILE, ACCESS_HISTORY_HALF_LIFE_HOURS, ACCESS_HISTORY_MAX_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+
+class AccessHistory:
+    """Decayed access counts per ``(kind, user_id)``, persisted to ``path``"""
+    
+    def __init__(self, path: Path = ACCESS_HISTORY_FILE, half_life_hours: float = ACCESS_HISTORY_HALF_LIFE_HOURS,
+                 max_entries: int = ACCESS_HISTORY_MAX_ENTRIES):
+        self.path = Path(path)
+        self.decay_rate = math.log(2) / (half_life_hours * 3600)
+        self.max_entries = max_entries
+        # kind -> user_id -> [score, last access]; accesses since the last flush
+        self._pending: Dict[str, Dict[str, List[float]]] = {}
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._stop = threading.Event()
+    
+    def _decayed(self, score: float, since: float, now: float) -> float:
+        return score * math.exp(-self.decay_rate * max(0.0, now - since))
+    
+    def _add(self, entries: Dict[str, Dict[str, List[float]]], kind: str, user_id: str, score: float,
+             at: float):
+        current = entries.setdefault(kind, {}).get(user_id)
+        if current is None:
+            entries[kind][user_id] = [score, at]
+        else:
+            last = max(current[1], at)
+            entries[kind][user_id] = [self._decayed(current[0], current[1], last) +
+                                      self._decayed(score, at, last), last]
+    
+    def record(self, kind: str, user_id: str):
+        """Count one request for a user's model"""
+        with self._lock:
+            self._add(self._pending, kind, user_id, 1.0, time.time())
+    
+    def load(self) -> Dict[str, Dict[str, List[float]]]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable access history {self.path}: {e}")
+            return {}
+    
+    def flush(self):
+        """Merge accesses since the last flush into the file"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        
+        entries = self.load()
+        for kind, users in pending.items():
+            for user_id, (score, at) in users.items():
+                self._add(entries, kind, user_id, score, at)
+        
+        # Keep the highest-ranked entries only
+        now = time.time()
+        ranked = sorted(
+            ((self._decayed(score, at, now), kind, user_id, at)
+             for kind, users in entries.items() for user_id, (score, at) in users.items()),
+            reverse=True
+        )[:self.max_entries]
+        compact: Dict[str, Dict[str, List[float]]] = {}
+        for score, kind, user_id, at in ranked:
+            compact.setdefault(kind, {})[user_id] = [round(score, 4), round(at, 1)]
+        
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f".{self.path.name}.{uuid.uuid4().hex[:8]}.tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump(compact, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Error saving access history: {e}")
+    
+    def ranked(self, kinds: Optional[Sequence[str]] = None) -> List[Tuple[str, str]]:
+        """``(kind, user_id)`` pairs from the file and this process, highest priority first"""
+        entries = self.load()
+        with self._lock:
+            for kind, users in self._pending.items():
+                for user_id, (score, at) in users.items():
+                    self._add(entries, kind, user_id, score, at)
+        
+        now = time.time()
+        scored = [
+            (self._decayed(score, at, now), kind, user_id)
+            for kind, users in entries.items() if kinds is None or kind in kinds
+            for user_id, (score, at) in users.items()
+        ]
+        return [(kind, user_id) for _, kind, user_id in sorted(scored, reverse=True)]
+    
+    def start(self, interval: float):
+        """Flush every ``interval`` seconds from a daemon thread"""
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        self._stop.clear()
+        
+        def run():
+            while not self._stop.wait(interval):
+                self.flush()
+        
+        self._flusher = threading.Thread(target=run, name="access-history", daemon=True)
+        self._flusher.start()
+    
+    def stop(self):
+        """Stop the flusher and write what is pending"""
+        self._stop.set()
+        self.flush()
@@ -0,0 +1,97 @@
+"""Classifier backends for transaction categorization"""
+import json
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.preprocessing import LabelEncoder
+from sklearn.utils.class_weight import compute_sample_weight
+
+
+class XGBoostCategoryClassifier(ClassifierMixin, BaseEstimator):
+    """Gradient-boosted trees (XGBoost ``hist``) with a scikit-learn style interface
+    
+    Labels are encoded internally so callers can keep passing category names, and
+    the fitted model is persisted in XGBoost's own UBJSON format instead of pickle.
+    """
+    
+    def __init__(self, n_estimators: int = 300, max_depth: int = 6, learning_rate: float = 0.1,
+                 n_jobs: int = -1, early_stopping_rounds: int = 20, random_state: int = 42):
+        self.n_estimators = n_estimators
+        self.max_depth = max_depth
+        self.learning_rate = learning_rate
+        self.n_jobs = n_jobs
+        self.early_stopping_rounds = early_stopping_rounds
+        self.random_state = random_state
+        
+        self.model = None
+        self.label_encoder = LabelEncoder()
+    
+    @property
+    def classes_(self) -> np.ndarray:
+        if self.model is None:
+            raise AttributeError("classes_")
+        return self.label_encoder.classes_
+    
+    @property
+    def best_iteration(self) -> Optional[int]:
+        return getattr(self.model, 'best_iteration', None)
+    
+    def _build_model(self, early_stopping: bool):
+        from xgboost import XGBClassifier
+        
+        return XGBClassifier(
+            n_estimators=self.n_estimators,
+            max_depth=self.max_depth,
+            learning_rate=self.learning_rate,
+            tree_method='hist',
+            n_jobs=self.n_jobs,
+            random_state=self.random_state,
+            early_stopping_rounds=self.early_stopping_rounds if early_stopping else None
+        )
+    
+    def fit(self, X, y, eval_set: Optional[Tuple] = None):
+        """Fit on (sparse) features, early-stopping on ``eval_set`` when given"""
+        y_encoded = self.label_encoder.fit_transform(y)
+        
+        # Mirror the forest's class_weight='balanced'
+        sample_weight = compute_sample_weight('balanced', y_encoded)
+        
+        self.model = self._build_model(early_stopping=eval_set is not None)
+        if eval_set is not None:
+            X_eval, y_eval = eval_set
+            self.model.fit(
+                X, y_encoded,
+                sample_weight=sample_weight,
+                eval_set=[(X_eval, self.label_encoder.transform(y_eval))],
+                verbose=False
+            )
+        else:
+            self.model.fit(X, y_encoded, sample_weight=sample_weight, verbose=False)
+        
+        return self
+    
+    def predict_proba(self, X) -> np.ndarray:
+        return self.model.predict_proba(X)
+    
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+    
+    def save(self, path: Path):
+        """Save booster and label classes to a single UBJSON file"""
+        booster = self.model.get_booster()
+        booster.set_attr(category_classes=json.dumps([str(c) for c in self.classes_]))
+        self.model.save_model(str(path))
+    
+    @classmethod
+    def load(cls, path: Path) -> "XGBoostCategoryClassifier":
+        """Load a classifier written by :meth:`save`"""
+        from xgboost import XGBClassifier
+        
+        instance = cls()
+        instance.model = XGBClassifier()
+        instance.model.load_model(str(path))
+        classes = json.loads(instance.model.get_booster().attr('category_classes'))
+        instance.label_encoder.classes_ = np.array(classes, dtype=object)
+        return instance
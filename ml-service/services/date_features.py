@@ -0,0 +1,52 @@
+"""Shared date parsing and calendar features for transactions"""
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+# Column order of calendar_features()
+CALENDAR_FEATURES = ('hour', 'day_of_week', 'day', 'month')
+
+
+def _factorize_dates(values) -> Tuple[np.ndarray, pd.DatetimeIndex]:
+    """Return (codes, distinct parsed dates); missing values get code -1"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        codes, uniques = pd.factorize(pd.DatetimeIndex(values))
+        return codes, pd.DatetimeIndex(uniques)
+
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    return codes, pd.to_datetime(uniques, format='ISO8601')
+
+
+def parse_dates(values) -> pd.DatetimeIndex:
+    """Parse ISO-8601 date strings, parsing each distinct value only once
+
+    Transactions share a small set of distinct dates, so the values are factorized
+    first and only the uniques go through ``pd.to_datetime``. Missing values
+    become ``NaT``.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return pd.DatetimeIndex(values)
+
+    codes, parsed = _factorize_dates(values)
+
+    # A trailing NaT slot lets missing values (code -1) index straight into it
+    table = np.append(parsed.values, np.datetime64('NaT'))
+    return pd.DatetimeIndex(table[codes])
+
+
+def calendar_features(values) -> np.ndarray:
+    """Hour, day of week, day of month and month as one ``(n, 4)`` int array
+
+    Features are computed once per distinct date and gathered by index into a
+    preallocated table. Missing dates map to a row of zeros.
+    """
+    codes, parsed = _factorize_dates(values)
+
+    table = np.zeros((len(parsed) + 1, len(CALENDAR_FEATURES)), dtype=np.int32)
+    table[:-1, 0] = parsed.hour
+    table[:-1, 1] = parsed.dayofweek
+    table[:-1, 2] = parsed.day
+    table[:-1, 3] = parsed.month
+
+    return table[codes]
@@ -5,10 +5,18 @@ from prophet import Prophet
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import joblib
+import time
 from pathlib import Path
 import logging
 
-from config import MODEL_PATH, MIN_TRANSACTIONS_FOR_TRAINING
+from config import (
+    MODEL_PATH, MIN_TRANSACTIONS_FOR_TRAINING, FORECAST_BATCHED, FORECAST_WARM_START, FORECAST_MATERIALIZE_DAYS
+)
+from services import batch_forecast, warm_start
+from services.date_features import parse_dates
+from services.forecast_store import ForecastStore
+from services.model_store import ModelStore
+from services.metrics import stage_timer, record_training
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +28,8 @@ class ExpenseForecaster:
         self.user_id = user_id
         self.model_dir = MODEL_PATH / f"forecaster_{user_id}"
         self.model_dir.mkdir(exist_ok=True, parents=True)
+        self.store = ModelStore(self.model_dir)
+        self.version = None
         
         # Models for different categories
         self.models = {}
@@ -36,8 +46,8 @@ class ExpenseForecaster:
         if category:
             df = df[df['category'] == category]
         
-        # Convert date to datetime
-        df['date'] = pd.to_datetime(df['date'])
+        # Convert date to datetime (no-op if already parsed by train())
+        df['date'] = parse_dates(df['date'].values)
         
         # Group by date and sum amounts
         daily_data = df.groupby('date').agg({
@@ -55,9 +65,11 @@ class ExpenseForecaster:
     def train_category_model(self, transactions: List[Dict], category: str) -> Dict:
         """Train forecasting model for a specific category"""
         logger.info(f"Training forecaster for user {self.user_id}, category: {category}")
+        start = time.perf_counter()
         
         # Prepare data
-        df = self.prepare_data(transactions, category)
+        with stage_timer('forecaster', 'prepare'):
+            df = self.prepare_data(transactions, category)
         
         if len(df) < 30:  # Need at least 30 days of data
             logger.warning(f"Insufficient data for category {category}: {len(df)} days")
@@ -76,8 +88,19 @@ class ExpenseForecaster:
             seasonality_prior_scale=10.0
         )
         
+        # Start the optimizer from the previous version's fit when its settings match
+        init = warm_start.init_params(self.models.get(category), model, df) if FORECAST_WARM_START else None
+        
         # Fit model
-        model.fit(df)
+        fit_start = time.perf_counter()
+        with stage_timer('forecaster', 'fit'):
+            if init is not None:
+                model.fit(df, init=init)
+            else:
+                model.fit(df)
+        fit_seconds = time.perf_counter() - fit_start
+        training_seconds = time.perf_counter() - start
+        record_training('forecaster', training_seconds)
         
         # Store model and statistics
         self.models[category] = model
@@ -93,7 +116,11 @@ class ExpenseForecaster:
             "category": category,
             "status": "trained",
             "days_of_data": len(df),
-            "mean_daily_expense": float(df['y'].mean())
+            "mean_daily_expense": float(df['y'].mean()),
+            "warm_start": init is not None,
+            "fit_seconds": round(fit_seconds, 4),
+            "training_seconds": round(training_seconds, 4),
+            "optimizer_iterations": warm_start.optimizer_iterations(model)
         }
     
     def train(self, transactions: List[Dict]) -> Dict:
@@ -104,6 +131,9 @@ class ExpenseForecaster:
             raise ValueError(f"Need at least {MIN_TRANSACTIONS_FOR_TRAINING} transactions to train")
         
         df = pd.DataFrame(transactions)
+        
+        # Parse dates once for all categories
+        df['date'] = parse_dates(df['date'].values)
         categories = df['category'].unique()
         
         results = []
@@ -120,61 +150,115 @@ class ExpenseForecaster:
             "categories_trained": len([r for r in results if r['status'] == 'trained']),
             "total_categories": len(categories),
             "results": results,
+            "fit_summary": self.fit_summary(results),
             "trained_at": datetime.now().isoformat()
         }
     
-    def forecast_category(self, category: str, periods: int = 30) -> Dict:
-        """Forecast expenses for a specific category"""
-        if category not in self.models:
+    @staticmethod
+    def fit_summary(results: List[Dict]) -> Dict:
+        """Fit count, seconds and optimizer iterations of warm- and cold-started category fits"""
+        summary = {}
+        for mode in ('warm', 'cold'):
+            fits = [r for r in results if r['status'] == 'trained' and r['warm_start'] == (mode == 'warm')]
+            iterations = [r['optimizer_iterations'] for r in fits if r['optimizer_iterations'] is not None]
+            summary[mode] = {
+                "fits": len(fits),
+                "fit_seconds": round(sum(r['fit_seconds'] for r in fits), 4),
+                "optimizer_iterations": sum(iterations)
+            }
+        return summary
+    
+    def trained_categories(self) -> List[str]:
+        """Categories that can be forecast"""
+        return list(self.models.keys())
+    
+    def forecast_category(self, category: str, periods: int = 30, columnar: bool = False) -> Dict:
+        """Forecast expenses for a specific category
+        
+        With ``columnar`` the daily forecast is a dict of equal-length lists
+        (date, predicted_amount, lower_bound, upper_bound) instead of one dict
+        per day.
+        """
+        if category not in self.trained_categories():
             return {
                 "category": category,
                 "status": "not_trained",
                 "forecast": []
             }
         
-        model = self.models[category]
-        
-        # Create future dataframe
-        future = model.make_future_dataframe(periods=periods)
-        
-        # Make predictions
-        forecast = model.predict(future)
+        return self.forecast_categories([category], periods, columnar)[category]
+    
+    def predict_categories(self, categories: List[str], periods: int = 30) -> Dict:
+        """Raw daily predictions per category: ``{ds, yhat, yhat_lower, yhat_upper}``
+        
+        Models batch_forecast supports are evaluated together from their fitted
+        parameters; any others (or all, with FORECAST_BATCHED=false) go through
+        Prophet's predict one by one.
+        """
+        batched = {
+            category: self.models[category] for category in categories
+            if FORECAST_BATCHED and batch_forecast.supports(self.models[category])
+        }
         
-        # Get only future predictions
-        forecast_future = forecast.tail(periods)
+        with stage_timer('forecaster', 'predict'):
+            predictions = batch_forecast.forecast(batched, periods)
         
-        # Prepare forecast data
-        forecast_data = []
-        for _, row in forecast_future.iterrows():
-            forecast_data.append({
-                "date": row['ds'].strftime('%Y-%m-%d'),
-                "predicted_amount": float(max(0, row['yhat'])),  # Ensure non-negative
-                "lower_bound": float(max(0, row['yhat_lower'])),
-                "upper_bound": float(max(0, row['yhat_upper']))
-            })
+        for category in categories:
+            if category in predictions:
+                continue
+            model = self.models[category]
+            
+            # Create future dataframe
+            with stage_timer('forecaster', 'future_frame'):
+                future = model.make_future_dataframe(periods=periods, include_history=False)
+            
+            # Make predictions
+            with stage_timer('forecaster', 'predict'):
+                forecast = model.predict(future)
+            predictions[category] = {
+                "ds": forecast['ds'],
+                "yhat": forecast['yhat'].values,
+                "yhat_lower": forecast['yhat_lower'].values,
+                "yhat_upper": forecast['yhat_upper'].values
+            }
+        return predictions
+    
+    def forecast_categories(self, categories: List[str], periods: int = 30, columnar: bool = False) -> Dict:
+        """Forecast several trained categories in one pass (see predict_categories)"""
+        predictions = self.predict_categories(categories, periods)
         
-        # Calculate monthly aggregate
-        monthly_total = sum(item['predicted_amount'] for item in forecast_data)
+        results = {}
+        for category in categories:
+            prediction = predictions[category]
+            
+            # Prepare forecast data (amounts clipped to be non-negative)
+            with stage_timer('forecaster', 'format'):
+                daily = {
+                    "date": pd.DatetimeIndex(prediction['ds']).strftime('%Y-%m-%d').tolist(),
+                    "predicted_amount": np.maximum(prediction['yhat'], 0).tolist(),
+                    "lower_bound": np.maximum(prediction['yhat_lower'], 0).tolist(),
+                    "upper_bound": np.maximum(prediction['yhat_upper'], 0).tolist()
+                }
+                if columnar:
+                    forecast_data = daily
+                else:
+                    forecast_data = [dict(zip(daily, values)) for values in zip(*daily.values())]
+            
+            results[category] = {
+                "category": category,
+                "status": "success",
+                "forecast_days": periods,
+                "daily_forecast": forecast_data,
+                "monthly_total": sum(daily['predicted_amount']),
+                "statistics": self.category_stats.get(category, {})
+            }
         
-        return {
-            "category": category,
-            "status": "success",
-            "forecast_days": periods,
-            "daily_forecast": forecast_data,
-            "monthly_total": monthly_total,
-            "statistics": self.category_stats.get(category, {})
-        }
+        return results
     
-    def forecast_all(self, periods: int = 30) -> Dict:
-        """Forecast expenses for all categories"""
-        forecasts = {}
-        total_forecast = 0
-        
-        for category in self.models.keys():
-            forecast = self.forecast_category(category, periods)
-            if forecast['status'] == 'success':
-                forecasts[category] = forecast
-                total_forecast += forecast['monthly_total']
+    def forecast_all(self, periods: int = 30, columnar: bool = False) -> Dict:
+        """Forecast expenses for all categories (see forecast_category for ``columnar``)"""
+        forecasts = self.forecast_categories(self.trained_categories(), periods, columnar)
+        total_forecast = sum(forecast['monthly_total'] for forecast in forecasts.values())
         
         # Generate insights
         insights = self.generate_insights(forecasts)
@@ -188,17 +272,19 @@ class ExpenseForecaster:
             "generated_at": datetime.now().isoformat()
         }
     
-    def forecast_next_month(self) -> Dict:
-        """Forecast expenses for the next month"""
-        # Calculate days until end of next month
+    @staticmethod
+    def days_to_next_month_end() -> int:
+        """Days from now until the end of next month"""
         today = datetime.now()
         next_month = today.replace(day=28) + timedelta(days=4)
         last_day_next_month = next_month.replace(day=1) + timedelta(days=32)
         last_day_next_month = last_day_next_month.replace(day=1) - timedelta(days=1)
         
-        days_to_forecast = (last_day_next_month - today).days
-        
-        return self.forecast_all(periods=days_to_forecast)
+        return (last_day_next_month - today).days
+    
+    def forecast_next_month(self) -> Dict:
+        """Forecast expenses for the next month"""
+        return self.forecast_all(periods=self.days_to_next_month_end())
     
     def generate_insights(self, forecasts: Dict) -> List[str]:
         """Generate insights from forecasts"""
@@ -245,16 +331,19 @@ class ExpenseForecaster:
         return insights
     
     def save_models(self):
-        """Save all models to disk"""
+        """Save all models to disk as a new version, published atomically"""
+        staging_dir = None
         try:
+            staging_dir = self.store.stage()
+            
             # Save each category model
             for category, model in self.models.items():
                 safe_category = category.replace('/', '_').replace('\\', '_')
-                model_path = self.model_dir / f"model_{safe_category}.pkl"
+                model_path = staging_dir / f"model_{safe_category}.pkl"
                 joblib.dump(model, model_path)
             
             # Save statistics
-            stats_path = self.model_dir / "category_stats.pkl"
+            stats_path = staging_dir / "category_stats.pkl"
             joblib.dump(self.category_stats, stats_path)
             
             # Save metadata
@@ -263,20 +352,37 @@ class ExpenseForecaster:
                 "categories": list(self.models.keys()),
                 "saved_at": datetime.now().isoformat()
             }
-            joblib.dump(metadata, self.model_dir / "metadata.pkl")
+            joblib.dump(metadata, staging_dir / "metadata.pkl")
             
-            logger.info(f"Forecaster models saved to {self.model_dir}")
+            self.version = self.store.publish(staging_dir)
+            logger.info(f"Forecaster models saved to {self.model_dir} (version {self.version})")
         except Exception as e:
+            if staging_dir is not None:
+                self.store.discard(staging_dir)
             logger.error(f"Error saving forecaster models: {e}")
     
+    @staticmethod
+    def load_category_stats(user_id: str) -> Dict:
+        """Daily spend statistics of a user's current version, without loading the models"""
+        store = ModelStore(MODEL_PATH / f"forecaster_{user_id}")
+        _, version_dir = store.resolve(legacy_marker="metadata.pkl")
+        if version_dir is None or not (version_dir / "category_stats.pkl").exists():
+            return {}
+        return joblib.load(version_dir / "category_stats.pkl")
+    
     def load_models(self) -> bool:
-        """Load models from disk"""
+        """Load the current model version from disk"""
+        with stage_timer('forecaster', 'load'):
+            return self._load_models()
+    
+    def _load_models(self) -> bool:
         try:
-            metadata_path = self.model_dir / "metadata.pkl"
-            stats_path = self.model_dir / "category_stats.pkl"
-            
-            if not metadata_path.exists():
+            # Every artifact comes from the one version resolved here
+            version, version_dir = self.store.resolve(legacy_marker="metadata.pkl")
+            if version_dir is None:
                 return False
+            metadata_path = version_dir / "metadata.pkl"
+            stats_path = version_dir / "category_stats.pkl"
             
             # Load metadata
             metadata = joblib.load(metadata_path)
@@ -288,12 +394,13 @@ class ExpenseForecaster:
             # Load each category model
             for category in metadata.get('categories', []):
                 safe_category = category.replace('/', '_').replace('\\', '_')
-                model_path = self.model_dir / f"model_{safe_category}.pkl"
+                model_path = version_dir / f"model_{safe_category}.pkl"
                 
                 if model_path.exists():
                     self.models[category] = joblib.load(model_path)
             
-            logger.info(f"Loaded {len(self.models)} forecaster models from {self.model_dir}")
+            self.version = version
+            logger.info(f"Loaded {len(self.models)} forecaster models from {self.model_dir} (version {version})")
             return True
         except Exception as e:
             logger.error(f"Error loading forecaster models: {e}")
@@ -301,4 +408,51 @@ class ExpenseForecaster:
     
     def is_trained(self) -> bool:
         """Check if any models are trained"""
-        return len(self.models) > 0
+        return len(self.trained_categories()) > 0
+    
+    def materialize(self, store: ForecastStore, horizon: int = FORECAST_MATERIALIZE_DAYS) -> int:
+        """Save every category's forecast for ``horizon`` days to ``store``; returns the categories saved"""
+        categories = self.trained_categories()
+        with stage_timer('forecaster', 'materialize'):
+            predictions = self.predict_categories(categories, horizon)
+            store.write(self.user_id, self.version, predictions, self.category_stats)
+        return len(categories)
+
+
+class MaterializedForecaster(ExpenseForecaster):
+    """Serves a user's forecasts from a ForecastStore entry, without loading Prophet models
+    
+    Forecast responses are built the same way as from the live models; the
+    stored days are sliced to the requested period.
+    """
+    
+    def __init__(self, user_id: str, entry: Dict):
+        self.user_id = user_id
+        self.version = entry['version']
+        self.entry = entry
+        self.models = {}
+        self.category_stats = entry['statistics']
+        self.rows = {category: row for row, category in enumerate(entry['categories'])}
+    
+    def trained_categories(self) -> List[str]:
+        return list(self.rows)
+    
+    def predict_categories(self, categories: List[str], periods: int = 30) -> Dict:
+        if periods > self.entry['horizon']:
+            raise ValueError(f"Only {self.entry['horizon']} forecast days are stored, {periods} requested")
+        predictions = {}
+        for category in categories:
+            row = self.rows[category]
+            values = self.entry['values'][row, :periods].astype(np.float64)
+            predictions[category] = {
+                "ds": self.entry['starts'][row] + np.arange(periods),
+                "yhat": values[:, 0],
+                "yhat_lower": values[:, 1],
+                "yhat_upper": values[:, 2]
+            }
+        return predictions
+    
+    def forecast_all(self, periods: int = 30, columnar: bool = False) -> Dict:
+        result = super().forecast_all(periods, columnar)
+        result["generated_at"] = self.entry['materialized_at']
+        return result
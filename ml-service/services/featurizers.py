@@ -0,0 +1,105 @@
+"""Text featurizers for transaction descriptions"""
+from pathlib import Path
+from typing import Iterable, Tuple
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+
+class HashedTextFeaturizer:
+    """Stateless hashed uni/bi-gram features with optional IDF weighting
+    
+    Unlike ``TfidfVectorizer`` there is no vocabulary to fit or store: tokens are
+    hashed straight into ``n_features`` columns. The only learned state is the
+    per-bucket document frequency, kept as compact arrays so IDF weights can be
+    updated incrementally with :meth:`partial_fit`.
+    """
+    
+    def __init__(self, n_features: int = 4096, ngram_range: Tuple[int, int] = (1, 2),
+                 use_idf: bool = True):
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+        self.use_idf = use_idf
+        
+        self.n_documents = 0
+        self.document_frequency = np.zeros(n_features, dtype=np.int32)
+        self.idf_ = None
+        
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features,
+            ngram_range=ngram_range,
+            stop_words='english',
+            alternate_sign=False,
+            norm=None,
+            dtype=np.float32
+        )
+    
+    def _counts(self, documents: Iterable[str]) -> sparse.csr_matrix:
+        return self.vectorizer.transform(documents)
+    
+    def _update_idf(self, counts: sparse.csr_matrix):
+        self.n_documents += counts.shape[0]
+        self.document_frequency += np.bincount(counts.indices, minlength=self.n_features).astype(np.int32)
+        self._compute_idf()
+    
+    def _compute_idf(self):
+        # Smoothed IDF, same formula as TfidfVectorizer(smooth_idf=True)
+        self.idf_ = (
+            np.log((1 + self.n_documents) / (1 + self.document_frequency)) + 1
+        ).astype(np.float32)
+    
+    def _weight(self, counts: sparse.csr_matrix) -> sparse.csr_matrix:
+        if self.use_idf and self.idf_ is not None:
+            counts = counts @ sparse.diags(self.idf_)
+        return normalize(counts, norm='l2', copy=False).tocsr()
+    
+    def partial_fit(self, documents: Iterable[str]) -> "HashedTextFeaturizer":
+        """Fold more documents into the IDF statistics"""
+        if self.use_idf:
+            self._update_idf(self._counts(documents))
+        return self
+    
+    def fit_transform(self, documents: Iterable[str]) -> sparse.csr_matrix:
+        self.n_documents = 0
+        self.document_frequency = np.zeros(self.n_features, dtype=np.int32)
+        self.idf_ = None
+        
+        counts = self._counts(documents)
+        if self.use_idf:
+            self._update_idf(counts)
+        return self._weight(counts)
+    
+    def transform(self, documents: Iterable[str]) -> sparse.csr_matrix:
+        return self._weight(self._counts(documents))
+    
+    def save(self, path: Path):
+        """Save settings and non-zero document frequencies to an ``.npz`` file"""
+        buckets = np.flatnonzero(self.document_frequency).astype(np.int32)
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                n_features=self.n_features,
+                ngram_range=np.array(self.ngram_range),
+                use_idf=self.use_idf,
+                n_documents=self.n_documents,
+                df_buckets=buckets,
+                df_counts=self.document_frequency[buckets]
+            )
+    
+    @classmethod
+    def load(cls, path: Path) -> "HashedTextFeaturizer":
+        """Load a featurizer written by :meth:`save`"""
+        with np.load(path) as data:
+            instance = cls(
+                n_features=int(data['n_features']),
+                ngram_range=tuple(int(n) for n in data['ngram_range']),
+                use_idf=bool(data['use_idf'])
+            )
+            instance.document_frequency[data['df_buckets']] = data['df_counts']
+            instance.n_documents = int(data['n_documents'])
+        
+        if instance.use_idf and instance.n_documents:
+            instance._compute_idf()
+        return instance
@@ -0,0 +1,107 @@
+"""
+Precomputed forecasts per user
+A forecaster's predictions only change when it is retrained, so after training
+each user's daily forecast is computed once for ``FORECAST_MATERIALIZE_DAYS``
+and saved here; the API serves ``/forecast/predict`` and
+``/forecast/next-month`` from the entry and only runs Prophet on a miss.
+
+One compressed ``.npz`` per user holds, per category, the first forecast day
+and float32 ``(yhat, yhat_lower, yhat_upper)`` rows, plus the forecaster
+version and category statistics. A forecast for fewer days is a prefix of the
+stored one. An entry written for an older forecaster version is a miss, so a
+retrain through the API is never answered with the previous model's forecast.
+"""
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import logging
+
+import numpy as np
+
+from config import MODEL_PATH, FORECAST_STORE_PATH
+from services.model_store import ModelStore
+
+logger = logging.getLogger(__name__)
+
+
+class ForecastStore:
+    """``{user_id}.npz`` forecast entries under ``root``"""
+    
+    def __init__(self, root: Path = FORECAST_STORE_PATH):
+        self.root = Path(root)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+    
+    def path(self, user_id: str) -> Path:
+        return self.root / f"{user_id}.npz"
+    
+    def write(self, user_id: str, version: Optional[str], predictions: Dict[str, Dict], stats: Dict):
+        """Save ``predictions`` ({category: {ds, yhat, yhat_lower, yhat_upper}}) of one forecaster version"""
+        categories = list(predictions)
+        horizon = min((len(p['yhat']) for p in predictions.values()), default=0)
+        values = np.empty((len(categories), horizon, 3), dtype=np.float32)
+        starts = np.empty(len(categories), dtype='datetime64[D]')
+        for row, category in enumerate(categories):
+            prediction = predictions[category]
+            starts[row] = np.datetime64(prediction['ds'][0], 'D')
+            for column, key in enumerate(('yhat', 'yhat_lower', 'yhat_upper')):
+                values[row, :, column] = prediction[key][:horizon]
+        meta = {
+            "version": version,
+            "materialized_at": datetime.now().isoformat(),
+            "statistics": {category: stats.get(category, {}) for category in categories}
+        }
+        
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.path(user_id)
+        tmp_path = path.with_name(f".{path.stem}.{uuid.uuid4().hex[:8]}.tmp.npz")
+        np.savez_compressed(tmp_path, categories=np.array(categories, dtype=str), starts=starts,
+                            values=values, meta=np.array(json.dumps(meta)))
+        os.replace(tmp_path, path)
+    
+    def read(self, user_id: str) -> Optional[Dict]:
+        """The stored entry, whatever its version (None if there is none)"""
+        try:
+            with np.load(self.path(user_id), allow_pickle=False) as data:
+                entry = json.loads(str(data['meta']))
+                entry["categories"] = data['categories'].tolist()
+                entry["starts"] = data['starts']
+                entry["values"] = data['values']
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable forecast entry for user {user_id}: {e}")
+            return None
+        entry["horizon"] = entry['values'].shape[1]
+        return entry
+    
+    def is_current(self, user_id: str, entry: Optional[Dict]) -> bool:
+        """Whether ``entry`` was written from the user's published forecaster version"""
+        if entry is None:
+            return False
+        version = ModelStore(MODEL_PATH / f"forecaster_{user_id}").current_version() or "legacy"
+        return entry['version'] == version
+    
+    def get(self, user_id: str, periods: int) -> Optional[Dict]:
+        """The user's current entry if it covers ``periods`` days, counting hits and misses"""
+        entry = self.read(user_id)
+        hit = self.is_current(user_id, entry) and periods <= entry['horizon']
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return entry if hit else None
+    
+    def stale_users(self, user_ids: List[str]) -> List[str]:
+        """Users without an entry for their published forecaster version"""
+        return [user_id for user_id in user_ids if not self.is_current(user_id, self.read(user_id))]
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,248 @@
+"""
+Prometheus-style metrics for the ML service
+Counters, gauges and histograms rendered in the Prometheus text exposition
+format by ``/metrics``. With METRICS_ENABLED=false every timer is a shared
+no-op, so instrumented hot paths pay only a function call.
+
+Metrics are per process: under gunicorn each worker keeps its own values.
+"""
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import METRICS_ENABLED
+
+# Seconds; covers single predictions (ms) through Prophet fits (minutes)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [
+        f'{name}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+    
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+    
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(labels.get(name, "") for name in self.label_names)
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+    
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Gauge set directly, or computed at scrape time by ``callback``
+    
+    ``callback`` returns ``{label_values_tuple: value}``.
+    """
+    kind = "gauge"
+    
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (),
+                 callback: Optional[Callable[[], Dict[Tuple, float]]] = None):
+        super().__init__(name, documentation, labels)
+        self.callback = callback
+    
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+    
+    def render(self) -> List[str]:
+        if self.callback is not None:
+            values = self.callback()
+            with self._lock:
+                self._values = dict(values)
+        return super().render()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+    
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (plus +Inf), sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((key, ([*counts], total, count)) for key, (counts, total, count) in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+    
+    def register(self, metric: _Metric) -> _Metric:
+        self.metrics.append(metric)
+        return metric
+    
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = REGISTRY.register(Histogram(
+    "ml_http_request_duration_seconds", "HTTP request latency by route",
+    labels=("method", "route", "status")
+))
+STAGE_DURATION = REGISTRY.register(Histogram(
+    "ml_stage_duration_seconds", "Time spent in model pipeline stages",
+    labels=("component", "stage")
+))
+TRAINING_DURATION = REGISTRY.register(Histogram(
+    "ml_training_duration_seconds", "Model training time",
+    labels=("model",)
+))
+LAST_TRAINING_DURATION = REGISTRY.register(Gauge(
+    "ml_last_training_duration_seconds", "Duration of the latest training run of each model",
+    labels=("model",)
+))
+SHARD_REQUESTS = REGISTRY.register(Counter(
+    "ml_shard_requests_total", "User requests served locally, forwarded or redirected to their owning node",
+    labels=("outcome",)
+))
+COALESCED_REQUESTS = REGISTRY.register(Counter(
+    "ml_coalesced_requests_total", "Calls that shared the result of an identical call already in flight",
+    labels=("operation",)
+))
+TRAINING_LOCK_WAITS = REGISTRY.register(Counter(
+    "ml_training_lock_waits_total", "Trainings that waited for another training of the same user's model",
+    labels=("operation",)
+))
+
+
+# Stage timings of the current request, when it asked for them (see trace_request)
+_request_stages: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_stages", default=None)
+
+
+class _StageTimer:
+    __slots__ = ("component", "stage", "stages", "start")
+    
+    def __init__(self, component: str, stage: str, stages: Optional[List[Tuple[str, float]]]):
+        self.component = component
+        self.stage = stage
+        self.stages = stages
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        if METRICS_ENABLED:
+            STAGE_DURATION.observe(elapsed, component=self.component, stage=self.stage)
+        if self.stages is not None:
+            self.stages.append((f"{self.component}.{self.stage}", elapsed))
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def stage_timer(component: str, stage: str):
+    """Context manager timing one pipeline stage
+    
+    A no-op when metrics are disabled, unless the current request is traced.
+    """
+    stages = _request_stages.get()
+    if not METRICS_ENABLED and stages is None:
+        return _NULL_TIMER
+    return _StageTimer(component, stage, stages)
+
+
+def trace_request():
+    """Collect stage timings for the current request; returns ``(stages, token)``
+    
+    Pass the token to ``end_trace`` when the request is done.
+    """
+    stages: List[Tuple[str, float]] = []
+    return stages, _request_stages.set(stages)
+
+
+def end_trace(token):
+    _request_stages.reset(token)
+
+
+def server_timing(stages: List[Tuple[str, float]]) -> str:
+    """``Server-Timing`` header value, summing repeated stages in first-seen order"""
+    totals: Dict[str, float] = {}
+    for name, seconds in stages:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in totals.items())
+
+
+def record_training(model: str, seconds: float):
+    """Record one training run's duration
+    
+    Per-user and per-category durations would add a series for every user, so
+    they go in the training results (``training_seconds``) instead.
+    """
+    if not METRICS_ENABLED:
+        return
+    TRAINING_DURATION.observe(seconds, model=model)
+    LAST_TRAINING_DURATION.set(seconds, model=model)
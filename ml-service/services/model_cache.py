@@ -0,0 +1,128 @@
+"""In-memory cache of loaded per-user models that follows published versions"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Tuple
+import logging
+
+from config import MODEL_CACHE_SIZE
+from services.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class ModelCache:
+    """LRU cache of loaded models keyed by ``(kind, user_id)``
+    
+    ``loaders`` maps a model kind to a callable that loads the current version
+    for a user (e.g. the model class itself). Cached models expose ``store``
+    and ``version``; on each lookup the published version is checked, and if a
+    newer one exists the cached model keeps serving while the new version loads
+    in the background, so a retrain never blocks requests on a reload.
+    Concurrent loads of one model share a single load.
+    Lookups are counted in ``history`` (an AccessHistory) when one is given.
+    """
+    
+    def __init__(self, loaders: Dict[str, Callable[[str], object]], max_size: int = MODEL_CACHE_SIZE,
+                 reload_workers: int = 2, history=None):
+        self.loaders = loaders
+        self.history = history
+        self.max_size = max_size
+        self._models: "OrderedDict[Tuple[str, str], object]" = OrderedDict()
+        self._reloading = set()
+        self.hits = 0
+        self.misses = 0
+        self.stale_served = 0
+        self._lock = threading.Lock()
+        self._loads = SingleFlight("model_load")
+        self._executor = ThreadPoolExecutor(max_workers=reload_workers, thread_name_prefix="model-reload")
+    
+    def get(self, kind: str, user_id: str):
+        """Loaded model for a user, loading it on first use"""
+        key = (kind, user_id)
+        if self.history is not None:
+            self.history.record(kind, user_id)
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        
+        if model is None:
+            return self._load(key)
+        
+        current = model.store.current_version()
+        if current is None or current == model.version:
+            return model
+        if model.version is None:
+            # Nothing servable is cached yet, so wait for the first version
+            return self._load(key)
+        
+        self.stale_served += 1
+        self._reload_in_background(key)
+        return model
+    
+    def warm(self, kind: str, user_id: str) -> bool:
+        """Load a model ahead of its first request; False if it was already cached
+        
+        Not counted as a lookup or an access.
+        """
+        with self._lock:
+            if (kind, user_id) in self._models:
+                return False
+        self._load((kind, user_id))
+        return True
+    
+    def put(self, kind: str, user_id: str, model):
+        """Swap in a model that was just trained in this process"""
+        self._store((kind, user_id), model)
+    
+    def invalidate(self, kind: str, user_id: str):
+        with self._lock:
+            self._models.pop((kind, user_id), None)
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "size": len(self._models),
+                "max_size": self.max_size,
+                "reloading": len(self._reloading),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_served": self.stale_served
+            }
+    
+    def _store(self, key, model):
+        with self._lock:
+            self._models[key] = model
+            self._models.move_to_end(key)
+            while len(self._models) > self.max_size:
+                self._models.popitem(last=False)
+    
+    def _load(self, key):
+        return self._loads.do(key, self._load_now, key)
+    
+    def _load_now(self, key):
+        kind, user_id = key
+        model = self.loaders[kind](user_id)
+        self._store(key, model)
+        return model
+    
+    def _reload_in_background(self, key):
+        with self._lock:
+            if key in self._reloading:
+                return
+            self._reloading.add(key)
+        self._executor.submit(self._reload, key)
+    
+    def _reload(self, key):
+        try:
+            model = self._load(key)
+            logger.info(f"Swapped in {key[0]} version {model.version} for user {key[1]}")
+        except Exception as e:
+            logger.error(f"Error reloading {key[0]} for user {key[1]}: {e}")
+        finally:
+            with self._lock:
+                self._reloading.discard(key)
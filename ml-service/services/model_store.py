@@ -0,0 +1,128 @@
+"""Atomically published, versioned model artifact directories"""
+import os
+import shutil
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+import logging
+
+import joblib
+
+from config import MODEL_PATH, MODEL_KEEP_VERSIONS
+
+logger = logging.getLogger(__name__)
+
+POINTER_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+
+
+def atomic_dump(obj, path: Path):
+    """joblib.dump to a temporary file, then rename it over ``path``"""
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    joblib.dump(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+
+class ModelStore:
+    """Versioned artifacts under ``model_dir/versions/<version>``
+    
+    A new version is written into a hidden staging directory, renamed into
+    ``versions/`` and then published by atomically replacing the ``CURRENT``
+    pointer file, so readers always see a complete set of artifacts. Readers
+    resolve the pointer once and load everything from that one directory.
+    Models saved before versioning (files directly in ``model_dir``) are served
+    as the ``legacy`` version until the first publish.
+    """
+    
+    def __init__(self, model_dir: Path, keep_versions: int = MODEL_KEEP_VERSIONS):
+        self.model_dir = Path(model_dir)
+        self.versions_dir = self.model_dir / VERSIONS_DIR
+        self.keep_versions = max(1, keep_versions)
+    
+    def current_version(self) -> Optional[str]:
+        """Version named by the pointer file, or None if nothing is published"""
+        try:
+            return (self.model_dir / POINTER_FILE).read_text().strip() or None
+        except FileNotFoundError:
+            return None
+    
+    def resolve(self, legacy_marker: Optional[str] = None) -> Tuple[Optional[str], Optional[Path]]:
+        """Pin the current ``(version, directory)`` for one load
+        
+        ``legacy_marker`` is a file name whose presence directly in ``model_dir``
+        means an unversioned model is available.
+        """
+        version = self.current_version()
+        if version is not None:
+            return version, self.versions_dir / version
+        if legacy_marker and (self.model_dir / legacy_marker).exists():
+            return "legacy", self.model_dir
+        return None, None
+    
+    def stage(self) -> Path:
+        """Create an empty staging directory for a new version"""
+        self.versions_dir.mkdir(parents=True, exist_ok=True)
+        staging_dir = self.versions_dir / f".staging-{uuid.uuid4().hex[:12]}"
+        staging_dir.mkdir()
+        return staging_dir
+    
+    def discard(self, staging_dir: Path):
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    
+    def publish(self, staging_dir: Path) -> str:
+        """Make a fully written staging directory the current version"""
+        version = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:6]}"
+        os.rename(staging_dir, self.versions_dir / version)
+        
+        tmp_pointer = self.model_dir / f".{POINTER_FILE}.{version}.tmp"
+        tmp_pointer.write_text(version)
+        os.replace(tmp_pointer, self.model_dir / POINTER_FILE)
+        
+        self.collect_garbage()
+        return version
+    
+    def list_versions(self) -> List[str]:
+        """Published versions, oldest first"""
+        if not self.versions_dir.exists():
+            return []
+        return sorted(p.name for p in self.versions_dir.iterdir() if p.is_dir() and not p.name.startswith('.'))
+    
+    def collect_garbage(self):
+        """Remove all but the newest ``keep_versions`` versions
+        
+        Older versions are kept briefly rather than removed at once so a reader
+        that resolved the previous pointer can finish loading from it.
+        """
+        current = self.current_version()
+        for version in self.list_versions()[:-self.keep_versions]:
+            if version != current:
+                shutil.rmtree(self.versions_dir / version, ignore_errors=True)
+                logger.debug(f"Removed old model version {self.model_dir.name}/{version}")
+
+
+def published_users(prefix: str) -> List[str]:
+    """User ids with a saved ``{prefix}{user_id}`` model, most recently published first"""
+    found = []
+    for path in MODEL_PATH.glob(f"{prefix}*"):
+        pointer = path / POINTER_FILE
+        marker = pointer if pointer.exists() else path / "metadata.pkl"
+        if path.is_dir() and marker.exists():
+            found.append((marker.stat().st_mtime, path.name[len(prefix):]))
+    return [user_id for _, user_id in sorted(found, reverse=True)]
+
+
+def published_size(model_dir: Path) -> int:
+    """Bytes on disk of a model directory's current version (0 if nothing is saved)
+    
+    Models saved before versioning are measured from the files directly in
+    ``model_dir``.
+    """
+    store = ModelStore(model_dir)
+    version = store.current_version()
+    version_dir = store.versions_dir / version if version is not None else store.model_dir
+    try:
+        return sum(path.stat().st_size for path in version_dir.iterdir() if path.is_file())
+    except FileNotFoundError:
+        return 0
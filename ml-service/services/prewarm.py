@@ -0,0 +1,116 @@
+"""
+Startup prewarming of the model cache
+Loads saved models before their first request, users with the highest access
+history rank first, then any other published users (most recently trained
+first), until the memory budget or the cache capacity is reached. Model size is
+estimated from the version's size on disk. With sharding, only the users this
+node owns are loaded. Readiness (``/ready``) is reported once the prewarm has
+finished.
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import logging
+
+from config import MODEL_PATH
+from services.model_store import published_users, published_size
+
+logger = logging.getLogger(__name__)
+
+IDLE = 'idle'
+RUNNING = 'running'
+DONE = 'done'
+
+
+class Prewarmer:
+    """Loads ``kinds`` of models into ``cache`` in priority order within ``budget_bytes``
+    
+    ``owns(user_id)``, when given, limits the prewarm to this node's users.
+    """
+    
+    def __init__(self, cache, history, kinds: Sequence[str], budget_bytes: float,
+                 owns: Optional[Callable[[str], bool]] = None):
+        self.cache = cache
+        self.owns = owns
+        self.history = history
+        self.kinds = tuple(kinds)
+        self.budget_bytes = budget_bytes
+        self.state = IDLE
+        self.planned = 0
+        self.loaded = 0
+        self.failed = 0
+        self.loaded_bytes = 0
+        self.seconds = None
+        self._lock = threading.Lock()
+    
+    @property
+    def ready(self) -> bool:
+        return self.state == DONE
+    
+    def plan(self) -> List[Tuple[str, str, int]]:
+        """``(kind, user_id, size)`` to load, highest priority first"""
+        candidates = self.history.ranked(self.kinds) if self.history is not None else []
+        candidates += [(kind, user_id) for kind in self.kinds for user_id in published_users(f"{kind}_")]
+        
+        seen = set()
+        chosen = []
+        total = 0
+        for kind, user_id in candidates:
+            if (kind, user_id) in seen or (self.owns is not None and not self.owns(user_id)):
+                continue
+            seen.add((kind, user_id))
+            size = published_size(MODEL_PATH / f"{kind}_{user_id}")
+            # Nothing saved, or too large for what is left of the budget
+            if size == 0 or total + size > self.budget_bytes:
+                continue
+            chosen.append((kind, user_id, size))
+            total += size
+            if len(chosen) >= self.cache.max_size:
+                break
+        return chosen
+    
+    def run(self) -> int:
+        """Prewarm in this thread; returns the number of models loaded"""
+        with self._lock:
+            if self.state != IDLE:
+                return self.loaded
+            self.state = RUNNING
+        start = time.perf_counter()
+        try:
+            plan = self.plan()
+            self.planned = len(plan)
+            for kind, user_id, size in plan:
+                try:
+                    if self.cache.warm(kind, user_id):
+                        self.loaded += 1
+                        self.loaded_bytes += size
+                except Exception as e:
+                    self.failed += 1
+                    logger.error(f"Error prewarming {kind} for user {user_id}: {e}")
+        finally:
+            self.seconds = time.perf_counter() - start
+            self.state = DONE
+        logger.info(f"Prewarmed {self.loaded} models ({self.loaded_bytes / 2**20:.1f} MB on disk) "
+                    f"in {self.seconds:.1f}s")
+        return self.loaded
+    
+    def start(self):
+        """Prewarm in a background thread"""
+        threading.Thread(target=self.run, name="model-prewarm", daemon=True).start()
+    
+    def skip(self):
+        """Mark ready without loading anything"""
+        with self._lock:
+            if self.state == IDLE:
+                self.state = DONE
+    
+    def status(self) -> Dict:
+        return {
+            "state": self.state,
+            "planned": self.planned,
+            "loaded": self.loaded,
+            "failed": self.failed,
+            "loaded_mb": round(self.loaded_bytes / 2**20, 1),
+            "budget_mb": round(self.budget_bytes / 2**20, 1),
+            "seconds": round(self.seconds, 3) if self.seconds is not None else None
+        }
@@ -0,0 +1,220 @@
+"""
+On-demand profiling for the ML service
+A stack sampler producing flamegraph-compatible collapsed stacks, and request
+captures that profile the next N requests to one route with cProfile or the
+sampler. Both are driven by the admin endpoints in main.py. Work a request
+hands to the threadpool is profiled when it runs through :func:`follow`.
+"""
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional, Set
+
+MODES = ('cprofile', 'sample')
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}"
+
+
+class StackSampler:
+    """Samples thread stacks every ``interval`` seconds from a daemon thread
+    
+    Counts are kept per collapsed stack (``root;...;leaf``), the input format of
+    flamegraph.pl and speedscope. ``thread_ids`` limits sampling to those
+    threads; it may change while sampling.
+    """
+    
+    def __init__(self, interval: float = 0.005, thread_ids: Optional[Set[int]] = None):
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+    
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+    
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def pstats_bytes(stats: pstats.Stats) -> bytes:
+    """Binary pstats dump (loadable with ``pstats.Stats(path)`` or snakeviz)"""
+    return marshal.dumps(stats.stats)
+
+
+def pstats_text(stats: pstats.Stats, limit: int = 50) -> str:
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.sort_stats('cumulative').print_stats(limit)
+    return stream.getvalue()
+
+
+# Capture profiling the current request; copied into worker threads by follow()
+_current_capture: ContextVar[Optional["RequestCapture"]] = ContextVar("current_capture", default=None)
+
+
+class RequestCapture:
+    """Profile of the next ``count`` requests to one route"""
+    
+    def __init__(self, route: str, count: int, mode: str = 'cprofile', interval: float = 0.005):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.id = uuid.uuid4().hex[:12]
+        self.route = route
+        self.count = count
+        self.mode = mode
+        self.interval = interval
+        self.captured = 0
+        self.created_at = time.time()
+        self.profile = cProfile.Profile() if mode == 'cprofile' else None
+        # Threadpool work runs under its own profile; cProfile follows one thread per profile
+        self.worker_profile = cProfile.Profile() if mode == 'cprofile' else None
+        self.sampler: Optional[StackSampler] = None
+        self.stacks: Counter = Counter()
+    
+    @property
+    def done(self) -> bool:
+        return self.captured >= self.count
+    
+    def begin(self):
+        """Start profiling the calling (event loop) thread and any work it passes through :func:`follow`"""
+        if self.mode == 'cprofile':
+            self.profile.enable()
+        else:
+            # Only the threads running this request are sampled: the event
+            # loop thread, and worker threads while they run its work
+            self.sampler = StackSampler(self.interval, {threading.get_ident()}).start()
+        return _current_capture.set(self)
+    
+    def follow(self, fn: Callable, *args):
+        """Run ``fn(*args)`` in this worker thread under the capture"""
+        if self.mode == 'sample':
+            thread_id = threading.get_ident()
+            self.sampler.thread_ids.add(thread_id)
+            try:
+                return fn(*args)
+            finally:
+                self.sampler.thread_ids.discard(thread_id)
+        try:
+            self.worker_profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one active profiler, and it already sees every thread
+            return fn(*args)
+        try:
+            return fn(*args)
+        finally:
+            self.worker_profile.disable()
+    
+    def stats(self) -> pstats.Stats:
+        """Event loop and worker thread profiles combined"""
+        stats = pstats.Stats(self.profile)
+        self.worker_profile.create_stats()
+        if self.worker_profile.stats:
+            stats.add(self.worker_profile)
+        return stats
+    
+    def end(self):
+        if self.mode == 'cprofile':
+            self.profile.disable()
+        else:
+            self.sampler.stop()
+            self.stacks.update(self.sampler.stacks)
+            self.sampler = None
+        self.captured += 1
+    
+    def summary(self) -> Dict:
+        return {
+            "id": self.id,
+            "route": self.route,
+            "mode": self.mode,
+            "requested": self.count,
+            "captured": self.captured,
+            "done": self.done
+        }
+    
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class Profiler:
+    """Armed request captures; one request is profiled at a time"""
+    
+    def __init__(self, max_captures: int = 20):
+        self.max_captures = max_captures
+        self.captures: Dict[str, RequestCapture] = {}
+        self.active: Optional[RequestCapture] = None
+        self._lock = threading.Lock()
+    
+    def arm(self, route: str, count: int, mode: str = 'cprofile', interval: float = 0.005) -> RequestCapture:
+        capture = RequestCapture(route, count, mode, interval)
+        with self._lock:
+            # Forget the oldest captures
+            while len(self.captures) >= self.max_captures:
+                oldest = min(self.captures.values(), key=lambda c: c.created_at)
+                del self.captures[oldest.id]
+            self.captures[capture.id] = capture
+        return capture
+    
+    def has_pending(self) -> bool:
+        return any(not capture.done for capture in list(self.captures.values()))
+    
+    def claim(self, route: str) -> Optional[RequestCapture]:
+        """Capture that should profile this request, if any is armed and none is running"""
+        with self._lock:
+            if self.active is not None:
+                return None
+            for capture in self.captures.values():
+                if capture.route == route and not capture.done:
+                    self.active = capture
+                    return capture
+        return None
+    
+    def release(self, capture: RequestCapture, token=None):
+        capture.end()
+        if token is not None:
+            _current_capture.reset(token)
+        with self._lock:
+            self.active = None
+
+
+def follow(fn: Callable, *args):
+    """``fn(*args)``, profiled when the request that handed it to this thread is being captured"""
+    capture = _current_capture.get()
+    if capture is None:
+        return fn(*args)
+    return capture.follow(fn, *args)
+
+
+profiler = Profiler()
@@ -0,0 +1,197 @@
+"""
+Consistent-hash sharding of users across ML service instances
+Every node is configured with the same static member list (SHARD_NODES). Each
+member is placed on a hash ring at SHARD_VIRTUAL_NODES points, and a user is
+owned by the first point at or after the hash of their id, so each node's
+model cache only holds its own share of users. Adding a node takes over about
+1/N of the users, spread evenly over the old nodes; every other user keeps
+its owner and warm cache.
+
+:class:`ShardRouter` is ASGI middleware that finds the ``user_id`` of a
+request (path parameter, ``X-User-Id`` header, or the JSON/MessagePack/Arrow
+body) and forwards the request to the owner, or redirects it there with a 307.
+Forwarded requests are marked and always served where they arrive, so nodes
+briefly disagreeing about membership during a rollout cannot loop. When the
+owner cannot be reached the request is served locally.
+"""
+import bisect
+import hashlib
+from typing import Callable, List, Optional, Sequence
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import Match
+
+from services import metrics, wire
+
+logger = logging.getLogger(__name__)
+
+FORWARDED_HEADER = "x-shard-forwarded"
+OWNER_HEADER = "x-shard-owner"
+USER_HEADER = "x-user-id"
+
+# Not passed on when forwarding
+_HOP_HEADERS = {"host", "connection", "keep-alive", "transfer-encoding", "content-length", "upgrade"}
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent-hash ring of ``nodes``, each at ``virtual_nodes`` points"""
+    
+    def __init__(self, nodes: Sequence[str], virtual_nodes: int = 160):
+        if not nodes:
+            raise ValueError("A hash ring needs at least one node")
+        self.nodes = list(dict.fromkeys(nodes))
+        self.virtual_nodes = virtual_nodes
+        points = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(virtual_nodes))
+        self._hashes = [h for h, _ in points]
+        self._owners = [node for _, node in points]
+    
+    def owner(self, user_id: str) -> str:
+        index = bisect.bisect_left(self._hashes, _hash(str(user_id)))
+        return self._owners[index % len(self._owners)]
+
+
+def _user_from_body(body: bytes, content_type: Optional[str]) -> Optional[str]:
+    """``user_id`` field of a request body, or None if there is none or it cannot be decoded"""
+    if not body:
+        return None
+    try:
+        fmt = wire.request_format(content_type)
+        if fmt == wire.ARROW:
+            import pyarrow as pa
+            # Only the schema is read; user_id is in its metadata
+            metadata = pa.ipc.open_stream(body).schema.metadata or {}
+            user_id = metadata.get(b"user_id")
+            return user_id.decode() if user_id is not None else None
+        content = wire.unpack(body, fmt)
+    except Exception:
+        return None
+    user_id = content.get("user_id") if isinstance(content, dict) else None
+    return str(user_id) if user_id is not None else None
+
+
+class ShardRouter:
+    """ASGI middleware sending each user's requests to the node that owns them
+    
+    ``routes`` are the app's routes, used to find ``user_id`` path parameters.
+    ``mode`` is ``forward`` (proxy the request and return the owner's response)
+    or ``redirect`` (307 to the owner, for clients that follow redirects).
+    """
+    
+    def __init__(self, app, ring: HashRing, self_node: str, routes: Callable[[], List],
+                 mode: str = "forward", timeout: float = 600):
+        self.app = app
+        self.ring = ring
+        self.self_node = self_node
+        self.routes = routes
+        self.mode = mode
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=64)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        if FORWARDED_HEADER in headers:
+            metrics.SHARD_REQUESTS.inc(outcome="received")
+            return await self.app(scope, receive, send)
+        
+        user_id = self._path_user(scope) or headers.get(USER_HEADER)
+        body = None
+        if user_id is None and scope["method"] in ("POST", "PUT", "PATCH"):
+            body = await self._read_body(receive)
+            user_id = _user_from_body(body, headers.get("content-type"))
+        
+        owner = self.ring.owner(user_id) if user_id is not None else self.self_node
+        if owner == self.self_node:
+            if user_id is not None:
+                metrics.SHARD_REQUESTS.inc(outcome="local")
+            if body is not None:
+                receive = self._replay(body, receive)
+            return await self.app(scope, receive, self._with_owner(send, owner) if user_id is not None else send)
+        
+        if body is None:
+            body = await self._read_body(receive)
+        url = owner + scope["path"] + (f"?{scope['query_string'].decode('latin-1')}" if scope["query_string"] else "")
+        if self.mode == "redirect":
+            metrics.SHARD_REQUESTS.inc(outcome="redirected")
+            return await self._respond(send, 307, [(b"location", url.encode("latin-1"))], b"", owner)
+        
+        forward_headers = {k: v for k, v in headers.items() if k not in _HOP_HEADERS}
+        forward_headers[FORWARDED_HEADER] = self.self_node
+        try:
+            response = await run_in_threadpool(
+                self.session.request, scope["method"], url, data=body, headers=forward_headers,
+                timeout=self.timeout, allow_redirects=False
+            )
+        except requests.RequestException as e:
+            # Serving from the wrong node beats failing the request
+            logger.warning(f"Owner {owner} of user {user_id} unreachable, serving locally: {e}")
+            metrics.SHARD_REQUESTS.inc(outcome="forward_failed")
+            return await self.app(scope, self._replay(body, receive), self._with_owner(send, self.self_node))
+        
+        metrics.SHARD_REQUESTS.inc(outcome="forwarded")
+        response_headers = [
+            (k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in response.headers.items()
+            if k.lower() not in _HOP_HEADERS and k.lower() not in ("content-encoding", "date", "server", OWNER_HEADER)
+        ]
+        await self._respond(send, response.status_code, response_headers, response.content, owner)
+    
+    def _path_user(self, scope) -> Optional[str]:
+        for route in self.routes():
+            match, child_scope = route.matches(scope)
+            if match == Match.FULL:
+                return child_scope.get("path_params", {}).get("user_id")
+        return None
+    
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                return b"".join(chunks)
+    
+    @staticmethod
+    def _replay(body: bytes, receive):
+        """``receive`` that hands the already-read body to the app once"""
+        sent = False
+        
+        async def replay():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+        
+        return replay
+    
+    @staticmethod
+    def _with_owner(send, owner: str):
+        """``send`` that tags the response with the node that served it"""
+        async def tagged(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (OWNER_HEADER.encode(), owner.encode("latin-1"))
+                ]
+            await send(message)
+        return tagged
+    
+    @staticmethod
+    async def _respond(send, status: int, headers: List, body: bytes, owner: str):
+        headers = headers + [
+            (b"content-length", str(len(body)).encode()),
+            (OWNER_HEADER.encode(), owner.encode("latin-1"))
+        ]
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,106 @@
+"""
+Coalescing of concurrent identical work
+A dashboard refresh sends the same forecast and status requests for one user
+several times at once. :class:`SingleFlight` runs one call per key and hands
+its result (or exception) to every caller that arrives while it is in flight,
+instead of each loading models and running Prophet on its own. Results are
+not cached: a call that starts after the previous one finished runs again.
+
+:class:`KeyedLocks` serializes work that must not overlap but cannot be
+shared, such as two trainings of one user's model on different data.
+
+Both block the calling thread, so call them from worker threads (e.g. via
+``run_in_threadpool``), not on the event loop.
+"""
+import threading
+from typing import Callable, Dict, Hashable
+
+from services import metrics
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Shares in-flight calls per key; coalesced callers are counted under ``operation``"""
+    
+    def __init__(self, operation: str):
+        self.operation = operation
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+    
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs):
+        """``fn(*args, **kwargs)``, or the result of the identical call already running for ``key``"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        
+        if not leader:
+            metrics.COALESCED_REQUESTS.inc(operation=self.operation)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+    
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class KeyedLocks:
+    """One lock per key, dropped once nobody holds or waits for it; waits are counted under ``operation``"""
+    
+    def __init__(self, operation: str):
+        self.operation = operation
+        self._locks: Dict[Hashable, list] = {}  # key -> [lock, holders and waiters]
+        self._lock = threading.Lock()
+    
+    def hold(self, key: Hashable) -> "_Held":
+        return _Held(self, key)
+    
+    def _acquire(self, key: Hashable):
+        with self._lock:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        if not entry[0].acquire(blocking=False):
+            metrics.TRAINING_LOCK_WAITS.inc(operation=self.operation)
+            entry[0].acquire()
+    
+    def _release(self, key: Hashable):
+        with self._lock:
+            entry = self._locks[key]
+            entry[0].release()
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+
+class _Held:
+    def __init__(self, locks: KeyedLocks, key: Hashable):
+        self.locks = locks
+        self.key = key
+    
+    def __enter__(self):
+        self.locks._acquire(self.key)
+        return self
+    
+    def __exit__(self, *exc):
+        self.locks._release(self.key)
+        return False
@@ -4,16 +4,29 @@ import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import train_test_split, StratifiedKFold, cross_val_predict
 from sklearn.metrics import accuracy_score, classification_report
+from scipy import sparse
 import joblib
 from pathlib import Path
 from datetime import datetime
 import re
-from typing import Dict, List, Tuple, Optional
+import time
+from typing import Dict, List, Tuple, Optional, Union
 import logging
 
-from config import MODEL_PATH, DEFAULT_CATEGORIES, MIN_TRANSACTIONS_FOR_TRAINING
+from config import (
+    MODEL_PATH, DEFAULT_CATEGORIES, MIN_TRANSACTIONS_FOR_TRAINING,
+    CATEGORIZER_ENGINE, CATEGORIZER_N_JOBS, XGBOOST_EARLY_STOPPING_ROUNDS,
+    CATEGORIZER_FEATURIZER, HASHING_N_FEATURES, HASHING_USE_IDF,
+    CATEGORIZER_EVAL_MODE, CATEGORIZER_CV_FOLDS, CATEGORIZER_TUNE
+)
+from services.classifier_engines import XGBoostCategoryClassifier
+from services.featurizers import HashedTextFeaturizer
+from services.date_features import calendar_features
+from services.tuning import CategorizerTuner
+from services.model_store import ModelStore, atomic_dump
+from services.metrics import stage_timer, record_training
 
 logger = logging.getLogger(__name__)
 
@@ -21,27 +34,108 @@ logger = logging.getLogger(__name__)
 class TransactionCategorizer:
     """ML model for automatic transaction categorization"""
     
-    def __init__(self, user_id: str):
+    ENGINES = ('random_forest', 'xgboost')
+    FEATURIZERS = ('tfidf', 'hashing')
+    EVAL_MODES = ('holdout', 'oob', 'cv')
+    
+    def __init__(self, user_id: str, engine: Optional[str] = None, featurizer: Optional[str] = None):
         self.user_id = user_id
+        self.configured_engine = engine or CATEGORIZER_ENGINE
+        if self.configured_engine not in self.ENGINES:
+            raise ValueError(f"Unknown categorizer engine: {self.configured_engine}")
+        self.engine = self.configured_engine
+        self.configured_featurizer = featurizer or CATEGORIZER_FEATURIZER
+        if self.configured_featurizer not in self.FEATURIZERS:
+            raise ValueError(f"Unknown categorizer featurizer: {self.configured_featurizer}")
+        self.featurizer = self.configured_featurizer
         self.model_dir = MODEL_PATH / f"categorizer_{user_id}"
         self.model_dir.mkdir(exist_ok=True, parents=True)
+        self.store = ModelStore(self.model_dir)
+        self.version = None
+        
+        # Per-user settings chosen by a previous hyperparameter search
+        self.tuned_params = self.load_tuned_params()
         
         # Model components
-        self.tfidf_vectorizer = TfidfVectorizer(
-            max_features=100,
+        self.text_vectorizer = self.build_text_vectorizer()
+        self.scaler = StandardScaler()
+        self.classifier = self.build_classifier()
+        
+        # Load existing model if available
+        self.load_model()
+    
+    def build_text_vectorizer(self, params: Optional[Dict] = None):
+        """Create an unfitted description featurizer for the configured mode"""
+        if params is None:
+            params = self.tuned_params.get('text_params', {}) \
+                if self.tuned_params.get('featurizer') == self.featurizer else {}
+        
+        if self.featurizer == 'hashing':
+            return HashedTextFeaturizer(
+                n_features=params.get('n_features', HASHING_N_FEATURES),
+                use_idf=HASHING_USE_IDF
+            )
+        
+        return TfidfVectorizer(
+            max_features=params.get('max_features', 100),
             ngram_range=(1, 2),
             stop_words='english'
         )
-        self.scaler = StandardScaler()
-        self.classifier = RandomForestClassifier(
-            n_estimators=100,
-            max_depth=10,
+    
+    def build_classifier(self, oob_score: bool = False, params: Optional[Dict] = None):
+        """Create an unfitted classifier for the configured engine"""
+        if params is None:
+            params = self.tuned_params.get('model_params', {}) \
+                if self.tuned_params.get('engine') == self.engine else {}
+        
+        if self.engine == 'xgboost':
+            return XGBoostCategoryClassifier(
+                n_estimators=params.get('n_estimators', 300),
+                max_depth=params.get('max_depth', 6),
+                n_jobs=CATEGORIZER_N_JOBS,
+                early_stopping_rounds=XGBOOST_EARLY_STOPPING_ROUNDS
+            )
+        
+        return RandomForestClassifier(
+            n_estimators=params.get('n_estimators', 100),
+            max_depth=params.get('max_depth', 10),
             random_state=42,
-            class_weight='balanced'
+            class_weight='balanced',
+            oob_score=oob_score
         )
+    
+    def tune(self, df: pd.DataFrame, y: np.ndarray) -> Dict:
+        """Search featurizer/classifier settings for this user and persist the winner"""
+        tuner = CategorizerTuner(self, n_jobs=CATEGORIZER_N_JOBS)
+        result = tuner.search(df, y)
+        
+        text_keys = {'max_features', 'n_features'}
+        self.tuned_params = {
+            "featurizer": self.featurizer,
+            "engine": self.engine,
+            "text_params": {k: v for k, v in result['params'].items() if k in text_keys},
+            "model_params": {k: v for k, v in result['params'].items() if k not in text_keys},
+            "score": result['score'],
+            "num_transactions": len(y),
+            "tuned_at": datetime.now().isoformat()
+        }
+        atomic_dump(self.tuned_params, self.model_dir / "tuned_params.pkl")
         
-        # Load existing model if available
-        self.load_model()
+        logger.info(
+            f"Tuned categorizer for user {self.user_id}: {result['params']} "
+            f"(score {result['score']:.2%}, {result['fits']} fits in {result['rounds']} rounds)"
+        )
+        return self.tuned_params
+    
+    def load_tuned_params(self) -> Dict:
+        """Load settings persisted by :meth:`tune`, if any"""
+        try:
+            path = self.model_dir / "tuned_params.pkl"
+            if path.exists():
+                return joblib.load(path)
+        except Exception as e:
+            logger.error(f"Error loading tuned parameters: {e}")
+        return {}
     
     def preprocess_description(self, description: str) -> str:
         """Clean and preprocess transaction description"""
@@ -56,58 +150,120 @@ class TransactionCategorizer:
         
         return text
     
-    def extract_features(self, transactions: pd.DataFrame, fit: bool = False) -> np.ndarray:
-        """Extract features from transactions"""
+    def extract_features(self, transactions: pd.DataFrame, fit: bool = False):
+        """Extract features from transactions
+        
+        Returns a CSR matrix for the xgboost engine (native sparse input) or the
+        hashing featurizer (wide sparse output), and a dense array otherwise.
+        """
         # Preprocess descriptions
-        descriptions = transactions['description'].apply(self.preprocess_description)
+        with stage_timer('categorizer', 'preprocess'):
+            descriptions = transactions['description'].apply(self.preprocess_description)
+        
+        # TF-IDF / hashed features from description
+        with stage_timer('categorizer', 'text_features'):
+            if fit:
+                text_features = self.text_vectorizer.fit_transform(descriptions)
+            else:
+                text_features = self.text_vectorizer.transform(descriptions)
+        
+        with stage_timer('categorizer', 'numeric_features'):
+            # Numerical features
+            numerical_features = []
+            
+            # Amount (normalized)
+            amounts = transactions['amount'].values.reshape(-1, 1)
+            
+            # Time features (hour, day of week, day of month, month)
+            if 'date' in transactions.columns:
+                numerical_features = np.hstack([
+                    amounts,
+                    calendar_features(transactions['date'].values)
+                ])
+            else:
+                numerical_features = amounts
+            
+            # Scale numerical features
+            if fit:
+                numerical_features_scaled = self.scaler.fit_transform(numerical_features)
+            else:
+                numerical_features_scaled = self.scaler.transform(numerical_features)
+        
+        # Combine text and numerical features
+        with stage_timer('categorizer', 'assemble'):
+            combined_features = sparse.hstack([
+                text_features,
+                sparse.csr_matrix(numerical_features_scaled)
+            ], format='csr')
+            
+            if self.engine == 'xgboost' or self.featurizer == 'hashing':
+                return combined_features
+            return combined_features.toarray()
+    
+    def fit_holdout(self, X, y) -> Tuple[np.ndarray, np.ndarray]:
+        """Fit on 80% of the data and evaluate on the stratified 20% hold-out"""
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=0.2, random_state=42, stratify=y
+        )
         
-        # TF-IDF features from description
-        if fit:
-            tfidf_features = self.tfidf_vectorizer.fit_transform(descriptions)
+        # xgboost early-stops on the held-out split
+        self.classifier = self.build_classifier()
+        if self.engine == 'xgboost':
+            self.classifier.fit(X_train, y_train, eval_set=(X_test, y_test))
         else:
-            tfidf_features = self.tfidf_vectorizer.transform(descriptions)
-        
-        # Numerical features
-        numerical_features = []
+            self.classifier.fit(X_train, y_train)
         
-        # Amount (normalized)
-        amounts = transactions['amount'].values.reshape(-1, 1)
+        return y_test, self.classifier.predict(X_test)
+    
+    def fit_oob(self, X, y) -> Tuple[np.ndarray, np.ndarray]:
+        """Fit the forest on all data and evaluate on its out-of-bag predictions"""
+        self.classifier = self.build_classifier(oob_score=True)
+        self.classifier.fit(X, y)
         
-        # Time features
-        if 'date' in transactions.columns:
-            dates = pd.to_datetime(transactions['date'])
-            hour_of_day = dates.dt.hour.values.reshape(-1, 1)
-            day_of_week = dates.dt.dayofweek.values.reshape(-1, 1)
-            day_of_month = dates.dt.day.values.reshape(-1, 1)
-            month = dates.dt.month.values.reshape(-1, 1)
-            
-            numerical_features = np.hstack([
-                amounts,
-                hour_of_day,
-                day_of_week,
-                day_of_month,
-                month
-            ])
-        else:
-            numerical_features = amounts
+        # Rows that were in every bootstrap sample have no OOB prediction
+        decision = self.classifier.oob_decision_function_
+        scored = ~np.isnan(decision).any(axis=1)
+        y_pred = self.classifier.classes_[np.argmax(decision[scored], axis=1)]
         
-        # Scale numerical features
-        if fit:
-            numerical_features_scaled = self.scaler.fit_transform(numerical_features)
-        else:
-            numerical_features_scaled = self.scaler.transform(numerical_features)
+        return y[scored], y_pred
+    
+    def fit_cv(self, X, y) -> Tuple[np.ndarray, np.ndarray]:
+        """Score with parallel stratified k-fold, then fit on all data"""
+        _, class_counts = np.unique(y, return_counts=True)
+        folds = max(2, min(CATEGORIZER_CV_FOLDS, class_counts.min()))
+        
+        # Folds run in parallel, so each fold's classifier gets one thread
+        fold_classifier = self.build_classifier()
+        if CATEGORIZER_N_JOBS != 1:
+            fold_classifier.set_params(n_jobs=1)
+        
+        y_pred = cross_val_predict(
+            fold_classifier, X, y,
+            cv=StratifiedKFold(n_splits=folds, shuffle=True, random_state=42),
+            n_jobs=CATEGORIZER_N_JOBS
+        )
         
-        # Combine TF-IDF and numerical features
-        combined_features = np.hstack([
-            tfidf_features.toarray(),
-            numerical_features_scaled
-        ])
+        self.classifier = self.build_classifier()
+        self.classifier.fit(X, y)
         
-        return combined_features
+        return y, y_pred
     
-    def train(self, transactions: List[Dict]) -> Dict:
-        """Train the categorization model"""
+    def train(self, transactions: List[Dict], eval_mode: Optional[str] = None,
+              tune: Optional[bool] = None) -> Dict:
+        """Train the categorization model
+        
+        ``eval_mode`` (default ``CATEGORIZER_EVAL_MODE``) is one of:
+        
+        - ``holdout``: fit on 80%, score the remaining 20%
+        - ``oob``: fit on all data, score out-of-bag (random forest only)
+        - ``cv``: fit on all data, score with parallel stratified k-fold
+        
+        ``tune=True`` runs a hyperparameter search first and persists the chosen
+        settings for later retrains. By default (``tune=None``) a search only runs
+        when ``CATEGORIZER_TUNE`` is set and the user has no tuned settings yet.
+        """
         logger.info(f"Training categorizer for user {self.user_id} with {len(transactions)} transactions")
+        start = time.perf_counter()
         
         if len(transactions) < MIN_TRANSACTIONS_FOR_TRAINING:
             raise ValueError(f"Need at least {MIN_TRANSACTIONS_FOR_TRAINING} transactions to train")
@@ -121,33 +277,77 @@ class TransactionCategorizer:
         if len(df) < MIN_TRANSACTIONS_FOR_TRAINING:
             raise ValueError(f"Need at least {MIN_TRANSACTIONS_FOR_TRAINING} labeled transactions")
         
-        # Extract features
-        X = self.extract_features(df, fit=True)
+        eval_mode = eval_mode or CATEGORIZER_EVAL_MODE
+        if eval_mode not in self.EVAL_MODES:
+            raise ValueError(f"Unknown evaluation mode: {eval_mode}")
+        
+        # Retraining always switches to the configured engine and featurizer
+        self.engine = self.configured_engine
+        self.featurizer = self.configured_featurizer
         y = df['category'].values
         
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42, stratify=y
-        )
+        if tune is None:
+            tune = CATEGORIZER_TUNE and not self.tuned_params
+        if tune:
+            self.tune(df, y)
         
-        # Train model
-        self.classifier.fit(X_train, y_train)
+        # Extract features
+        self.text_vectorizer = self.build_text_vectorizer()
+        X = self.extract_features(df, fit=True)
         
-        # Evaluate
-        y_pred = self.classifier.predict(X_test)
-        accuracy = accuracy_score(y_test, y_pred)
+        if eval_mode == 'oob' and self.engine != 'random_forest':
+            logger.warning("Out-of-bag scoring needs the random forest engine, using holdout")
+            eval_mode = 'holdout'
+        
+        # Train and evaluate
+        with stage_timer('categorizer', 'fit'):
+            if eval_mode == 'oob':
+                y_true, y_pred = self.fit_oob(X, y)
+            elif eval_mode == 'cv':
+                y_true, y_pred = self.fit_cv(X, y)
+            else:
+                y_true, y_pred = self.fit_holdout(X, y)
+        
+        accuracy = accuracy_score(y_true, y_pred)
+        report = classification_report(y_true, y_pred, output_dict=True, zero_division=0)
+        per_category = {
+            category: {
+                "precision": float(scores['precision']),
+                "recall": float(scores['recall']),
+                "f1": float(scores['f1-score']),
+                "support": int(scores['support'])
+            }
+            for category, scores in report.items()
+            if category not in ('accuracy', 'macro avg', 'weighted avg')
+        }
         
-        logger.info(f"Model trained with accuracy: {accuracy:.2%}")
+        logger.info(f"Model trained with {eval_mode} accuracy: {accuracy:.2%}")
         
         # Save model
-        self.save_model()
+        with stage_timer('categorizer', 'save'):
+            self.save_model()
+        training_seconds = time.perf_counter() - start
+        record_training('categorizer', training_seconds)
         
-        return {
+        result = {
             "accuracy": float(accuracy),
+            "evaluation": eval_mode,
+            "per_category": per_category,
+            "engine": self.engine,
+            "featurizer": self.featurizer,
+            "tuned_params": {
+                **self.tuned_params.get('text_params', {}),
+                **self.tuned_params.get('model_params', {})
+            },
             "num_transactions": len(df),
             "num_categories": len(df['category'].unique()),
-            "trained_at": datetime.now().isoformat()
+            "trained_at": datetime.now().isoformat(),
+            "training_seconds": round(training_seconds, 4)
         }
+        if self.engine == 'xgboost' and self.classifier.best_iteration is not None:
+            result["best_iteration"] = self.classifier.best_iteration
+        
+        return result
     
     def predict(self, transaction: Dict) -> Dict:
         """Predict category for a single transaction"""
@@ -158,8 +358,9 @@ class TransactionCategorizer:
         X = self.extract_features(df, fit=False)
         
         # Predict
-        category = self.classifier.predict(X)[0]
-        probabilities = self.classifier.predict_proba(X)[0]
+        with stage_timer('categorizer', 'inference'):
+            category = self.classifier.predict(X)[0]
+            probabilities = self.classifier.predict_proba(X)[0]
         
         # Get confidence (max probability)
         confidence = float(max(probabilities))
@@ -180,75 +381,136 @@ class TransactionCategorizer:
             "alternatives": top_predictions
         }
     
-    def predict_batch(self, transactions: List[Dict]) -> List[Dict]:
+    def predict_batch(self, transactions: Union[List[Dict], pd.DataFrame]) -> List[Dict]:
         """Predict categories for multiple transactions"""
-        if not transactions:
+        if len(transactions) == 0:
             return []
         
-        # Convert to DataFrame
-        df = pd.DataFrame(transactions)
+        columns = self.predict_columns(pd.DataFrame(transactions))
         
-        # Extract features
-        X = self.extract_features(df, fit=False)
-        
-        # Predict
-        categories = self.classifier.predict(X)
-        probabilities = self.classifier.predict_proba(X)
-        
-        results = []
-        for i, (category, probs) in enumerate(zip(categories, probabilities)):
-            confidence = float(max(probs))
-            
-            # Get top 3 predictions
-            top_indices = np.argsort(probs)[-3:][::-1]
-            top_predictions = [
+        with stage_timer('categorizer', 'format'):
+            classes = columns['alternative_categories'].tolist()
+            confidences = columns['alternative_confidences'].tolist()
+            results = [
                 {
-                    "category": self.classifier.classes_[idx],
-                    "confidence": float(probs[idx])
+                    "category": category,
+                    "confidence": confidence,
+                    "alternatives": [
+                        {"category": c, "confidence": p}
+                        for c, p in zip(top_classes, top_confidences)
+                    ]
                 }
-                for idx in top_indices
+                for category, confidence, top_classes, top_confidences in zip(
+                    columns['category'].tolist(), columns['confidence'].tolist(), classes, confidences
+                )
             ]
-            
-            results.append({
-                "category": category,
-                "confidence": confidence,
-                "alternatives": top_predictions
-            })
         
         return results
     
+    def predict_columns(self, transactions: pd.DataFrame, top_k: int = 3) -> Dict[str, np.ndarray]:
+        """Predict categories column-wise, without building per-row dicts
+        
+        Returns ``category`` and ``confidence`` arrays of length n, and
+        ``alternative_categories`` / ``alternative_confidences`` of shape
+        (n, top_k), best first. Used by the columnar wire formats.
+        """
+        classes = np.asarray(self.classifier.classes_)
+        if len(transactions) == 0:
+            return {
+                "category": classes[:0],
+                "confidence": np.empty(0),
+                "alternative_categories": np.empty((0, top_k), dtype=classes.dtype),
+                "alternative_confidences": np.empty((0, top_k))
+            }
+        
+        X = self.extract_features(transactions, fit=False)
+        
+        # The predicted class is the argmax of the probabilities for both engines
+        with stage_timer('categorizer', 'inference'):
+            probabilities = self.classifier.predict_proba(X)
+        
+        rows = np.arange(len(probabilities))[:, None]
+        top_indices = np.argsort(probabilities, axis=1)[:, -top_k:][:, ::-1]
+        best = probabilities.argmax(axis=1)
+        return {
+            "category": classes[best],
+            "confidence": probabilities[rows[:, 0], best],
+            "alternative_categories": classes[top_indices],
+            "alternative_confidences": probabilities[rows, top_indices]
+        }
+    
     def save_model(self):
-        """Save model to disk"""
+        """Save model to disk as a new version, published atomically"""
+        staging_dir = None
         try:
-            joblib.dump(self.tfidf_vectorizer, self.model_dir / "tfidf_vectorizer.pkl")
-            joblib.dump(self.scaler, self.model_dir / "scaler.pkl")
-            joblib.dump(self.classifier, self.model_dir / "classifier.pkl")
+            staging_dir = self.store.stage()
+            if self.featurizer == 'hashing':
+                self.text_vectorizer.save(staging_dir / "text_hashing.npz")
+            else:
+                joblib.dump(self.text_vectorizer, staging_dir / "tfidf_vectorizer.pkl")
+            joblib.dump(self.scaler, staging_dir / "scaler.pkl")
+            if self.engine == 'xgboost':
+                self.classifier.save(staging_dir / "classifier.ubj")
+            else:
+                joblib.dump(self.classifier, staging_dir / "classifier.pkl")
             
             # Save metadata
             metadata = {
                 "user_id": self.user_id,
+                "engine": self.engine,
+                "featurizer": self.featurizer,
                 "saved_at": datetime.now().isoformat(),
                 "categories": list(self.classifier.classes_) if hasattr(self.classifier, 'classes_') else []
             }
-            joblib.dump(metadata, self.model_dir / "metadata.pkl")
+            joblib.dump(metadata, staging_dir / "metadata.pkl")
             
-            logger.info(f"Model saved to {self.model_dir}")
+            self.version = self.store.publish(staging_dir)
+            logger.info(f"Model saved to {self.model_dir} (version {self.version})")
         except Exception as e:
+            if staging_dir is not None:
+                self.store.discard(staging_dir)
             logger.error(f"Error saving model: {e}")
     
     def load_model(self) -> bool:
-        """Load model from disk"""
+        """Load the current model version from disk"""
+        with stage_timer('categorizer', 'load'):
+            return self._load_model()
+    
+    def _load_model(self) -> bool:
         try:
-            tfidf_path = self.model_dir / "tfidf_vectorizer.pkl"
-            scaler_path = self.model_dir / "scaler.pkl"
-            classifier_path = self.model_dir / "classifier.pkl"
+            # Every artifact comes from the one version resolved here
+            version, version_dir = self.store.resolve(legacy_marker="scaler.pkl")
+            if version_dir is None:
+                return False
+            scaler_path = version_dir / "scaler.pkl"
+            metadata_path = version_dir / "metadata.pkl"
+            
+            # Saved models keep serving with the engine and featurizer they were trained with
+            metadata = joblib.load(metadata_path) if metadata_path.exists() else {}
+            engine = metadata.get('engine', 'random_forest')
+            featurizer = metadata.get('featurizer', 'tfidf')
+            text_path = version_dir / (
+                "text_hashing.npz" if featurizer == 'hashing' else "tfidf_vectorizer.pkl"
+            )
+            classifier_path = version_dir / (
+                "classifier.ubj" if engine == 'xgboost' else "classifier.pkl"
+            )
             
-            if all(p.exists() for p in [tfidf_path, scaler_path, classifier_path]):
-                self.tfidf_vectorizer = joblib.load(tfidf_path)
+            if all(p.exists() for p in [text_path, scaler_path, classifier_path]):
+                if featurizer == 'hashing':
+                    self.text_vectorizer = HashedTextFeaturizer.load(text_path)
+                else:
+                    self.text_vectorizer = joblib.load(text_path)
                 self.scaler = joblib.load(scaler_path)
-                self.classifier = joblib.load(classifier_path)
+                if engine == 'xgboost':
+                    self.classifier = XGBoostCategoryClassifier.load(classifier_path)
+                else:
+                    self.classifier = joblib.load(classifier_path)
+                self.engine = engine
+                self.featurizer = featurizer
+                self.version = version
                 
-                logger.info(f"Model loaded from {self.model_dir}")
+                logger.info(f"Model loaded from {self.model_dir} (version {version})")
                 return True
             
             return False
@@ -0,0 +1,131 @@
+"""Per-user hyperparameter search for the transaction categorizer"""
+import math
+import warnings
+from itertools import product
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import StratifiedKFold
+
+# Search spaces; only the keys matching the active featurizer/engine are used
+TEXT_GRIDS = {
+    'tfidf': {'max_features': [50, 100, 200, 400]},
+    'hashing': {'n_features': [1024, 4096, 16384]},
+}
+MODEL_GRIDS = {
+    'random_forest': {'n_estimators': [50, 100, 200], 'max_depth': [6, 10, 20, None]},
+    'xgboost': {'n_estimators': [100, 300], 'max_depth': [4, 6, 8]},
+}
+
+
+def expand_grid(grid: Dict[str, List]) -> List[Dict]:
+    """All combinations of a ``{param: [values]}`` grid"""
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in product(*(grid[k] for k in keys))]
+
+
+def _score_candidate(classifier, folds: List[Tuple]) -> float:
+    """Mean k-fold accuracy of one candidate over precomputed fold features"""
+    scores = []
+    for X_train, y_train, X_test, y_test in folds:
+        try:
+            fitted = clone(classifier).fit(X_train, y_train)
+            scores.append(accuracy_score(y_test, fitted.predict(X_test)))
+        except Exception:
+            # A failed fit scores zero, so the candidate is dropped
+            scores.append(0.0)
+    return float(np.mean(scores))
+
+
+class CategorizerTuner:
+    """Successive-halving search over featurizer and classifier settings
+    
+    Every round scores the surviving candidates on a larger subsample of the
+    user's transactions, in parallel across cores, and keeps the best
+    ``1/factor``. Each round's fold feature matrices are built once per
+    featurizer setting and shared by all classifier candidates using it; the
+    text featurizer and amount scaler are fit on the training fold only, so
+    held-out rows do not leak into the scores.
+    """
+    
+    def __init__(self, categorizer, factor: int = 3, cv: int = 3, min_resources: int = 60,
+                 n_jobs: int = -1):
+        self.categorizer = categorizer
+        self.factor = factor
+        self.cv = cv
+        self.min_resources = min_resources
+        self.n_jobs = n_jobs
+        
+        self._feature_cache = {}
+        self.fits = 0
+    
+    def fold_features(self, df: pd.DataFrame, y: np.ndarray, indices: np.ndarray,
+                      text_params: Dict) -> List[Tuple]:
+        """``(X_train, y_train, X_test, y_test)`` per fold of a subsample, for one featurizer setting"""
+        key = tuple(sorted(text_params.items()))
+        if key not in self._feature_cache:
+            subset = df.iloc[indices]
+            y_subset = y[indices]
+            # Small subsamples routinely hold rare categories fewer than ``cv`` times
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', UserWarning)
+                splits = list(StratifiedKFold(n_splits=self.cv, shuffle=True, random_state=42).split(
+                    np.zeros(len(indices)), y_subset
+                ))
+            
+            folds = []
+            for train, test in splits:
+                self.categorizer.text_vectorizer = self.categorizer.build_text_vectorizer(text_params)
+                X_train = self.categorizer.extract_features(subset.iloc[train], fit=True)
+                X_test = self.categorizer.extract_features(subset.iloc[test])
+                folds.append((X_train, y_subset[train], X_test, y_subset[test]))
+            self._feature_cache[key] = folds
+        return self._feature_cache[key]
+    
+    def search(self, df: pd.DataFrame, y: np.ndarray) -> Dict:
+        """Run the search and return the winning parameters and their score"""
+        text_candidates = expand_grid(TEXT_GRIDS[self.categorizer.featurizer])
+        model_candidates = expand_grid(MODEL_GRIDS[self.categorizer.engine])
+        candidates = [
+            {**text, **model} for text, model in product(text_candidates, model_candidates)
+        ]
+        text_keys = set(TEXT_GRIDS[self.categorizer.featurizer])
+        
+        n_samples = len(y)
+        order = np.random.RandomState(42).permutation(n_samples)
+        
+        rounds = 0
+        scores = [0.0]
+        while len(candidates) > 1:
+            # Halvings still needed decide how much data this round gets
+            remaining = math.ceil(math.log(len(candidates), self.factor))
+            resources = min(n_samples, max(self.min_resources, n_samples // self.factor ** (remaining - 1)))
+            indices = np.sort(order[:resources])
+            self._feature_cache = {}
+            
+            jobs = []
+            for params in candidates:
+                folds = self.fold_features(df, y, indices, {k: v for k, v in params.items() if k in text_keys})
+                classifier = self.categorizer.build_classifier(params=params)
+                classifier.set_params(n_jobs=1)
+                jobs.append(delayed(_score_candidate)(classifier, folds))
+            
+            scores = Parallel(n_jobs=self.n_jobs)(jobs)
+            self.fits += len(jobs) * self.cv
+            rounds += 1
+            
+            keep = max(1, math.ceil(len(candidates) / self.factor))
+            ranked = np.argsort(scores)[::-1][:keep]
+            candidates = [candidates[i] for i in ranked]
+            scores = [scores[i] for i in ranked]
+        
+        return {
+            "params": candidates[0],
+            "score": float(scores[0]),
+            "rounds": rounds,
+            "fits": self.fits
+        }
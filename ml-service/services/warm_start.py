@@ -0,0 +1,113 @@
+"""
+Warm starts for Prophet refits
+A weekly retrain sees the same series plus a few new days, so the previous
+fit's MAP parameters are a far better starting point for Stan's optimizer than
+Prophet's default (slope and offset through the endpoints, everything else 0).
+
+The stored parameters live in the previous fit's scaled units: ``y`` divided by
+max|y| and time by the history span, both of which move as history grows.
+:func:`init_params` carries the previous trend and seasonalities over to the
+new fit's scaling and changepoint grid. It only applies to MAP fits with the
+same settings (so the seasonality features, and beta, line up) and absmax
+scaling; otherwise the refit starts cold.
+"""
+import re
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Prophet settings a warm start must share with the previous fit
+SETTINGS = (
+    'growth', 'daily_seasonality', 'weekly_seasonality', 'yearly_seasonality', 'seasonality_mode',
+    'changepoint_prior_scale', 'seasonality_prior_scale', 'changepoint_range', 'n_changepoints'
+)
+
+# CmdStan console lines: L-BFGS table rows ("  194  875.787 ...") and Newton steps
+_ITERATION_LINE = re.compile(r'^\s*(\d+)\s+-?\d|^Iteration\s+(\d+)\.')
+
+
+def compatible(previous, model) -> bool:
+    """Whether ``previous`` can seed a fit of the unfitted ``model``"""
+    return (
+        previous is not None
+        and bool(getattr(previous, 'params', None))
+        and np.shape(previous.params['k'])[0] == 1
+        and not previous.mcmc_samples
+        and getattr(previous, 'scaling', 'absmax') == 'absmax'
+        and getattr(model, 'scaling', 'absmax') == 'absmax'
+        and not previous.specified_changepoints
+        and not model.specified_changepoints
+        and not previous.extra_regressors
+        and all(getattr(previous, name) == getattr(model, name) for name in SETTINGS)
+    )
+
+
+def init_params(previous, model, df: pd.DataFrame) -> Optional[Dict]:
+    """Stan initial values for fitting ``model`` to ``df`` (ds, y) from ``previous``
+    
+    Returns None when the previous fit is not :func:`compatible`.
+    """
+    if not compatible(previous, model):
+        return None
+    history = df.sort_values('ds')
+    ds = history['ds']
+    
+    # The new fit's scaling, as Prophet's setup_dataframe computes it
+    y_scale = float(history['y'].abs().max()) or 1.0
+    t_scale = (ds.max() - ds.min()).total_seconds()
+    if t_scale == 0:
+        return None
+    y_ratio = previous.y_scale / y_scale
+    t_ratio = t_scale / previous.t_scale.total_seconds()
+    
+    k = float(np.ravel(previous.params['k'])[0])
+    m = float(np.ravel(previous.params['m'])[0])
+    delta = np.ravel(previous.params['delta'])
+    changepoints = np.asarray(previous.changepoints_t, dtype=float)
+    if len(changepoints) != len(delta):
+        # Prophet folds delta into k when it fits without changepoints
+        changepoints, delta = np.array([]), np.array([])
+    
+    def previous_time(dates) -> np.ndarray:
+        return (pd.DatetimeIndex(dates) - previous.start).total_seconds().values / previous.t_scale.total_seconds()
+    
+    def slope(t: np.ndarray) -> np.ndarray:
+        return k + (changepoints[None, :] <= t[:, None]) @ delta
+    
+    # New changepoint grid, placed the way Prophet's set_changepoints does
+    hist_size = int(np.floor(len(history) * model.changepoint_range))
+    n_changepoints = min(model.n_changepoints, hist_size - 1)
+    if n_changepoints > 0:
+        positions = np.linspace(0, hist_size - 1, n_changepoints + 1).round().astype(int)
+        grid = previous_time(ds.iloc[positions])
+    else:
+        grid = previous_time(ds.iloc[:1])
+    
+    # Offset: the previous trend at the new start; slopes sampled at each new changepoint
+    t0 = grid[0]
+    active = changepoints <= t0
+    offset = m + k * t0 + float(np.sum(delta[active] * (t0 - changepoints[active])))
+    slopes = slope(grid)
+    
+    return {
+        'k': slopes[0] * y_ratio * t_ratio,
+        'm': offset * y_ratio,
+        'delta': np.diff(slopes) * y_ratio * t_ratio,
+        'beta': np.ravel(previous.params['beta']) * y_ratio,
+        'sigma_obs': float(np.ravel(previous.params['sigma_obs'])[0]) * y_ratio
+    }
+
+
+def optimizer_iterations(model) -> Optional[int]:
+    """Iterations of the model's last Stan optimization, from CmdStan's console output"""
+    try:
+        output = Path(model.stan_fit.runset.stdout_files[-1]).read_text()
+    except (AttributeError, IndexError, OSError):
+        return None
+    iterations = [
+        int(match.group(1) or match.group(2))
+        for match in map(_ITERATION_LINE.match, output.splitlines()) if match
+    ]
+    return max(iterations) if iterations else None
@@ -0,0 +1,237 @@
+"""
+Wire formats for the batch endpoints
+Row-oriented JSON stays the default and is encoded with orjson. Clients that
+send or fetch large batches can switch to columnar encodings, chosen with
+Content-Type for the request and Accept for the response:
+
+- ``application/msgpack``: MessagePack with one list per field, e.g.
+  ``{"user_id": ..., "transactions": {"description": [...], "amount": [...], "date": [...]}}``
+- ``application/vnd.apache.arrow.stream``: an Arrow IPC stream with the same
+  columns and ``user_id`` in the schema metadata
+
+msgpack and pyarrow are imported on first use.
+"""
+import json
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON = 'json'
+MSGPACK = 'msgpack'
+ARROW = 'arrow'
+
+MEDIA_TYPES = {
+    JSON: 'application/json',
+    MSGPACK: 'application/msgpack',
+    ARROW: 'application/vnd.apache.arrow.stream',
+}
+_FORMATS_BY_MEDIA_TYPE = {
+    **{media_type: fmt for fmt, media_type in MEDIA_TYPES.items()},
+    'application/x-msgpack': MSGPACK,
+}
+
+# Default response class: orjson also serializes numpy scalars and arrays
+FastJSONResponse = ORJSONResponse if orjson is not None else JSONResponse
+
+FORECAST_COLUMNS = ('date', 'predicted_amount', 'lower_bound', 'upper_bound')
+
+
+class UnsupportedFormat(ValueError):
+    """Content type the service cannot decode (HTTP 415)"""
+
+
+class WireFormatError(ValueError):
+    """Malformed columnar payload (HTTP 400)"""
+
+
+def available(fmt: str) -> bool:
+    """Whether the library behind ``fmt`` is installed"""
+    try:
+        if fmt == MSGPACK:
+            import msgpack  # noqa: F401
+        elif fmt == ARROW:
+            import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return fmt in MEDIA_TYPES
+
+
+def request_format(content_type: Optional[str]) -> str:
+    """Format of a request body from its Content-Type (JSON when absent)"""
+    media_type = (content_type or MEDIA_TYPES[JSON]).split(';')[0].strip().lower()
+    fmt = _FORMATS_BY_MEDIA_TYPE.get(media_type)
+    if fmt is None or not available(fmt):
+        raise UnsupportedFormat(f"Unsupported content type: {media_type}")
+    return fmt
+
+
+def response_format(accept: Optional[str]) -> str:
+    """Preferred available format from an Accept header (JSON by default)"""
+    if not accept:
+        return JSON
+    ranges = []
+    for position, part in enumerate(accept.split(',')):
+        media_type, *params = [p.strip() for p in part.split(';')]
+        quality = 1.0
+        for param in params:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        ranges.append((-quality, position, media_type.lower()))
+    for negative_quality, _, media_type in sorted(ranges):
+        if negative_quality == 0:
+            break
+        fmt = _FORMATS_BY_MEDIA_TYPE.get(media_type)
+        if fmt is not None and available(fmt):
+            return fmt
+    return JSON
+
+
+def loads(body: bytes):
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+
+def unpack(body: bytes, fmt: str):
+    """Decode a MessagePack or JSON body into Python objects"""
+    if fmt == MSGPACK:
+        import msgpack
+        try:
+            return msgpack.unpackb(body)
+        except (ValueError, msgpack.UnpackException) as e:
+            raise WireFormatError(f"Invalid MessagePack body: {e}")
+    return loads(body)
+
+
+def _pack(content) -> bytes:
+    import msgpack
+    return msgpack.packb(content, default=_msgpack_default)
+
+
+def _msgpack_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _write_arrow(table) -> bytes:
+    import pyarrow as pa
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def decode_batch_request(body: bytes, fmt: str) -> Tuple[str, pd.DataFrame]:
+    """``(user_id, transactions)`` from a columnar MessagePack or Arrow body"""
+    if fmt == ARROW:
+        import pyarrow as pa
+        try:
+            table = pa.ipc.open_stream(body).read_all()
+        except pa.ArrowInvalid as e:
+            raise WireFormatError(f"Invalid Arrow IPC stream: {e}")
+        user_id = (table.schema.metadata or {}).get(b'user_id', b'').decode()
+        transactions = table.to_pandas()
+    else:
+        payload = unpack(body, fmt)
+        if not isinstance(payload, dict) or not isinstance(payload.get('transactions'), dict):
+            raise WireFormatError("Expected a map with user_id and columnar transactions")
+        user_id = payload.get('user_id')
+        try:
+            transactions = pd.DataFrame(payload['transactions'])
+        except ValueError as e:
+            raise WireFormatError(f"Transaction columns must have equal lengths: {e}")
+    
+    if not user_id or not isinstance(user_id, str):
+        raise WireFormatError("user_id is required")
+    missing = {'description', 'amount'} - set(transactions.columns)
+    if missing:
+        raise WireFormatError(f"Missing transaction columns: {', '.join(sorted(missing))}")
+    try:
+        transactions['amount'] = pd.to_numeric(transactions['amount']).astype(float)
+    except (TypeError, ValueError) as e:
+        raise WireFormatError(f"amount must be numeric: {e}")
+    transactions['description'] = transactions['description'].astype(str)
+    if 'date' not in transactions.columns:
+        transactions['date'] = None
+    return user_id, transactions[['description', 'amount', 'date']]
+
+
+def encode_predictions(columns: Dict[str, np.ndarray], fmt: str) -> bytes:
+    """Encode ``TransactionCategorizer.predict_columns`` output"""
+    if fmt == ARROW:
+        import pyarrow as pa
+        top_k = columns['alternative_categories'].shape[1]
+        table = pa.table({
+            'category': pa.array(columns['category'], type=pa.string()),
+            'confidence': pa.array(columns['confidence'], type=pa.float64()),
+            'alternative_categories': pa.FixedSizeListArray.from_arrays(
+                pa.array(columns['alternative_categories'].ravel(), type=pa.string()), top_k
+            ),
+            'alternative_confidences': pa.FixedSizeListArray.from_arrays(
+                pa.array(columns['alternative_confidences'].ravel(), type=pa.float64()), top_k
+            ),
+        })
+        return _write_arrow(table)
+    
+    return _pack({
+        "success": True,
+        "data": {
+            "category": columns['category'].tolist(),
+            "confidence": columns['confidence'].tolist(),
+            "alternatives": {
+                "category": columns['alternative_categories'].tolist(),
+                "confidence": columns['alternative_confidences'].tolist()
+            }
+        }
+    })
+
+
+def encode_forecast(result: Dict, fmt: str) -> bytes:
+    """Encode a columnar ``forecast_category`` / ``forecast_all`` result
+    
+    Arrow carries the daily forecasts as one long table (with a ``category``
+    column) and the rest of the result as JSON in the ``forecast`` schema
+    metadata.
+    """
+    if fmt != ARROW:
+        return _pack({"success": True, "data": result})
+    
+    import pyarrow as pa
+    single = 'categories' not in result
+    forecasts = [result] if single else list(result['categories'].values())
+    daily = [f.get('daily_forecast', {}) for f in forecasts]
+    columns = {
+        'category': pa.array(
+            [f['category'] for f, d in zip(forecasts, daily) for _ in d.get('date', [])], type=pa.string()
+        )
+    }
+    for name in FORECAST_COLUMNS:
+        values = [v for d in daily for v in d.get(name, [])]
+        columns[name] = pa.array(values, type=pa.string() if name == 'date' else pa.float64())
+    
+    # Everything except the daily values goes in the metadata
+    if single:
+        summary = {k: v for k, v in result.items() if k != 'daily_forecast'}
+    else:
+        summary = {
+            **result,
+            'categories': {
+                category: {k: v for k, v in forecast.items() if k != 'daily_forecast'}
+                for category, forecast in result['categories'].items()
+            }
+        }
+    metadata = orjson.dumps(summary, option=orjson.OPT_SERIALIZE_NUMPY) if orjson is not None \
+        else json.dumps(summary, default=_msgpack_default).encode()
+    table = pa.table(columns).replace_schema_metadata({b'forecast': metadata})
+    return _write_arrow(table)
@@ -0,0 +1,182 @@
+"""
+Per-user training data snapshots
+Keeps each user's transaction history as memory-mappable NumPy columns under
+MODEL_PATH/snapshots and refreshes it with only the documents updated since the
+stored watermark, so repeated training runs fetch small deltas instead of the
+full history (or nothing at all when run offline)
+"""
+import json
+import logging
+import os
+import re
+import shutil
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import SNAPSHOT_PATH, SNAPSHOT_CACHE, SNAPSHOT_MAX_AGE_HOURS
+import data_access
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_COLUMNS = ['id', 'description', 'amount', 'date', 'category']
+
+# Version names sort by creation time; older formats are treated as oldest
+_VERSION = re.compile(r"v\d{8}T\d{12}-[0-9a-f]{6}$")
+
+
+def _new_version() -> str:
+    return f"v{datetime.now():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:6]}"
+
+
+def _older(name: str, current: str) -> bool:
+    if not _VERSION.match(name):
+        return name != current
+    return bool(_VERSION.match(current)) and name < current
+
+
+class SnapshotStore:
+    """Columnar per-user transaction snapshots with an ``updatedAt`` watermark
+    
+    Each snapshot is a directory of ``.npy`` files (strings stored fixed-width so
+    they can be memory mapped) plus ``meta.json``. New versions are written to a
+    fresh directory and published by atomically replacing ``meta.json``.
+    Deleted transactions are only dropped by the periodic full rebuild
+    (``SNAPSHOT_MAX_AGE_HOURS``).
+    
+    Several processes may sync one user at once, so writers only remove
+    versions older than the published one, and a published version whose
+    directory is gone counts as no snapshot and is rebuilt.
+    """
+    
+    def __init__(self, root: Optional[Path] = None, max_age_hours: float = SNAPSHOT_MAX_AGE_HOURS):
+        self.root = Path(root or SNAPSHOT_PATH)
+        self.max_age = timedelta(hours=max_age_hours)
+    
+    def user_dir(self, user_id) -> Path:
+        return self.root / str(user_id)
+    
+    def read_meta(self, user_id) -> Optional[Dict]:
+        meta_path = self.user_dir(user_id) / "meta.json"
+        if not meta_path.exists():
+            return None
+        with open(meta_path) as f:
+            return json.load(f)
+    
+    def list_users(self):
+        """User ids that have a published snapshot"""
+        if not self.root.exists():
+            return []
+        return sorted(path.name for path in self.root.iterdir() if (path / "meta.json").exists())
+    
+    def has_version(self, user_id, meta: Dict) -> bool:
+        return (self.user_dir(user_id) / meta['version']).is_dir()
+    
+    def load(self, user_id, columns=None) -> Optional[pd.DataFrame]:
+        """Load a snapshot with memory-mapped columns, or None if there is none"""
+        meta = self.read_meta(user_id)
+        if meta is None:
+            return None
+        
+        version_dir = self.user_dir(user_id) / meta['version']
+        try:
+            return pd.DataFrame({
+                column: np.load(version_dir / f"{column}.npy", mmap_mode='r')
+                for column in (columns or data_access.TRANSACTION_COLUMNS)
+            }, copy=False)
+        except FileNotFoundError:
+            logger.warning(f"Snapshot version {meta['version']} of user {user_id} is missing")
+            return None
+    
+    def write(self, user_id, df: pd.DataFrame, watermark: Optional[datetime], built_at: str):
+        """Write a new snapshot version and publish it"""
+        user_dir = self.user_dir(user_id)
+        version = _new_version()
+        # Written under a hidden name so cleanup by other writers skips it
+        staging_dir = user_dir / f".{version}.tmp"
+        staging_dir.mkdir(parents=True)
+        
+        np.save(staging_dir / "id.npy", df['id'].to_numpy(dtype=str))
+        np.save(staging_dir / "description.npy", df['description'].fillna('').to_numpy(dtype=str))
+        np.save(staging_dir / "amount.npy", df['amount'].to_numpy(dtype=np.float64))
+        np.save(staging_dir / "date.npy", df['date'].to_numpy(dtype='datetime64[ms]'))
+        np.save(staging_dir / "category.npy", df['category'].fillna('').to_numpy(dtype=str))
+        
+        meta = {
+            "version": version,
+            "count": len(df),
+            "watermark": watermark.isoformat() if watermark is not None else None,
+            "built_at": built_at,
+            "updated_at": datetime.now().isoformat()
+        }
+        os.rename(staging_dir, user_dir / version)
+        tmp_path = user_dir / f"meta.json.{version}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, user_dir / "meta.json")
+        
+        # Drop versions superseded by whichever one is published now (another
+        # writer may have published a newer one, or be about to)
+        current = self.read_meta(user_id)['version']
+        for path in user_dir.iterdir():
+            if path.is_dir() and not path.name.startswith('.') and _older(path.name, current):
+                shutil.rmtree(path, ignore_errors=True)
+    
+    async def sync(self, user_id, rebuild: bool = False) -> pd.DataFrame:
+        """Bring a user's snapshot up to date and return its training columns"""
+        meta = self.read_meta(user_id)
+        if meta is not None and not self.has_version(user_id, meta):
+            logger.warning(f"Snapshot version {meta['version']} of user {user_id} is missing, rebuilding")
+            meta = None
+        rebuild = rebuild or meta is None or \
+            datetime.now() - datetime.fromisoformat(meta['built_at']) > self.max_age
+        since = None if rebuild or not meta.get('watermark') else datetime.fromisoformat(meta['watermark'])
+        
+        changes = await data_access.fetch_transaction_changes(user_id, since=since)
+        
+        if rebuild:
+            merged = changes
+            built_at = datetime.now().isoformat()
+        else:
+            existing = self.load(user_id, SNAPSHOT_COLUMNS if not changes.empty else None)
+            if existing is None:
+                # Removed by another writer since it was checked above
+                return await self.sync(user_id, rebuild=True)
+            if changes.empty:
+                return existing
+            kept = existing[~np.isin(existing['id'].to_numpy(), changes['id'].to_numpy())]
+            merged = pd.concat([kept, changes[SNAPSHOT_COLUMNS]], ignore_index=True)
+            built_at = meta['built_at']
+        
+        watermark = changes['updated_at'].max() if not changes.empty else None
+        if pd.isna(watermark):
+            watermark = datetime.fromisoformat(meta['watermark']) if meta and meta.get('watermark') else None
+        else:
+            watermark = watermark.to_pydatetime()
+        
+        self.write(user_id, merged, watermark, built_at)
+        logger.info(f"Snapshot for user {user_id}: {len(changes)} changed, {len(merged)} total")
+        snapshot = self.load(user_id)
+        if snapshot is None:
+            # Superseded and removed already; what was just written is still current enough
+            return merged[data_access.TRANSACTION_COLUMNS].reset_index(drop=True)
+        return snapshot
+
+
+snapshots = SnapshotStore()
+
+
+async def load_user_transactions(user_id) -> pd.DataFrame:
+    """Training transactions for a user, via the snapshot cache when enabled"""
+    if not SNAPSHOT_CACHE:
+        return await data_access.fetch_user_transactions(user_id)
+    return await snapshots.sync(user_id)
+
+
+def load_offline(user_id) -> Optional[pd.DataFrame]:
+    """Read the local snapshot only, without touching the database"""
+    return snapshots.load(user_id)
@@ -0,0 +1,13 @@
+"""Test settings, applied before config.py reads the environment"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+os.environ["MODEL_PATH"] = tempfile.mkdtemp(prefix="test_models_")
+os.environ.setdefault("PRELOAD_MODELS", "false")
+os.environ.setdefault("PROFILING_ENABLED", "true")
+os.environ.setdefault("ADMIN_TOKEN", "test-admin-token")
+os.environ.setdefault("CATEGORIZER_N_JOBS", "1")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
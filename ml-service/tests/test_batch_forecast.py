@@ -0,0 +1,89 @@
+"""batch_forecast against Prophet's own predict"""
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+from prophet import Prophet
+
+from services import batch_forecast, expense_forecaster
+from services.expense_forecaster import ExpenseForecaster
+
+logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+
+PERIODS = 45
+
+
+def daily_series(days: int, seed: int) -> pd.DataFrame:
+    rng = np.random.RandomState(seed)
+    ds = pd.date_range('2024-01-01', periods=days, freq='D')
+    weekly = 8 * (ds.dayofweek >= 5)
+    y = 40 + 0.05 * np.arange(days) + weekly + rng.gamma(2.0, 5.0, days)
+    return pd.DataFrame({'ds': ds, 'y': y})
+
+
+def fit(df: pd.DataFrame, **kwargs) -> Prophet:
+    # Same settings as ExpenseForecaster.train_category_model
+    model = Prophet(
+        daily_seasonality=False,
+        weekly_seasonality=True,
+        yearly_seasonality=len(df) > 365,
+        changepoint_prior_scale=0.05,
+        seasonality_prior_scale=10.0,
+        **kwargs
+    )
+    return model.fit(df)
+
+
+@pytest.fixture(scope="module")
+def models():
+    return {
+        'Food': fit(daily_series(120, seed=1)),
+        'Bills': fit(daily_series(90, seed=2)),
+        'Travel': fit(daily_series(400, seed=3))  # weekly and yearly seasonality
+    }
+
+
+def prophet_predict(model: Prophet, periods: int) -> pd.DataFrame:
+    return model.predict(model.make_future_dataframe(periods=periods, include_history=False))
+
+
+def test_supports_forecaster_models_only(models):
+    assert all(batch_forecast.supports(model) for model in models.values())
+    multiplicative = fit(daily_series(60, seed=4), seasonality_mode='multiplicative')
+    assert not batch_forecast.supports(multiplicative)
+
+
+def test_matches_prophet_predict(models):
+    np.random.seed(0)
+    batched = batch_forecast.forecast(models, PERIODS)
+    
+    assert set(batched) == set(models)
+    for category, model in models.items():
+        expected = prophet_predict(model, PERIODS)
+        result = batched[category]
+        
+        assert (pd.DatetimeIndex(result['ds']) == pd.DatetimeIndex(expected['ds'])).all()
+        np.testing.assert_allclose(result['yhat'], expected['yhat'].values, rtol=1e-9, atol=1e-9)
+        
+        # Intervals are simulated, so only their means are compared
+        width = (expected['yhat_upper'] - expected['yhat_lower']).mean()
+        assert result['yhat_lower'].mean() == pytest.approx(expected['yhat_lower'].mean(), abs=0.1 * width)
+        assert result['yhat_upper'].mean() == pytest.approx(expected['yhat_upper'].mean(), abs=0.1 * width)
+        assert (result['yhat_lower'] <= result['yhat']).all() and (result['yhat'] <= result['yhat_upper']).all()
+
+
+def test_predict_categories_falls_back_to_prophet(models, monkeypatch):
+    forecaster = ExpenseForecaster("batch_fallback_user")
+    forecaster.models = dict(models)
+    
+    batched_calls = []
+    real_forecast = batch_forecast.forecast
+    monkeypatch.setattr(batch_forecast, 'forecast', lambda m, p: batched_calls.append(set(m)) or real_forecast(m, p))
+    monkeypatch.setattr(expense_forecaster, 'FORECAST_BATCHED', False)
+    
+    predictions = forecaster.predict_categories(list(models), PERIODS)
+    
+    assert batched_calls == [set()]
+    for category, model in models.items():
+        np.testing.assert_allclose(predictions[category]['yhat'], prophet_predict(model, PERIODS)['yhat'].values)
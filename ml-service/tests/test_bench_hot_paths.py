@@ -0,0 +1,64 @@
+"""Hot-path benchmark harness: seeded data, baseline comparison and the CLI"""
+import json
+import sys
+
+import pytest
+
+from benchmarks import bench_hot_paths
+from benchmarks.bench_hot_paths import compare
+from benchmarks.synthetic import generate_transactions
+
+
+def test_synthetic_data_is_seeded():
+    assert generate_transactions(50, seed=1) == generate_transactions(50, seed=1)
+    assert generate_transactions(50, seed=1) != generate_transactions(50, seed=2)
+
+
+def test_compare_flags_changes_in_the_worse_direction():
+    baseline = {"200": {"predict_batch_ms": 10.0, "predict_batch_tps": 1000.0, "categorizer_train_s": 2.0}}
+    results = {"200": {
+        "predict_batch_ms": 12.0,      # 20% slower
+        "predict_batch_tps": 800.0,    # 20% less throughput
+        "categorizer_train_s": 1.0,    # faster is never a regression
+    }}
+    
+    regressions = compare(results, baseline, threshold=0.15)
+    
+    assert {r["metric"] for r in regressions} == {"predict_batch_ms", "predict_batch_tps"}
+    assert all(r["change"] == pytest.approx(0.2) for r in regressions)
+    assert compare(results, baseline, threshold=0.25) == []
+
+
+def test_compare_skips_missing_and_unknown_metrics():
+    results = {"200": {"predict_batch_ms": 50.0, "custom_ms": 50.0}, "5000": {"predict_batch_ms": 50.0}}
+    baseline = {"200": {"predict_batch_ms": 0, "custom_ms": 1.0}}
+    assert compare(results, baseline, threshold=0.15) == []
+
+
+def run_cli(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["bench_hot_paths", "--sizes", "200", "--repeats", "1",
+                                      "--batch-size", "20", "--skip-forecaster", *args])
+    bench_hot_paths.main()
+
+
+def test_cli_writes_report_and_fails_on_regression(tmp_path, monkeypatch, capsys):
+    output = tmp_path / "baseline.json"
+    run_cli(monkeypatch, "--output", str(output))
+    
+    report = json.loads(output.read_text())
+    metrics = report["results"]["200"]
+    categorizer_metrics = {name for name in bench_hot_paths.METRICS if not name.startswith("forecast")}
+    assert set(metrics) == categorizer_metrics
+    assert all(value > 0 for value in metrics.values())
+    assert report["environment"] == bench_hot_paths.environment()
+    
+    # A baseline ten times faster makes everything a regression
+    faster = {
+        name: value * 10 if bench_hot_paths.METRICS[name] else value / 10 for name, value in metrics.items()
+    }
+    output.write_text(json.dumps({**report, "results": {"200": faster}}))
+    with pytest.raises(SystemExit) as exit_info:
+        run_cli(monkeypatch, "--baseline", str(output), "--fail-on-regression")
+    
+    assert exit_info.value.code == 1
+    assert "[REGRESSION]" in capsys.readouterr().out
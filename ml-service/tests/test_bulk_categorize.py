@@ -0,0 +1,195 @@
+"""Bulk re-categorization: checkpoints, resume, writers and export parsing"""
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+import bulk_categorize
+import data_access
+from bulk_categorize import Checkpoint, FileWriter, MongoWriter
+
+# The real worker function, before inline_workers swaps it out
+categorize_user = bulk_categorize.categorize_user
+
+JOB = {"input": "export.csv", "output": "out", "format": "csv"}
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def transactions(user_id: str, n: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        'id': [f"{user_id}-{i}" for i in range(n)],
+        'description': [f"purchase {i}" for i in range(n)],
+        'amount': np.arange(n, dtype=float),
+        'date': pd.date_range('2024-01-01', periods=n)
+    })
+
+
+def fake_categorize(user_id, frame, chunk_size):
+    if user_id == 'broken':
+        raise RuntimeError("corrupt model")
+    if user_id.startswith('untrained'):
+        return {"user_id": user_id, "status": "no_model"}
+    assert list(frame.columns) == bulk_categorize.INFERENCE_COLUMNS
+    return {
+        "user_id": user_id,
+        "status": "categorized",
+        "version": "v1",
+        "category": np.where(frame['amount'].to_numpy() % 2 == 0, 'Food', 'Bills').astype(object),
+        "confidence": np.full(len(frame), 0.9)
+    }
+
+
+@pytest.fixture(autouse=True)
+def inline_workers(monkeypatch):
+    # Threads share the patched categorize_user; the job logic is the same
+    monkeypatch.setattr(bulk_categorize, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    monkeypatch.setattr(bulk_categorize, 'categorize_user', fake_categorize)
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.parts = []
+    
+    async def write(self, results, part):
+        self.parts.append((part, [r['user_id'] for r in results]))
+
+
+async def source(users, done=()):
+    for user_id, n in users:
+        if user_id not in done:
+            yield user_id, transactions(user_id, n)
+
+
+def run_job(users, writer, checkpoint, flush_rows=1000):
+    run(bulk_categorize.run_job(source(users, checkpoint.done), writer, checkpoint,
+                                workers=2, chunk_size=3, flush_rows=flush_rows))
+
+
+def test_job_counts_users_and_checkpoints(tmp_path):
+    checkpoint = Checkpoint(tmp_path / "checkpoint.json", JOB, resume=False)
+    writer = RecordingWriter()
+    
+    run_job([('a', 4), ('untrained', 3), ('empty', 0), ('broken', 2), ('b', 5)], writer, checkpoint)
+    
+    assert [sorted(users) for _, users in writer.parts] == [['a', 'b']]
+    stats = checkpoint.stats
+    assert (stats['categorized_users'], stats['no_model_users'], stats['failed_users'], stats['transactions']) == (2, 1, 1, 9)
+    
+    saved = json.loads((tmp_path / "checkpoint.json").read_text())
+    assert saved['done'] == ['a', 'b', 'empty', 'untrained']  # failed users are retried
+    assert saved['next_part'] == 1
+
+
+def test_flushes_every_flush_rows(tmp_path):
+    checkpoint = Checkpoint(tmp_path / "checkpoint.json", JOB, resume=False)
+    writer = RecordingWriter()
+    
+    run_job([(f"u{i}", 3) for i in range(6)], writer, checkpoint, flush_rows=5)
+    
+    assert [part for part, _ in writer.parts] == list(range(len(writer.parts)))
+    assert len(writer.parts) > 1
+    assert sorted(u for _, users in writer.parts for u in users) == [f"u{i}" for i in range(6)]
+
+
+def test_resume_skips_done_users_and_retries_failures(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    first = Checkpoint(path, JOB, resume=False)
+    run_job([('a', 2), ('broken', 2)], RecordingWriter(), first)
+    
+    resumed = Checkpoint(path, JOB, resume=True)
+    assert resumed.done == {'a'}
+    assert resumed.stats['failed_users'] == 0
+    assert resumed.next_part == 1
+    
+    writer = RecordingWriter()
+    run_job([('a', 2), ('b', 3)], writer, resumed)
+    assert writer.parts == [(1, ['b'])]
+    assert resumed.stats['categorized_users'] == 2
+    assert resumed.stats['transactions'] == 5
+
+
+def test_resume_rejects_another_jobs_checkpoint(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    Checkpoint(path, JOB, resume=False).save()
+    
+    with pytest.raises(ValueError, match="different job"):
+        Checkpoint(path, {**JOB, "output": "elsewhere"}, resume=True)
+    assert Checkpoint(path, {**JOB, "output": "elsewhere"}, resume=False).done == set()
+
+
+def test_to_object_ids_converts_hex_strings_only():
+    oid = ObjectId()
+    converted = bulk_categorize.to_object_ids([str(oid), oid, "not-an-id", 7])
+    assert converted == [oid, oid, "not-an-id", 7]
+
+
+def test_mongo_writer_updates_export_ids(monkeypatch):
+    db = AsyncMongoMockClient().finance_db
+    monkeypatch.setattr(data_access, 'get_db', lambda: db)
+    ids = run(db.transactions.insert_many([{'amount': float(i)} for i in range(4)])).inserted_ids
+    
+    result = {
+        "user_id": "u", "version": "v2",
+        "ids": np.array([str(i) for i in ids], dtype=object),  # as read back from an export
+        "category": np.array(['Food', 'Bills', 'Food', 'Bills'], dtype=object)
+    }
+    run(MongoWriter('mlCategory').write([result], part=0))
+    
+    docs = run(db.transactions.find({}).sort('amount', 1).to_list(None))
+    assert [d['mlCategory']['category'] for d in docs] == ['Food', 'Bills', 'Food', 'Bills']
+    assert all(d['mlCategory']['modelVersion'] == 'v2' for d in docs)
+
+
+@pytest.mark.parametrize("file_format", ['csv', 'parquet'])
+def test_file_writer_numbers_parts(tmp_path, file_format):
+    writer = FileWriter(tmp_path / "out", file_format)
+    result = {**fake_categorize('a', transactions('a', 3)[bulk_categorize.INFERENCE_COLUMNS], 3),
+              "ids": np.array(['x', 'y', 'z'], dtype=object)}
+    
+    run(writer.write([result], part=3))
+    
+    path = tmp_path / "out" / f"part-00003.{file_format}"
+    frame = pd.read_parquet(path) if file_format == 'parquet' else pd.read_csv(path)
+    assert frame['transaction_id'].tolist() == ['x', 'y', 'z']
+    assert frame['category'].tolist() == ['Food', 'Bills', 'Food']
+    assert set(frame['user_id']) == {'a'} and set(frame['model_version']) == {'v1'}
+    assert [p.name for p in (tmp_path / "out").iterdir()] == [path.name]
+
+
+def test_read_export_accepts_column_aliases(tmp_path):
+    path = tmp_path / "export.csv"
+    pd.DataFrame({
+        'user_id': [1, 2], '_id': ['a', 'b'], 'description': ['coffee', None],
+        'amount': ['4.5', 'oops'], 'date': ['2024-01-01T10:00:00Z', 'bad'], 'category': ['Food', 'Bills']
+    }).to_csv(path, index=False)
+    
+    frame = bulk_categorize.read_export(path)
+    
+    assert list(frame.columns) == ['user_id', 'id'] + bulk_categorize.INFERENCE_COLUMNS
+    assert frame['user_id'].tolist() == ['1', '2']
+    assert frame['description'].tolist() == ['coffee', '']
+    assert frame['amount'].tolist() == [4.5, 0.0]
+    assert frame['date'].iloc[0] == pd.Timestamp('2024-01-01 10:00') and pd.isna(frame['date'].iloc[1])
+
+
+def test_read_export_requires_columns(tmp_path):
+    path = tmp_path / "export.csv"
+    pd.DataFrame({'userId': ['1'], 'description': ['coffee']}).to_csv(path, index=False)
+    with pytest.raises(ValueError, match="needs a user column"):
+        bulk_categorize.read_export(path)
+
+
+def test_users_without_a_model_are_skipped(tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_categorize, 'MODEL_PATH', tmp_path)
+    frame = transactions('nobody', 2)[bulk_categorize.INFERENCE_COLUMNS]
+    
+    assert categorize_user('nobody', frame, 10) == {"user_id": 'nobody', "status": "no_model"}
+    assert list(tmp_path.iterdir()) == []
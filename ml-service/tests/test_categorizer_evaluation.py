@@ -0,0 +1,76 @@
+"""Holdout, out-of-bag and cross-validated scoring in TransactionCategorizer.train"""
+from collections import Counter
+
+import pytest
+
+from benchmarks.synthetic import generate_transactions
+from services import transaction_categorizer
+from services.transaction_categorizer import TransactionCategorizer
+
+
+@pytest.fixture(scope="module")
+def transactions():
+    return generate_transactions(400, seed=31)
+
+
+def total_support(result) -> int:
+    return sum(scores['support'] for scores in result['per_category'].values())
+
+
+def test_holdout_scores_a_fifth(transactions):
+    result = TransactionCategorizer("eval_holdout").train(transactions, eval_mode='holdout')
+    
+    assert result['evaluation'] == 'holdout'
+    assert total_support(result) == pytest.approx(len(transactions) * 0.2, abs=1)
+
+
+def test_oob_fits_on_all_rows(transactions):
+    categorizer = TransactionCategorizer("eval_oob")
+    result = categorizer.train(transactions, eval_mode='oob')
+    
+    assert result['evaluation'] == 'oob'
+    assert categorizer.classifier.oob_score
+    # Nearly every row is out of bag for some tree, so nearly all are scored
+    assert total_support(result) > 0.95 * len(transactions)
+    assert result['accuracy'] > 0.7
+
+
+@pytest.fixture
+def folds(monkeypatch):
+    """``(n_splits, fold classifier n_jobs, cross_val_predict n_jobs)`` of each CV run"""
+    calls = []
+    cross_val_predict = transaction_categorizer.cross_val_predict
+    
+    def spy(estimator, X, y, cv, n_jobs):
+        calls.append((cv.n_splits, estimator.get_params()['n_jobs'], n_jobs))
+        return cross_val_predict(estimator, X, y, cv=cv, n_jobs=n_jobs)
+    monkeypatch.setattr(transaction_categorizer, 'cross_val_predict', spy)
+    monkeypatch.setattr(transaction_categorizer, 'CATEGORIZER_N_JOBS', 2)
+    return calls
+
+
+def test_cv_scores_every_row(transactions, folds):
+    smallest = min(Counter(t['category'] for t in transactions).values())
+    categorizer = TransactionCategorizer("eval_cv")
+    result = categorizer.train(transactions, eval_mode='cv')
+    
+    assert result['evaluation'] == 'cv'
+    assert total_support(result) == len(transactions)
+    # Folds run in parallel, each with a single-threaded classifier
+    assert folds == [(min(transaction_categorizer.CATEGORIZER_CV_FOLDS, smallest), 1, 2)]
+    # The saved model is fit on everything
+    assert categorizer.classifier.n_features_in_ > 0
+    assert not hasattr(categorizer.classifier, 'oob_score_')
+
+
+def test_cv_folds_limited_by_smallest_category(transactions, folds):
+    rare = [dict(t, category='Gifts') for t in transactions[:2]]
+    result = TransactionCategorizer("eval_cv_rare").train(transactions[2:] + rare, eval_mode='cv')
+    
+    assert folds[0][0] == 2
+    assert result['per_category']['Gifts']['support'] == 2
+
+
+def test_unknown_eval_mode_is_rejected(transactions):
+    with pytest.raises(ValueError):
+        TransactionCategorizer("eval_unknown").train(transactions, eval_mode='bootstrap')
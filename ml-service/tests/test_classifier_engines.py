@@ -0,0 +1,89 @@
+"""XGBoost classifier wrapper and the xgboost categorizer engine"""
+import numpy as np
+import pytest
+from scipy import sparse
+from sklearn.base import clone
+
+from benchmarks.synthetic import generate_transactions
+from services.classifier_engines import XGBoostCategoryClassifier
+from services.transaction_categorizer import TransactionCategorizer
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.RandomState(0)
+    labels = np.array(['Food', 'Travel', 'Bills'])
+    y = labels[rng.randint(0, 3, 300)]
+    # One informative column per class plus noise
+    X = rng.normal(0, 0.3, (300, 6))
+    X[np.arange(300), np.searchsorted(np.sort(labels), y)] += 2
+    return sparse.csr_matrix(X), y
+
+
+def test_fit_predict_with_category_names(data):
+    X, y = data
+    classifier = XGBoostCategoryClassifier(n_estimators=30, n_jobs=1).fit(X, y)
+    
+    assert list(classifier.classes_) == ['Bills', 'Food', 'Travel']
+    probabilities = classifier.predict_proba(X)
+    assert probabilities.shape == (300, 3)
+    np.testing.assert_allclose(probabilities.sum(axis=1), 1, rtol=1e-5)
+    assert (classifier.predict(X) == y).mean() > 0.9
+
+
+def test_unfitted_has_no_classes():
+    assert not hasattr(XGBoostCategoryClassifier(), 'classes_')
+
+
+def test_early_stopping_on_eval_set(data):
+    X, y = data
+    classifier = XGBoostCategoryClassifier(n_estimators=500, early_stopping_rounds=5, n_jobs=1)
+    classifier.fit(X[:200], y[:200], eval_set=(X[200:], y[200:]))
+    
+    assert classifier.best_iteration is not None
+    assert classifier.best_iteration < 499
+
+
+def test_save_load_round_trip(data, tmp_path):
+    X, y = data
+    classifier = XGBoostCategoryClassifier(n_estimators=30, n_jobs=1).fit(X, y)
+    classifier.save(tmp_path / "classifier.ubj")
+    
+    loaded = XGBoostCategoryClassifier.load(tmp_path / "classifier.ubj")
+    
+    assert list(loaded.classes_) == list(classifier.classes_)
+    np.testing.assert_array_equal(loaded.predict_proba(X), classifier.predict_proba(X))
+    np.testing.assert_array_equal(loaded.predict(X), classifier.predict(X))
+
+
+def test_clone_keeps_params():
+    classifier = XGBoostCategoryClassifier(n_estimators=30, max_depth=3).set_params(n_jobs=1)
+    cloned = clone(classifier)
+    assert cloned.get_params() == classifier.get_params()
+    assert cloned.model is None
+
+
+def test_xgboost_categorizer_persists_and_reloads():
+    transactions = generate_transactions(400, seed=11)
+    categorizer = TransactionCategorizer("xgb_user", engine='xgboost')
+    result = categorizer.train(transactions, eval_mode='holdout')
+    
+    assert result['engine'] == 'xgboost'
+    assert 'best_iteration' in result
+    assert (categorizer.store.resolve()[1] / "classifier.ubj").exists()
+    
+    reloaded = TransactionCategorizer("xgb_user", engine='xgboost')
+    sample = transactions[:20]
+    assert [reloaded.predict(t)['category'] for t in sample] == [categorizer.predict(t)['category'] for t in sample]
+
+
+def test_oob_falls_back_to_holdout_for_xgboost():
+    result = TransactionCategorizer("xgb_oob_user", engine='xgboost').train(
+        generate_transactions(300, seed=12), eval_mode='oob'
+    )
+    assert result['evaluation'] == 'holdout'
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        TransactionCategorizer("bad_engine_user", engine='svm')
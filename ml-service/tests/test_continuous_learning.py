@@ -0,0 +1,226 @@
+"""Retrain scheduling of ContinuousLearningService against an in-memory MongoDB"""
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+
+import continuous_learning
+import data_access
+from continuous_learning import ContinuousLearningService
+
+USER = 'user-1'
+
+
+@pytest.fixture
+def db(monkeypatch, tmp_path):
+    db = mongomock.MongoClient().finance_db
+    monkeypatch.setattr(data_access, 'get_sync_db', lambda: db)
+    monkeypatch.setattr(continuous_learning, 'TRAINING_STATE_FILE', tmp_path / 'training_state.json')
+    return db
+
+
+def make_service(new_transactions: int = 100) -> ContinuousLearningService:
+    service = ContinuousLearningService()
+    service.count_user_transactions = lambda user_id, since_date=None: new_transactions
+    return service
+
+
+def trained(db, days_ago: float):
+    db.model_training_history.insert_one({
+        'userId': USER, 'modelType': 'categorizer',
+        'trainedAt': datetime.now() - timedelta(days=days_ago),
+        'metrics': {'accuracy': 0.9}, 'durationSeconds': 2.0
+    })
+
+
+def skip(service: ContinuousLearningService):
+    service.save_skip_record(USER, "no_drift", {'drifted': False}, evaluation_seconds=0.5, saved_seconds=3.0)
+    service.flush_training_records()
+
+
+def test_skip_restarts_retrain_interval(db):
+    trained(db, days_ago=10)
+    service = make_service()
+    assert service.should_retrain(USER) == (True, "periodic_retrain")
+    
+    skip(service)
+    
+    assert service.should_retrain(USER) == (False, "too_soon")
+    record = db.model_training_history.find_one({'modelType': 'retrain_skipped'})
+    assert 'trainedAt' not in record and record['evaluatedAt'] is not None
+
+
+def test_evaluation_time_survives_restart(db):
+    trained(db, days_ago=10)
+    skip(make_service())
+    
+    # From the state file
+    assert make_service().should_retrain(USER) == (False, "too_soon")
+    
+    # From the training history alone
+    continuous_learning.TRAINING_STATE_FILE.unlink()
+    service = make_service()
+    assert service.should_retrain(USER) == (False, "too_soon")
+    assert service.get_last_training_time(USER) < service.last_evaluation_times[USER]
+
+
+def test_old_evaluation_does_not_block_retrain(db):
+    trained(db, days_ago=20)
+    db.model_training_history.insert_one({
+        'userId': USER, 'modelType': 'retrain_skipped', 'evaluatedAt': datetime.now() - timedelta(days=10)
+    })
+    
+    assert make_service().should_retrain(USER) == (True, "periodic_retrain")
+
+
+def test_new_transactions_are_counted_since_last_check(db):
+    trained(db, days_ago=20)
+    db.model_training_history.insert_one({
+        'userId': USER, 'modelType': 'retrain_skipped', 'evaluatedAt': datetime.now() - timedelta(days=8)
+    })
+    service = make_service()
+    counted = []
+    service.count_user_transactions = lambda user_id, since_date=None: counted.append(since_date) or 100
+    
+    service.should_retrain(USER)
+    
+    assert counted == [service.last_evaluation_times[USER]]
+
+
+def test_cycle_does_not_rescore_skipped_user(db, monkeypatch):
+    db.users.insert_one({'_id': USER})
+    trained(db, days_ago=10)
+    service = make_service()
+    monkeypatch.setattr(continuous_learning, 'DRIFT_GATING', True)
+    monkeypatch.setattr(service, 'materialize_forecasts', lambda user_ids=None: None)
+    checks = []
+    
+    def check_drift(user_id):
+        checks.append(user_id)
+        service.save_skip_record(user_id, "no_drift", {'drifted': False}, evaluation_seconds=0.5)
+        return False, "no_drift"
+    monkeypatch.setattr(service, 'check_drift', check_drift)
+    
+    for _ in range(3):
+        service.check_and_train_all_users()
+    
+    assert checks == [USER]
+    assert db.model_training_history.count_documents({'modelType': 'retrain_skipped'}) == 1
+
+
+@pytest.mark.parametrize("drifted, trains", [(False, False), (True, True)])
+def test_event_retrain_is_drift_gated(db, monkeypatch, drifted, trains):
+    trained(db, days_ago=1)
+    service = make_service()
+    monkeypatch.setattr(continuous_learning, 'DRIFT_GATING', True)
+    monkeypatch.setattr(service, 'check_drift', lambda user_id: (drifted, "drift" if drifted else "no_drift"))
+    trainings, materialized = [], []
+    monkeypatch.setattr(service, 'train_user_models', lambda user_id: trainings.append(user_id) or True)
+    monkeypatch.setattr(service, 'materialize_forecasts', lambda user_ids=None: materialized.append(user_ids))
+    
+    service.retrain_from_event(USER)
+    
+    assert trainings == ([USER] if trains else [])
+    assert materialized == ([[USER]] if trains else [])
+
+
+def test_event_retrain_of_new_user_skips_drift_check(db, monkeypatch):
+    service = make_service()
+    monkeypatch.setattr(service, 'check_drift', lambda user_id: pytest.fail("no model to check"))
+    trainings = []
+    monkeypatch.setattr(service, 'train_user_models', lambda user_id: trainings.append(user_id) or False)
+    
+    service.retrain_from_event(USER)
+    
+    assert trainings == [USER]
+
+
+class _CountingHistory:
+    """model_training_history wrapper recording aggregation matches and inserts"""
+    
+    def __init__(self, collection):
+        self.collection = collection
+        self.matches = []
+        self.inserts = []
+    
+    def aggregate(self, pipeline, **kwargs):
+        self.matches.append(pipeline[0]['$match'])
+        return self.collection.aggregate(pipeline, **kwargs)
+    
+    def insert_many(self, records, **kwargs):
+        self.inserts.append(len(records))
+        return self.collection.insert_many(records, **kwargs)
+
+
+@pytest.fixture
+def history(db):
+    history = _CountingHistory(db.model_training_history)
+    service = make_service()
+    service.db = type('DB', (), {'model_training_history': history, 'users': db.users})()
+    return service, history
+
+
+def test_latest_training_per_user_and_model(db):
+    trained(db, days_ago=30)
+    trained(db, days_ago=3)
+    db.model_training_history.insert_one({
+        'userId': USER, 'modelType': 'forecaster', 'trainedAt': datetime.now() - timedelta(days=5),
+        'metrics': {}, 'durationSeconds': 7.0
+    })
+    service = make_service()
+    
+    assert (datetime.now() - service.get_last_training_time(USER)).days == 3
+    assert service.get_last_training_record(USER, 'categorizer') == {'accuracy': 0.9, 'durationSeconds': 2.0}
+    assert service.get_last_training_record(USER, 'forecaster')['durationSeconds'] == 7.0
+    assert service.get_last_training_record('nobody', 'forecaster') == {}
+
+
+def test_later_syncs_only_aggregate_new_history(db, history):
+    service, calls = history
+    trained(db, days_ago=3)
+    
+    service.load_training_times()
+    synced_at = service.history_synced_at
+    service.load_training_times()
+    
+    assert '$gte' not in calls.matches[0]['$or'][0]['trainedAt']
+    assert calls.matches[1]['$or'][0]['trainedAt']['$gte'] == synced_at
+
+
+def test_restart_resumes_from_state_file(db):
+    trained(db, days_ago=3)
+    make_service().load_training_times()
+    # History that predates the saved sync is not queried again
+    db.model_training_history.delete_many({})
+    
+    service = make_service()
+    assert service.history_synced_at is not None
+    assert service.get_last_training_time(USER) is not None
+    assert service.get_last_training_record(USER, 'categorizer')['accuracy'] == 0.9
+
+
+@pytest.mark.parametrize("contents", ["not json", '{"synced_at": "2024-01-01T00:00:00", "last_training_times": {}}'])
+def test_unreadable_or_old_state_is_resynced(db, contents):
+    continuous_learning.TRAINING_STATE_FILE.write_text(contents)
+    trained(db, days_ago=3)
+    
+    service = make_service()
+    
+    assert service.history_synced_at is None
+    assert service.get_last_training_time(USER) is not None
+
+
+def test_training_records_are_written_in_one_batch(db, history):
+    service, calls = history
+    service.save_training_record(USER, 'categorizer', {'accuracy': 0.8}, duration=1.23456)
+    service.save_training_record(USER, 'forecaster', {'categories_trained': 3}, duration=4.0)
+    
+    # Visible in memory before anything is written
+    assert calls.inserts == []
+    assert service.get_last_training_record(USER, 'categorizer') == {'accuracy': 0.8, 'durationSeconds': 1.235}
+    
+    service.flush_training_records()
+    service.flush_training_records()
+    
+    assert calls.inserts == [2]
+    assert db.model_training_history.count_documents({'userId': USER}) == 2
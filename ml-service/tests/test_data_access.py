@@ -0,0 +1,116 @@
+"""Batched columnar reads and prefetching in data_access, against an in-memory MongoDB"""
+import asyncio
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+import data_access
+
+USER = ObjectId()
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = AsyncMongoMockClient().finance_db
+    monkeypatch.setattr(data_access, 'get_db', lambda: db)
+    data_access.run(db.transactions.insert_many([
+        {'userId': USER, 'description': 'ZOMATO', 'amount': -120, 'category': 'Food',
+         'date': datetime(2024, 3, 1, 12), 'createdAt': datetime(2024, 3, 1)},
+        # Legacy documents: string dates, integer amounts, missing fields
+        {'userId': USER, 'description': 'UBER', 'amount': 80, 'category': 'Travel',
+         'date': '2024-03-05T08:30:00Z', 'createdAt': datetime(2024, 3, 5)},
+        {'userId': USER, 'amount': 5.5, 'date': 'not a date', 'createdAt': datetime(2024, 3, 9)},
+        {'userId': 'someone-else', 'description': 'RENT', 'amount': 900, 'category': 'Bills',
+         'date': datetime(2024, 3, 1), 'createdAt': datetime(2024, 3, 1)},
+    ]))
+    return db
+
+
+def test_fetch_user_transactions_as_columns(db):
+    df = data_access.run(data_access.fetch_user_transactions(USER, batch_size=2))
+    
+    assert list(df.columns) == data_access.TRANSACTION_COLUMNS
+    assert df['description'].tolist() == ['ZOMATO', 'UBER', '']
+    assert df['amount'].dtype == np.float64
+    assert df['amount'].tolist() == [-120.0, 80.0, 5.5]
+    assert df['date'].dtype == 'datetime64[ns]'
+    assert df['date'][1] == pd.Timestamp('2024-03-05 08:30:00')
+    assert pd.isna(df['date'][2])
+
+
+def test_fetch_since_filters_on_created_at(db):
+    df = data_access.run(data_access.fetch_user_transactions(USER, since=datetime(2024, 3, 4)))
+    assert df['description'].tolist() == ['UBER', '']
+    
+    assert data_access.run(data_access.count_user_transactions(USER)) == 3
+    assert data_access.run(data_access.count_user_transactions(USER, since=datetime(2024, 3, 4))) == 2
+
+
+def test_empty_result_keeps_columns(db):
+    df = data_access.run(data_access.fetch_user_transactions(ObjectId()))
+    assert len(df) == 0 and list(df.columns) == data_access.TRANSACTION_COLUMNS
+
+
+def test_changes_carry_ids_and_update_times(db):
+    data_access.run(db.transactions.update_many({'userId': USER}, {'$set': {'updatedAt': datetime(2024, 4, 1)}}))
+    df = data_access.run(data_access.fetch_transaction_changes(USER))
+    
+    assert list(df.columns) == data_access.CHANGE_COLUMNS
+    assert all(ObjectId.is_valid(i) for i in df['id'])
+    assert (df['updated_at'] == pd.Timestamp('2024-04-01')).all()
+
+
+def test_inference_rows_keep_raw_ids(db):
+    df = data_access.run(data_access.fetch_inference_transactions(USER))
+    
+    assert list(df.columns) == ['id', 'description', 'amount', 'date']
+    assert all(isinstance(i, ObjectId) for i in df['id'])
+
+
+def test_prefetch_keeps_order_and_bounded_fetches():
+    in_flight, peak = 0, 0
+    
+    async def fetch(user_id):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01 * (5 - user_id))  # later users finish first
+        in_flight -= 1
+        return pd.DataFrame({'user': [user_id]})
+    
+    async def collect():
+        return [
+            (user_id, frame['user'][0])
+            async for user_id, frame in data_access.prefetch_users(range(5), depth=2, fetch=fetch)
+        ]
+    
+    assert asyncio.run(collect()) == [(i, i) for i in range(5)]
+    assert peak <= 3
+
+
+def test_training_overlaps_next_fetch():
+    training = threading.Event()
+    fetched_while_training = []
+    
+    async def fetch(user_id):
+        await asyncio.sleep(0.01 * user_id)
+        fetched_while_training.append(training.is_set())
+        return pd.DataFrame({'user': [user_id]})
+    
+    def train(user_id, transactions):
+        training.set()
+        # Give the loop time to start the next fetch
+        threading.Event().wait(0.05)
+        training.clear()
+        return len(transactions)
+    
+    results = asyncio.run(data_access.train_with_prefetch([1, 2, 3], train, depth=1, fetch=fetch))
+    
+    assert results == {1: 1, 2: 1, 3: 1}
+    # User 1 is fetched up front; the rest arrive while the previous user trains
+    assert fetched_while_training[1:] == [True, True]
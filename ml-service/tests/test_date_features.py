@@ -0,0 +1,68 @@
+"""Cached date parsing and vectorized calendar features"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.date_features import CALENDAR_FEATURES, calendar_features, parse_dates
+
+DATES = [
+    "2024-02-02T10:10:00", "2024-05-24T03:12:00", "2024-02-02T10:10:00",
+    "2024-11-09", "2024-12-31T23:59:59.500", "2024-05-24T03:12:00",
+]
+
+
+def expected_features(values) -> np.ndarray:
+    """The per-row pandas computation calendar_features replaces"""
+    dates = pd.to_datetime(pd.Series(values), format='ISO8601')
+    return np.column_stack([dates.dt.hour, dates.dt.dayofweek, dates.dt.day, dates.dt.month])
+
+
+def test_calendar_features_match_pandas():
+    features = calendar_features(np.array(DATES, dtype=object))
+    
+    assert features.shape == (len(DATES), len(CALENDAR_FEATURES))
+    assert features.dtype == np.int32
+    np.testing.assert_array_equal(features, expected_features(DATES))
+
+
+def test_calendar_features_of_parsed_dates():
+    parsed = pd.to_datetime(pd.Series(DATES), format='ISO8601').values
+    np.testing.assert_array_equal(calendar_features(parsed), expected_features(DATES))
+
+
+@pytest.mark.parametrize("missing", [None, np.nan])
+def test_missing_dates_are_zero_rows(missing):
+    features = calendar_features(np.array([DATES[0], missing, DATES[1]], dtype=object))
+    
+    np.testing.assert_array_equal(features[1], [0, 0, 0, 0])
+    np.testing.assert_array_equal(features[[0, 2]], expected_features(DATES[:2]))
+
+
+def test_parse_dates_matches_to_datetime():
+    parsed = parse_dates(np.array(DATES, dtype=object))
+    pd.testing.assert_index_equal(parsed, pd.DatetimeIndex(pd.to_datetime(DATES, format='ISO8601')))
+
+
+def test_parse_dates_keeps_missing_as_nat():
+    parsed = parse_dates(np.array([None, DATES[0], None], dtype=object))
+    assert parsed.isna().tolist() == [True, False, True]
+    assert parsed[1] == pd.Timestamp(DATES[0])
+
+
+def test_parse_dates_passes_parsed_values_through():
+    values = pd.date_range("2024-01-01", periods=3).values
+    pd.testing.assert_index_equal(parse_dates(values), pd.DatetimeIndex(values))
+
+
+def test_each_distinct_date_is_parsed_once(monkeypatch):
+    parsed_counts = []
+    to_datetime = pd.to_datetime
+    
+    def counting(values, *args, **kwargs):
+        parsed_counts.append(len(values))
+        return to_datetime(values, *args, **kwargs)
+    monkeypatch.setattr(pd, 'to_datetime', counting)
+    
+    calendar_features(np.array(DATES * 100, dtype=object))
+    
+    assert parsed_counts == [len(set(DATES))]
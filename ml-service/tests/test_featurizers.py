@@ -0,0 +1,85 @@
+"""Hashed description features and the hashing categorizer featurizer"""
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfTransformer
+
+from benchmarks.synthetic import generate_transactions
+from services.featurizers import HashedTextFeaturizer
+from services.transaction_categorizer import TransactionCategorizer
+
+DOCUMENTS = [
+    "zomato online order", "swiggy food order", "uber trip mumbai",
+    "ola trip", "electricity bill payment", "zomato online", "uber trip",
+]
+
+
+def dense(matrix) -> np.ndarray:
+    return matrix.toarray()
+
+
+def test_matches_tfidf_on_hashed_counts():
+    featurizer = HashedTextFeaturizer(n_features=256)
+    features = featurizer.fit_transform(DOCUMENTS)
+    
+    counts = featurizer.vectorizer.transform(DOCUMENTS)
+    expected = TfidfTransformer(smooth_idf=True).fit(counts).transform(counts)
+    
+    assert features.shape == (len(DOCUMENTS), 256)
+    np.testing.assert_allclose(dense(features), dense(expected), rtol=1e-5)
+
+
+def test_without_idf_rows_are_normalized_counts():
+    features = HashedTextFeaturizer(n_features=256, use_idf=False).fit_transform(DOCUMENTS)
+    np.testing.assert_allclose(np.linalg.norm(dense(features), axis=1), 1, rtol=1e-5)
+
+
+def test_partial_fit_matches_full_fit():
+    full = HashedTextFeaturizer(n_features=256)
+    full.fit_transform(DOCUMENTS)
+    
+    incremental = HashedTextFeaturizer(n_features=256)
+    incremental.fit_transform(DOCUMENTS[:3])
+    incremental.partial_fit(DOCUMENTS[3:])
+    
+    assert incremental.n_documents == full.n_documents
+    np.testing.assert_array_equal(incremental.document_frequency, full.document_frequency)
+    np.testing.assert_allclose(dense(incremental.transform(DOCUMENTS)), dense(full.transform(DOCUMENTS)))
+
+
+def test_refit_resets_statistics():
+    featurizer = HashedTextFeaturizer(n_features=256)
+    featurizer.fit_transform(DOCUMENTS)
+    featurizer.fit_transform(DOCUMENTS[:2])
+    assert featurizer.n_documents == 2
+
+
+def test_unseen_tokens_need_no_vocabulary():
+    featurizer = HashedTextFeaturizer(n_features=256)
+    featurizer.fit_transform(DOCUMENTS)
+    assert featurizer.transform(["brand new merchant"]).nnz > 0
+
+
+@pytest.mark.parametrize("use_idf", [True, False])
+def test_save_load_round_trip(tmp_path, use_idf):
+    featurizer = HashedTextFeaturizer(n_features=512, ngram_range=(1, 1), use_idf=use_idf)
+    featurizer.fit_transform(DOCUMENTS)
+    featurizer.save(tmp_path / "text_hashing.npz")
+    
+    loaded = HashedTextFeaturizer.load(tmp_path / "text_hashing.npz")
+    
+    assert (loaded.n_features, loaded.ngram_range, loaded.use_idf) == (512, (1, 1), use_idf)
+    np.testing.assert_array_equal(dense(loaded.transform(DOCUMENTS)), dense(featurizer.transform(DOCUMENTS)))
+
+
+def test_hashing_categorizer_persists_and_reloads():
+    transactions = generate_transactions(300, seed=21)
+    categorizer = TransactionCategorizer("hashing_user", featurizer='hashing')
+    assert categorizer.train(transactions, eval_mode='holdout')['featurizer'] == 'hashing'
+    
+    version_dir = categorizer.store.resolve()[1]
+    assert (version_dir / "text_hashing.npz").exists()
+    assert not (version_dir / "tfidf_vectorizer.pkl").exists()
+    
+    reloaded = TransactionCategorizer("hashing_user", featurizer='hashing')
+    sample = transactions[:20]
+    assert [reloaded.predict(t)['category'] for t in sample] == [categorizer.predict(t)['category'] for t in sample]
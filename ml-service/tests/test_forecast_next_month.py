@@ -0,0 +1,35 @@
+"""/forecast/next-month served from materialized forecasts"""
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from benchmarks.synthetic import generate_transactions
+from materialize_forecasts import materialize_user
+from services.expense_forecaster import ExpenseForecaster
+
+
+@pytest.fixture(scope="module")
+def client():
+    ExpenseForecaster("next_month_user").train(generate_transactions(600, seed=5))
+    with TestClient(main.app) as client:
+        yield client
+
+
+def test_next_month_requires_user_id(client):
+    assert client.post("/forecast/next-month", json={}).status_code == 422
+
+
+def test_next_month_served_from_store(client):
+    live = client.post("/forecast/next-month", json={"user_id": "next_month_user"})
+    assert live.status_code == 200
+    
+    assert materialize_user("next_month_user")["status"] == "materialized"
+    hits = main.forecast_store.stats()["hits"]
+    stored = client.post("/forecast/next-month", json={"user_id": "next_month_user"})
+    assert stored.status_code == 200
+    assert main.forecast_store.stats()["hits"] == hits + 1
+    
+    live_data, stored_data = live.json()["data"], stored.json()["data"]
+    assert stored_data["forecast_period_days"] == live_data["forecast_period_days"]
+    assert set(stored_data["categories"]) == set(live_data["categories"])
+    assert stored_data["total_predicted_expense"] == pytest.approx(live_data["total_predicted_expense"])
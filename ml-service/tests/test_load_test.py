@@ -0,0 +1,101 @@
+"""Load-test harness: operation mix, request builders, level summaries and seeding"""
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+import continuous_learning
+import data_access
+import main
+from benchmarks import load_test
+from benchmarks.synthetic import generate_transactions
+from services.expense_forecaster import ExpenseForecaster
+from services.transaction_categorizer import TransactionCategorizer
+
+USER = "load_test_user"
+
+
+def test_parse_mix():
+    assert load_test.parse_mix(load_test.DEFAULT_MIX)["predict"] == 70
+    assert load_test.parse_mix("predict=1, status=2.5") == {"predict": 1.0, "status": 2.5}
+    with pytest.raises(ValueError):
+        load_test.parse_mix("predict=1,delete=1")
+
+
+def level(concurrency, throughput):
+    return {"concurrency": concurrency, "throughput": throughput}
+
+
+def test_saturation_point():
+    assert load_test.saturation_point([level(1, 100), level(2, 190), level(4, 200), level(8, 150)]) == 2
+    assert load_test.saturation_point([level(1, 100), level(2, 200)]) is None
+
+
+@pytest.fixture(scope="module")
+def history():
+    transactions = generate_transactions(400, seed=51)
+    TransactionCategorizer(USER).train(transactions)
+    ExpenseForecaster(USER).train(transactions)
+    return transactions
+
+
+@pytest.mark.parametrize("name", [name for name in load_test.OPERATIONS if name != "train"])
+def test_operations_build_valid_requests(history, name):
+    method, path, body = load_test.OPERATIONS[name](random.Random(0), USER, history, 10)
+    
+    with TestClient(main.app) as client:
+        response = client.request(method, path, json=body)
+    
+    assert response.status_code == 200, response.text
+
+
+def test_train_operation_sends_full_history(history):
+    method, path, body = load_test.op_train(random.Random(0), USER, history, 10)
+    assert (method, path) == ("POST", "/categorize/train")
+    assert len(body["transactions"]) == len(history)
+
+
+class _Response:
+    def __init__(self, ok):
+        self.ok = ok
+
+
+class _Session:
+    def __init__(self):
+        self.calls = 0
+    
+    def request(self, method, url, json=None, timeout=None):
+        self.calls += 1
+        return _Response(ok="forecast" not in url)
+
+
+def test_run_level_summarizes_per_operation(history, monkeypatch):
+    monkeypatch.setattr(load_test.requests, "Session", _Session)
+    
+    result = load_test.run_level(
+        "http://test", {USER: history}, {"predict": 1, "forecast": 1}, concurrency=2, duration=0.2, batch_size=5
+    )
+    
+    assert result["concurrency"] == 2
+    operations = result["operations"]
+    assert set(operations) == {"predict", "forecast"}
+    assert operations["predict"]["error_rate"] == 0
+    assert operations["forecast"]["error_rate"] == 1
+    assert result["requests"] == operations["predict"]["requests"] + operations["forecast"]["requests"]
+    assert result["p50_ms"] <= result["p90_ms"] <= result["p99_ms"]
+
+
+def test_seed_users_trains_through_continuous_learning(monkeypatch, tmp_path):
+    # seed_users swaps in the in-memory databases; restore them afterwards
+    monkeypatch.setattr(data_access, "get_db", data_access.get_db)
+    monkeypatch.setattr(data_access, "get_sync_db", data_access.get_sync_db)
+    monkeypatch.setattr(continuous_learning, "TRAINING_STATE_FILE", tmp_path / "training_state.json")
+    monkeypatch.setattr(continuous_learning, "FORECAST_MATERIALIZE", False)
+    
+    seeded = load_test.seed_users(users=1, transactions=150)
+    
+    (user_id, transactions), = seeded.items()
+    assert len(transactions) == 150
+    assert TransactionCategorizer(user_id).is_trained()
+    history = data_access.get_sync_db().model_training_history
+    assert history.count_documents({'userId': user_id, 'trainedAt': {'$exists': True}}) == 2
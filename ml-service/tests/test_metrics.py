@@ -0,0 +1,78 @@
+"""Metric primitives, stage timers and the exported training metrics"""
+from services import metrics
+from services.metrics import Counter, Gauge, Histogram
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("h", "test", labels=("route",), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 5):
+        histogram.observe(value, route="/x")
+    
+    lines = histogram.render()
+    assert 'h_bucket{route="/x",le="0.1"} 1' in lines
+    assert 'h_bucket{route="/x",le="1"} 3' in lines
+    assert 'h_bucket{route="/x",le="+Inf"} 4' in lines
+    assert 'h_count{route="/x"} 4' in lines
+    assert lines[-2] == 'h_sum{route="/x"} 6.05'
+
+
+def test_label_values_are_escaped():
+    counter = Counter("c", "test", labels=("path",))
+    counter.inc(path='a"b\\c\nd')
+    assert counter.render()[-1] == 'c{path="a\\"b\\\\c\\nd"} 1'
+
+
+def test_callback_gauge_is_computed_at_scrape_time():
+    sizes = {("categorizer",): 1}
+    gauge = Gauge("g", "test", labels=("model",), callback=lambda: sizes)
+    sizes[("categorizer",)] = 3
+    assert gauge.render()[-1] == 'g{model="categorizer"} 3'
+
+
+def test_training_duration_is_labelled_by_model_only(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", True)
+    for seconds in (1.0, 2.0, 3.0):
+        metrics.record_training("forecaster", seconds)
+    
+    exported = [
+        line for line in metrics.REGISTRY.render().splitlines()
+        if line.startswith("ml_last_training_duration_seconds{")
+    ]
+    assert 'ml_last_training_duration_seconds{model="forecaster"} 3.0' in exported
+    assert not any("user_id" in line or "category" in line for line in exported)
+
+
+def test_stage_timer_traces_request_stages():
+    stages, token = metrics.trace_request()
+    try:
+        with metrics.stage_timer("categorizer", "featurize"):
+            pass
+        with metrics.stage_timer("categorizer", "featurize"):
+            pass
+        with metrics.stage_timer("api", "serialize"):
+            pass
+    finally:
+        metrics.end_trace(token)
+    
+    assert [name for name, _ in stages] == ["categorizer.featurize", "categorizer.featurize", "api.serialize"]
+    header = metrics.server_timing(stages)
+    assert header.startswith("categorizer.featurize;dur=") and ", api.serialize;dur=" in header
+
+
+def test_disabled_timers_are_shared_no_ops(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", False)
+    assert metrics.stage_timer("a", "b") is metrics.stage_timer("c", "d")
+    
+    before = metrics.TRAINING_DURATION.render()
+    metrics.record_training("categorizer", 1.0)
+    assert metrics.TRAINING_DURATION.render() == before
+
+
+def test_training_results_carry_durations():
+    from benchmarks.synthetic import generate_transactions
+    from services.expense_forecaster import ExpenseForecaster
+    
+    result = ExpenseForecaster("metrics_user").train_category_model(generate_transactions(400, seed=3), "Food")
+    
+    assert result["status"] == "trained"
+    assert result["training_seconds"] >= result["fit_seconds"] > 0
@@ -0,0 +1,127 @@
+"""Versioned model publishing and the hot-swapping model cache"""
+import time
+
+import pytest
+
+from services.model_cache import ModelCache
+from services.model_store import ModelStore, POINTER_FILE, atomic_dump
+
+
+def publish(store: ModelStore, content: str) -> str:
+    staging_dir = store.stage()
+    (staging_dir / "model.txt").write_text(content)
+    return store.publish(staging_dir)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ModelStore(tmp_path / "categorizer_u1", keep_versions=2)
+
+
+def test_publish_then_resolve(store):
+    assert store.resolve(legacy_marker="model.txt") == (None, None)
+    
+    version = publish(store, "v1")
+    
+    assert store.current_version() == version
+    resolved, version_dir = store.resolve(legacy_marker="model.txt")
+    assert resolved == version
+    assert (version_dir / "model.txt").read_text() == "v1"
+    # Nothing is left in staging
+    assert [p.name for p in store.versions_dir.iterdir()] == [version]
+
+
+def test_each_publish_moves_the_pointer(store):
+    first = publish(store, "v1")
+    second = publish(store, "v2")
+    
+    assert second > first
+    version, version_dir = store.resolve()
+    assert version == second and (version_dir / "model.txt").read_text() == "v2"
+
+
+def test_gc_keeps_newest_versions(store):
+    versions = [publish(store, f"v{i}") for i in range(5)]
+    
+    assert store.list_versions() == versions[-2:]
+    assert store.current_version() == versions[-1]
+
+
+def test_gc_never_removes_current(tmp_path):
+    store = ModelStore(tmp_path / "categorizer_u1", keep_versions=5)
+    versions = [publish(store, f"v{i}") for i in range(4)]
+    # Roll the pointer back to the oldest version, then tighten retention
+    (store.model_dir / POINTER_FILE).write_text(versions[0])
+    store.keep_versions = 1
+    
+    store.collect_garbage()
+    
+    assert store.list_versions() == [versions[0], versions[-1]]
+    assert store.resolve()[0] == versions[0]
+
+
+def test_legacy_layout_fallback(store):
+    store.model_dir.mkdir(parents=True)
+    atomic_dump({"legacy": True}, store.model_dir / "metadata.pkl")
+    
+    assert store.resolve(legacy_marker="metadata.pkl") == ("legacy", store.model_dir)
+    assert store.resolve(legacy_marker="missing.pkl") == (None, None)
+    
+    # The first publish takes over from the legacy files
+    version = publish(store, "v1")
+    assert store.resolve(legacy_marker="metadata.pkl") == (version, store.versions_dir / version)
+
+
+class FakeModel:
+    def __init__(self, store: ModelStore):
+        self.store = store
+        self.version, version_dir = store.resolve()
+        self.content = (version_dir / "model.txt").read_text() if version_dir else None
+
+
+def wait_for_reloads(cache: ModelCache, timeout: float = 5):
+    deadline = time.time() + timeout
+    while cache.stats()["reloading"] and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_cache_hit_reloads_after_newer_publish(store):
+    loads = []
+    
+    def load(user_id):
+        loads.append(user_id)
+        return FakeModel(store)
+    
+    cache = ModelCache({'categorizer': load}, max_size=4)
+    publish(store, "v1")
+    
+    first = cache.get('categorizer', 'u1')
+    assert first.content == "v1"
+    assert cache.get('categorizer', 'u1') is first  # plain hit, no reload
+    assert len(loads) == 1
+    
+    publish(store, "v2")
+    # The cached version keeps serving while the new one loads in the background
+    assert cache.get('categorizer', 'u1') is first
+    wait_for_reloads(cache)
+    
+    swapped = cache.get('categorizer', 'u1')
+    assert swapped.content == "v2"
+    assert swapped.version == store.current_version()
+    assert len(loads) == 2
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["stale_served"]) == (3, 1, 1)
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    stores = {user_id: ModelStore(tmp_path / user_id) for user_id in ("a", "b", "c")}
+    cache = ModelCache({'categorizer': lambda user_id: FakeModel(stores[user_id])}, max_size=2)
+    
+    cache.get('categorizer', 'a')
+    cache.get('categorizer', 'b')
+    cache.get('categorizer', 'a')
+    cache.get('categorizer', 'c')
+    
+    assert cache.stats()["size"] == 2
+    assert cache.warm('categorizer', 'b') is True  # was evicted
+    assert cache.warm('categorizer', 'c') is False
@@ -0,0 +1,170 @@
+"""Access history ranking and startup prewarming of the model cache"""
+import json
+
+import pytest
+
+from services import access_history, model_store, prewarm
+from services.access_history import AccessHistory
+from services.model_store import ModelStore
+from services.prewarm import Prewarmer
+
+
+class Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+    
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(access_history.time, 'time', clock.time)
+    return clock
+
+
+def make_history(tmp_path, **kwargs) -> AccessHistory:
+    return AccessHistory(tmp_path / "access_history.json", half_life_hours=1, **kwargs)
+
+
+def test_frequent_users_rank_first(tmp_path, clock):
+    history = make_history(tmp_path)
+    for user_id, count in (('a', 1), ('b', 3), ('c', 2)):
+        for _ in range(count):
+            history.record('categorizer', user_id)
+    history.record('forecaster', 'a')
+    
+    assert history.ranked(['categorizer']) == [('categorizer', 'b'), ('categorizer', 'c'), ('categorizer', 'a')]
+    assert ('forecaster', 'a') in history.ranked()
+
+
+def test_old_accesses_decay(tmp_path, clock):
+    history = make_history(tmp_path)
+    for _ in range(3):
+        history.record('categorizer', 'old')
+    clock.now += 4 * 3600  # four half-lives: 3 accesses now weigh 3/16
+    history.record('categorizer', 'recent')
+    
+    assert history.ranked() == [('categorizer', 'recent'), ('categorizer', 'old')]
+
+
+def test_flushes_from_several_processes_merge(tmp_path, clock):
+    first, second = make_history(tmp_path), make_history(tmp_path)
+    first.record('categorizer', 'a')
+    second.record('categorizer', 'a')
+    second.record('categorizer', 'b')
+    
+    first.flush()
+    second.flush()
+    
+    stored = json.loads((tmp_path / "access_history.json").read_text())
+    assert stored['categorizer']['a'][0] == pytest.approx(2)
+    assert stored['categorizer']['b'][0] == pytest.approx(1)
+    assert make_history(tmp_path).ranked() == [('categorizer', 'a'), ('categorizer', 'b')]
+
+
+def test_flush_keeps_top_entries(tmp_path, clock):
+    history = make_history(tmp_path, max_entries=2)
+    for user_id, count in (('a', 1), ('b', 3), ('c', 2)):
+        for _ in range(count):
+            history.record('categorizer', user_id)
+    history.flush()
+    
+    assert make_history(tmp_path).ranked() == [('categorizer', 'b'), ('categorizer', 'c')]
+
+
+def test_unreadable_history_is_ignored(tmp_path, clock):
+    (tmp_path / "access_history.json").write_text("{not json")
+    history = make_history(tmp_path)
+    assert history.ranked() == []
+    
+    history.record('categorizer', 'a')
+    history.flush()
+    assert history.ranked() == [('categorizer', 'a')]
+
+
+class FakeCache:
+    def __init__(self, max_size: int = 10, broken=()):
+        self.max_size = max_size
+        self.broken = set(broken)
+        self.warmed = []
+    
+    def warm(self, kind, user_id):
+        if user_id in self.broken:
+            raise RuntimeError("corrupt model")
+        self.warmed.append((kind, user_id))
+        return True
+
+
+class FakeHistory:
+    def __init__(self, ranked):
+        self._ranked = ranked
+    
+    def ranked(self, kinds):
+        return [entry for entry in self._ranked if entry[0] in kinds]
+
+
+@pytest.fixture
+def models(tmp_path, monkeypatch):
+    """Publish ``{kind}_{user_id}`` models of ``size`` bytes under a temporary MODEL_PATH"""
+    monkeypatch.setattr(model_store, 'MODEL_PATH', tmp_path)
+    monkeypatch.setattr(prewarm, 'MODEL_PATH', tmp_path)
+    
+    def publish(kind: str, user_id: str, size: int = 100):
+        store = ModelStore(tmp_path / f"{kind}_{user_id}")
+        staging_dir = store.stage()
+        (staging_dir / "model.bin").write_bytes(b"x" * size)
+        store.publish(staging_dir)
+    return publish
+
+
+def test_plan_puts_history_before_other_published_users(models):
+    for user_id in ('a', 'b', 'c'):
+        models('categorizer', user_id)
+    models('forecaster', 'a')
+    history = FakeHistory([('categorizer', 'c'), ('forecaster', 'a'), ('categorizer', 'gone')])
+    
+    plan = Prewarmer(FakeCache(), history, ['categorizer'], budget_bytes=1e6).plan()
+    
+    users = [user_id for _, user_id, _ in plan]
+    assert users[0] == 'c'
+    assert sorted(users) == ['a', 'b', 'c']  # each once; unsaved and other kinds left out
+
+
+def test_plan_respects_budget_cache_size_and_ownership(models):
+    models('categorizer', 'big', size=1000)
+    for user_id in ('a', 'b', 'c', 'd'):
+        models('categorizer', user_id)
+    history = FakeHistory([('categorizer', u) for u in ('big', 'a', 'b', 'c', 'd')])
+    
+    budget = Prewarmer(FakeCache(), history, ['categorizer'], budget_bytes=350).plan()
+    assert [u for _, u, _ in budget] == ['a', 'b', 'c']
+    
+    capped = Prewarmer(FakeCache(max_size=2), history, ['categorizer'], budget_bytes=1e6).plan()
+    assert [u for _, u, _ in capped] == ['big', 'a']
+    
+    owned = Prewarmer(FakeCache(), history, ['categorizer'], budget_bytes=1e6, owns=lambda u: u in 'bd').plan()
+    assert [u for _, u, _ in owned] == ['b', 'd']
+
+
+def test_run_loads_plan_once_and_reports_status(models):
+    for user_id in ('a', 'b'):
+        models('categorizer', user_id)
+    cache = FakeCache(broken={'b'})
+    prewarmer = Prewarmer(cache, None, ['categorizer'], budget_bytes=1e6)
+    assert not prewarmer.ready
+    
+    assert prewarmer.run() == 1
+    assert prewarmer.run() == 1  # already done
+    
+    assert prewarmer.ready
+    assert cache.warmed == [('categorizer', 'a')]
+    status = prewarmer.status()
+    assert (status['state'], status['planned'], status['loaded'], status['failed']) == ('done', 2, 1, 1)
+
+
+def test_skip_marks_ready(models):
+    prewarmer = Prewarmer(FakeCache(), None, ['categorizer'], budget_bytes=1e6)
+    prewarmer.skip()
+    assert prewarmer.ready and prewarmer.run() == 0
@@ -0,0 +1,107 @@
+"""Request captures of routes that run their work in the threadpool"""
+import pstats
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from benchmarks.synthetic import generate_transactions
+from services.transaction_categorizer import TransactionCategorizer
+
+ADMIN = {"X-Admin-Token": "test-admin-token"}
+
+
+@pytest.fixture(scope="module")
+def client():
+    TransactionCategorizer("profiled_user").train(generate_transactions(300, seed=3))
+    with TestClient(main.app) as client:
+        yield client
+
+
+def capture(client, route: str, mode: str, send) -> str:
+    armed = client.post("/admin/profile/requests", json={"route": route, "count": 1, "mode": mode}, headers=ADMIN)
+    assert armed.status_code == 200
+    capture_id = armed.json()["data"]["id"]
+    send()
+    result = client.get(f"/admin/profile/requests/{capture_id}",
+                        params={"format": "text" if mode == "cprofile" else "collapsed"}, headers=ADMIN)
+    assert result.status_code == 200
+    return result.text
+
+
+def predict_batch(client):
+    transactions = generate_transactions(20000, seed=4)
+    response = client.post("/categorize/predict-batch", json={"user_id": "profiled_user", "transactions": [
+        {"description": t["description"], "amount": t["amount"], "date": t["date"]} for t in transactions
+    ]})
+    assert response.status_code == 200
+
+
+def test_cprofile_capture_includes_threadpool_work(client):
+    text = capture(client, "/categorize/predict-batch", "cprofile", lambda: predict_batch(client))
+    assert "transaction_categorizer.py" in text
+
+
+def test_sampled_capture_includes_threadpool_work(client):
+    stacks = capture(client, "/categorize/predict-batch", "sample", lambda: predict_batch(client))
+    assert "transaction_categorizer.py" in stacks
+
+
+def arm(client, route: str, **options):
+    return client.post("/admin/profile/requests", json={"route": route, **options}, headers=ADMIN)
+
+
+def test_admin_token_required(client):
+    body = {"route": "/health"}
+    assert client.post("/admin/profile/requests", json=body).status_code == 403
+    assert client.post("/admin/profile/requests", json=body, headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.get("/admin/profile/requests").status_code == 403
+
+
+@pytest.mark.parametrize("options", [{"route": "/nowhere"}, {"route": "/health", "mode": "perf"}])
+def test_bad_capture_requests_are_rejected(client, options):
+    assert arm(client, **options).status_code == 400
+
+
+def test_capture_matches_route_templates(client):
+    capture_id = arm(client, "/models/status/{user_id}", count=2).json()["data"]["id"]
+    status = f"/admin/profile/requests/{capture_id}"
+    
+    client.get("/models/status/profiled_user")
+    assert client.get(status, headers=ADMIN).json()["data"]["captured"] == 1
+    assert client.get(status, params={"format": "text"}, headers=ADMIN).status_code == 409
+    
+    client.get("/health")  # other routes are not captured
+    client.get("/models/status/someone_else")
+    
+    pstats_response = client.get(status, params={"format": "pstats"}, headers=ADMIN)
+    assert pstats_response.status_code == 200
+    with tempfile.NamedTemporaryFile(suffix=".pstats") as f:
+        f.write(pstats_response.content)
+        f.flush()
+        assert pstats.Stats(f.name).total_calls > 0
+    assert client.get(status, params={"format": "collapsed"}, headers=ADMIN).status_code == 400
+    assert capture_id in [c["id"] for c in client.get("/admin/profile/requests", headers=ADMIN).json()["data"]]
+
+
+def test_unknown_capture_is_404(client):
+    assert client.get("/admin/profile/requests/missing", headers=ADMIN).status_code == 404
+
+
+def test_stage_timing_only_for_admins(client):
+    body = {"user_id": "profiled_user", "transactions": [{"description": "ZOMATO", "amount": -100.0}]}
+    
+    traced = client.post("/categorize/predict-batch", json=body, headers={**ADMIN, "X-Stage-Timing": "1"})
+    assert "categorizer.inference;dur=" in traced.headers["Server-Timing"]
+    
+    anonymous = client.post("/categorize/predict-batch", json=body, headers={"X-Stage-Timing": "1"})
+    assert "Server-Timing" not in anonymous.headers
+
+
+def test_sampling_all_threads(client):
+    response = client.post("/admin/profile/sample", params={"seconds": 0.2, "interval_ms": 5}, headers=ADMIN)
+    
+    assert response.status_code == 200
+    assert int(response.headers["X-Samples"]) > 0
+    assert client.post("/admin/profile/sample", params={"seconds": 0}, headers=ADMIN).status_code == 400
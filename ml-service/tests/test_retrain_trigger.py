@@ -0,0 +1,181 @@
+"""RetrainTrigger counting and debouncing against an in-memory MongoDB"""
+import time
+
+import mongomock
+import pytest
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+
+from retrain_trigger import RetrainTrigger
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient().finance_db
+
+
+def insert(db, user_id: str, count: int):
+    return db.transactions.insert_many([{'userId': user_id, 'amount': 1.0} for _ in range(count)]).inserted_ids
+
+
+def make_trigger(db, clock, **kwargs):
+    options = dict(threshold=5, debounce_seconds=60, max_delay_seconds=600, batch_size=3)
+    options.update(kwargs)
+    return RetrainTrigger(db, on_retrain=lambda user_id: None, clock=clock, **options)
+
+
+def test_poll_once_counts_only_new_transactions(db):
+    insert(db, 'existing', 10)
+    trigger = make_trigger(db, FakeClock())
+    trigger.init_high_water_mark()
+    
+    insert(db, 'alice', 4)
+    insert(db, 'bob', 1)
+    
+    # Batches of 3 until the backlog is drained
+    assert [trigger.poll_once() for _ in range(3)] == [3, 2, 0]
+    assert dict(trigger.new_counts) == {'alice': 4, 'bob': 1}
+
+
+def test_retrain_waits_for_threshold_and_debounce(db):
+    clock = FakeClock()
+    trigger = make_trigger(db, clock)
+    trigger.init_high_water_mark()
+    
+    insert(db, 'alice', 4)
+    while trigger.poll_once():
+        pass
+    clock.now = 100
+    assert trigger.enqueue_due() == []  # below the threshold
+    
+    insert(db, 'alice', 1)
+    while trigger.poll_once():
+        pass
+    clock.now = 130
+    assert trigger.enqueue_due() == []  # still inside the debounce window
+    
+    clock.now = 160
+    assert trigger.enqueue_due() == ['alice']
+    assert trigger.retrain_queue.get_nowait() == 'alice'
+    assert 'alice' not in trigger.new_counts
+
+
+def test_busy_user_is_retrained_after_max_delay(db):
+    clock = FakeClock()
+    trigger = make_trigger(db, clock, debounce_seconds=60, max_delay_seconds=200)
+    trigger.init_high_water_mark()
+    
+    for step in range(20):
+        clock.now = step * 30
+        insert(db, 'alice', 1)
+        while trigger.poll_once():
+            pass
+        due = trigger.enqueue_due()
+        if due:
+            break
+    
+    # Crossed the threshold at 120s and never went quiet for 60s
+    assert due == ['alice']
+    assert clock.now == 330
+
+
+class _FailingStream:
+    """Change stream that delivers ``changes`` and then fails"""
+    
+    def __init__(self, changes):
+        self.changes = list(changes)
+        self.alive = True
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+    
+    def try_next(self):
+        if self.changes:
+            return self.changes.pop(0)
+        raise PyMongoError("stream interrupted")
+
+
+class _WatchableCollection:
+    def __init__(self, collection, changes):
+        self.collection = collection
+        self.changes = changes
+    
+    def watch(self, pipeline, **kwargs):
+        return _FailingStream(self.changes)
+    
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+
+def test_polling_after_stream_failure_does_not_recount(db):
+    trigger = make_trigger(db, FakeClock())
+    trigger.init_high_water_mark()
+    
+    streamed = insert(db, 'alice', 3)
+    changes = [{'fullDocument': {'userId': 'alice'}, 'documentKey': {'_id': _id}} for _id in streamed]
+    trigger.db = type('StreamingDB', (), {'transactions': _WatchableCollection(db.transactions, changes)})()
+    with pytest.raises(PyMongoError):
+        trigger.run_change_stream()
+    assert trigger.high_water_mark == streamed[-1]
+    
+    insert(db, 'alice', 1)
+    while trigger.poll_once():
+        pass
+    assert trigger.new_counts['alice'] == 4
+    assert isinstance(trigger.high_water_mark, ObjectId)
+
+
+def test_poll_once_reads_in_batches(db):
+    trigger = make_trigger(db, FakeClock(), batch_size=3)
+    insert(db, 'alice', 7)
+    
+    assert [trigger.poll_once() for _ in range(4)] == [3, 3, 1, 0]
+    assert trigger.new_counts['alice'] == 7
+
+
+def test_worker_survives_failed_retrains(db):
+    retrained = []
+    
+    def on_retrain(user_id):
+        retrained.append(user_id)
+        if user_id == 'broken':
+            raise RuntimeError("training failed")
+    
+    trigger = RetrainTrigger(db, on_retrain=on_retrain)
+    for user_id in ('broken', 'alice', None):
+        trigger.retrain_queue.put(user_id)
+    trigger.run_worker()
+    
+    assert retrained == ['broken', 'alice']
+
+
+def test_run_without_change_streams_polls_until_stopped(db):
+    retrained = []
+    trigger = RetrainTrigger(
+        db, on_retrain=retrained.append, threshold=3, debounce_seconds=0, poll_interval=0.01
+    )
+    insert(db, 'existing', 5)
+    threads = trigger.start()
+    try:
+        insert(db, 'alice', 3)
+        deadline = time.time() + 5
+        while not retrained and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        trigger.stop()
+        for thread in threads:
+            thread.join(timeout=5)
+    
+    assert retrained == ['alice']
+    assert not any(thread.is_alive() for thread in threads)
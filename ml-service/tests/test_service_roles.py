@@ -0,0 +1,67 @@
+"""SERVICE_ROLE replicas: lazy engine imports and role-gated routes
+
+Each case starts a fresh interpreter, since the role is read when main is imported.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import services
+from benchmarks.bench_startup import SERVICE_DIR, probe
+
+ROUTES_PROBE = """
+import json
+from fastapi.testclient import TestClient
+import main
+client = TestClient(main.app)
+print(json.dumps({
+    "role": client.get("/").json()["role"],
+    "categorize": client.post("/categorize/predict", json={
+        "user_id": "nobody", "transaction": {"description": "x", "amount": 1.0}
+    }).status_code,
+    "forecast": client.post("/forecast/predict", json={"user_id": "nobody"}).status_code,
+    "status": sorted(client.get("/models/status/nobody").json()["data"]),
+}))
+"""
+
+
+def run(script: str, role: str, tmp_path) -> subprocess.CompletedProcess:
+    env = {**os.environ, "SERVICE_ROLE": role, "MODEL_PATH": str(tmp_path)}
+    return subprocess.run([sys.executable, "-c", script], cwd=SERVICE_DIR, env=env, capture_output=True, text=True)
+
+
+@pytest.mark.parametrize("role, engines", [
+    ("categorize", {"sklearn"}),
+    ("forecast", {"prophet"}),
+    ("all", {"sklearn", "prophet"}),
+])
+def test_roles_import_only_their_engines(tmp_path, role, engines):
+    loaded = probe(role, str(tmp_path))
+    assert {name for name in ("sklearn", "prophet") if loaded[name]} == engines
+
+
+@pytest.mark.parametrize("role, served", [
+    ("categorize", {"categorize": 400, "forecast": 404, "status": ["categorizer", "user_id"]}),
+    ("forecast", {"categorize": 404, "forecast": 400, "status": ["forecaster", "user_id"]}),
+])
+def test_other_roles_routes_are_404(tmp_path, role, served):
+    result = run(ROUTES_PROBE, role, tmp_path)
+    assert result.returncode == 0, result.stderr
+    
+    response = json.loads(result.stdout.strip().splitlines()[-1])
+    assert response == {"role": role, **served}
+
+
+def test_unknown_role_fails_at_import(tmp_path):
+    result = run("import main", "train", tmp_path)
+    assert result.returncode != 0
+    assert "SERVICE_ROLE must be one of" in result.stderr
+
+
+def test_services_exports_are_lazy():
+    assert services.MaterializedForecaster.__module__ == "services.expense_forecaster"
+    with pytest.raises(AttributeError):
+        services.NotAnEngine
@@ -0,0 +1,78 @@
+"""Preforked serving: gunicorn settings and the published models preloaded before forking"""
+import importlib.util
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from services import model_store
+from services.model_store import ModelStore, atomic_dump, published_users
+
+CONF_PATH = Path(__file__).resolve().parent.parent / "gunicorn.conf.py"
+
+
+def load_conf():
+    spec = importlib.util.spec_from_file_location("gunicorn_conf", CONF_PATH)
+    conf = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(conf)
+    return conf
+
+
+class _Log:
+    def __init__(self):
+        self.messages = []
+    
+    def info(self, message):
+        self.messages.append(message)
+
+
+def test_workers_are_forked_from_a_preloaded_app():
+    conf = load_conf()
+    
+    assert conf.preload_app is True
+    assert conf.worker_class == "uvicorn.workers.UvicornWorker"
+    assert conf.workers >= 1
+    # Recycled workers restart at staggered times
+    assert conf.max_requests > 0 and conf.max_requests_jitter > 0
+
+
+@pytest.mark.parametrize("preload", [True, False])
+def test_when_ready_preloads_then_freezes_gc(monkeypatch, preload):
+    import main
+    conf = load_conf()
+    calls = []
+    monkeypatch.setattr(conf, 'PRELOAD_MODELS', preload)
+    monkeypatch.setattr(main, 'preload_models', lambda: calls.append('preload') or 3)
+    monkeypatch.setattr(conf.gc, 'freeze', lambda: calls.append('freeze'))
+    server = type('Server', (), {'log': _Log()})()
+    
+    conf.when_ready(server)
+    
+    assert calls == (['preload', 'freeze'] if preload else ['freeze'])
+    assert bool(server.log.messages) == preload
+
+
+def publish(model_dir: Path, mtime: float):
+    store = ModelStore(model_dir)
+    staging_dir = store.stage()
+    atomic_dump({}, staging_dir / "metadata.pkl")
+    store.publish(staging_dir)
+    os.utime(model_dir / model_store.POINTER_FILE, (mtime, mtime))
+
+
+def test_published_users_most_recent_first(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_store, 'MODEL_PATH', tmp_path)
+    now = time.time()
+    publish(tmp_path / "categorizer_old", now - 100)
+    publish(tmp_path / "categorizer_new", now)
+    # Saved before versioning
+    (tmp_path / "categorizer_legacy").mkdir()
+    atomic_dump({}, tmp_path / "categorizer_legacy" / "metadata.pkl")
+    os.utime(tmp_path / "categorizer_legacy" / "metadata.pkl", (now - 50, now - 50))
+    # Never finished saving
+    (tmp_path / "categorizer_empty").mkdir()
+    publish(tmp_path / "forecaster_new", now)
+    
+    assert published_users("categorizer_") == ["new", "legacy", "old"]
+    assert published_users("forecaster_") == ["new"]
@@ -0,0 +1,167 @@
+"""HashRing ownership and ShardRouter routing"""
+import json
+
+import msgpack
+import pyarrow as pa
+import pytest
+import requests
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from services.sharding import FORWARDED_HEADER, OWNER_HEADER, HashRing, ShardRouter, _user_from_body
+
+NODES = ["http://node-a", "http://node-b", "http://node-c"]
+USERS = [f"user-{i}" for i in range(20000)]
+
+
+def test_ownership_is_stable_and_independent_of_node_order():
+    ring = HashRing(NODES, 160)
+    shuffled = HashRing(list(reversed(NODES)), 160)
+    assert all(ring.owner(u) == shuffled.owner(u) == HashRing(NODES, 160).owner(u) for u in USERS[:2000])
+    assert set(ring.owner(u) for u in USERS) == set(NODES)
+
+
+def test_adding_a_node_only_moves_users_to_it():
+    before = HashRing(NODES, 160)
+    after = HashRing(NODES + ["http://node-d"], 160)
+    moved = [u for u in USERS if before.owner(u) != after.owner(u)]
+    
+    assert all(after.owner(u) == "http://node-d" for u in moved)
+    assert len(moved) / len(USERS) == pytest.approx(1 / 4, abs=0.05)
+
+
+def test_removing_a_node_only_moves_its_users():
+    before = HashRing(NODES, 160)
+    after = HashRing(NODES[:2], 160)
+    for user_id in USERS:
+        if before.owner(user_id) != NODES[2]:
+            assert after.owner(user_id) == before.owner(user_id)
+
+
+def test_empty_ring_is_rejected():
+    with pytest.raises(ValueError):
+        HashRing([])
+
+
+def test_user_from_body():
+    assert _user_from_body(json.dumps({"user_id": "u1"}).encode(), "application/json") == "u1"
+    assert _user_from_body(msgpack.packb({"user_id": "u2"}), "application/msgpack") == "u2"
+    
+    table = pa.table({"description": ["x"]}).replace_schema_metadata({b"user_id": b"u3"})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    assert _user_from_body(sink.getvalue().to_pybytes(), "application/vnd.apache.arrow.stream") == "u3"
+    
+    assert _user_from_body(b"", "application/json") is None
+    assert _user_from_body(b"not json", "application/json") is None
+    assert _user_from_body(json.dumps([1, 2]).encode(), "application/json") is None
+
+
+class FakeSession:
+    """Records forwarded requests and answers them as the owner would"""
+    
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.calls = []
+    
+    def request(self, method, url, data=None, headers=None, **kwargs):
+        self.calls.append({"method": method, "url": url, "data": data, "headers": headers})
+        if self.fail:
+            raise requests.ConnectionError("owner down")
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps({"served_by": "owner"}).encode()
+        response.headers["content-type"] = "application/json"
+        return response
+
+
+def user_owned_by(ring: HashRing, node: str) -> str:
+    return next(u for u in USERS if ring.owner(u) == node)
+
+
+@pytest.fixture
+def ring():
+    return HashRing(NODES[:2], 160)
+
+
+def make_client(ring, mode="forward", fail=False):
+    app = FastAPI()
+    
+    @app.get("/models/status/{user_id}")
+    async def status(user_id: str):
+        return {"served_by": "local", "user_id": user_id}
+    
+    @app.post("/predict")
+    async def predict(request: Request):
+        return {"served_by": "local", "body": (await request.json())}
+    
+    router = ShardRouter(app, ring, NODES[0], routes=lambda: app.router.routes, mode=mode)
+    router.session = FakeSession(fail)
+    return TestClient(router), router.session
+
+
+def test_own_users_are_served_locally(ring):
+    client, session = make_client(ring)
+    local = user_owned_by(ring, NODES[0])
+    
+    response = client.get(f"/models/status/{local}")
+    assert response.json()["served_by"] == "local"
+    assert response.headers[OWNER_HEADER] == NODES[0]
+    
+    # The body read to find the user is replayed to the app
+    response = client.post("/predict", json={"user_id": local, "n": 1})
+    assert response.json() == {"served_by": "local", "body": {"user_id": local, "n": 1}}
+    assert session.calls == []
+
+
+@pytest.mark.parametrize("send", ["path", "header", "body"])
+def test_other_users_are_forwarded(ring, send):
+    client, session = make_client(ring)
+    remote = user_owned_by(ring, NODES[1])
+    
+    if send == "path":
+        response = client.get(f"/models/status/{remote}?verbose=1")
+        expected_url = f"{NODES[1]}/models/status/{remote}?verbose=1"
+    elif send == "header":
+        response = client.post("/predict", json={"n": 1}, headers={"X-User-Id": remote})
+        expected_url = f"{NODES[1]}/predict"
+    else:
+        response = client.post("/predict", json={"user_id": remote})
+        expected_url = f"{NODES[1]}/predict"
+    
+    assert response.json() == {"served_by": "owner"}
+    assert response.headers[OWNER_HEADER] == NODES[1]
+    assert [call["url"] for call in session.calls] == [expected_url]
+    assert session.calls[0]["headers"][FORWARDED_HEADER] == NODES[0]
+    if send == "body":
+        assert json.loads(session.calls[0]["data"]) == {"user_id": remote}
+
+
+def test_forwarded_requests_are_never_forwarded_again(ring):
+    client, session = make_client(ring)
+    remote = user_owned_by(ring, NODES[1])
+    
+    response = client.get(f"/models/status/{remote}", headers={FORWARDED_HEADER: NODES[1]})
+    assert response.json()["served_by"] == "local"
+    assert session.calls == []
+
+
+def test_redirect_mode(ring):
+    client, session = make_client(ring, mode="redirect")
+    remote = user_owned_by(ring, NODES[1])
+    
+    response = client.get(f"/models/status/{remote}", follow_redirects=False)
+    assert response.status_code == 307
+    assert response.headers["location"] == f"{NODES[1]}/models/status/{remote}"
+    assert session.calls == []
+
+
+def test_unreachable_owner_falls_back_to_local(ring):
+    client, session = make_client(ring, fail=True)
+    remote = user_owned_by(ring, NODES[1])
+    
+    response = client.post("/predict", json={"user_id": remote})
+    assert response.json() == {"served_by": "local", "body": {"user_id": remote}}
+    assert response.headers[OWNER_HEADER] == NODES[0]
+    assert len(session.calls) == 1
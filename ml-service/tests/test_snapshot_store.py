@@ -0,0 +1,169 @@
+"""Incremental snapshot syncs against an in-memory MongoDB"""
+import asyncio
+import shutil
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+import data_access
+from snapshot_store import SnapshotStore
+
+USER = '65a1b2c3d4e5f60718293a4b'
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = AsyncMongoMockClient().finance_db
+    monkeypatch.setattr(data_access, 'get_db', lambda: db)
+    return db
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SnapshotStore(tmp_path / "snapshots")
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def transaction(day: int, user_id=USER, **fields):
+    return {
+        'userId': user_id,
+        'description': f"purchase {day}",
+        'amount': float(day),
+        'date': START + timedelta(days=day),
+        'category': 'Food',
+        'updatedAt': START + timedelta(days=day),
+        **fields
+    }
+
+
+def insert(db, *docs):
+    return run(db.transactions.insert_many(list(docs))).inserted_ids
+
+
+def by_description(df):
+    return df.set_index('description').sort_index()
+
+
+def test_first_sync_builds_full_snapshot(db, store):
+    insert(db, *(transaction(day) for day in range(5)))
+    insert(db, transaction(0, user_id='someone-else'))
+    
+    df = run(store.sync(USER))
+    
+    assert len(df) == 5
+    assert list(df.columns) == data_access.TRANSACTION_COLUMNS
+    meta = store.read_meta(USER)
+    assert meta['count'] == 5
+    assert meta['watermark'] == (START + timedelta(days=4)).isoformat()
+    assert store.list_users() == [USER]
+
+
+def test_delta_merge_fetches_only_changes(db, store, monkeypatch):
+    insert(db, *(transaction(day) for day in range(5)))
+    run(store.sync(USER))
+    built_at = store.read_meta(USER)['built_at']
+    insert(db, transaction(10), transaction(11))
+    
+    fetched = []
+    fetch = data_access.fetch_transaction_changes
+    
+    async def spy(user_id, since=None, **kwargs):
+        changes = await fetch(user_id, since=since, **kwargs)
+        fetched.append((since, len(changes)))
+        return changes
+    monkeypatch.setattr(data_access, 'fetch_transaction_changes', spy)
+    
+    df = run(store.sync(USER))
+    
+    # The watermark document is fetched again ($gte) and deduplicated
+    assert fetched == [(START + timedelta(days=4), 3)]
+    assert len(df) == 7
+    meta = store.read_meta(USER)
+    assert meta['count'] == 7
+    assert meta['built_at'] == built_at
+    assert meta['watermark'] == (START + timedelta(days=11)).isoformat()
+
+
+def test_updated_documents_replace_their_old_rows(db, store):
+    ids = insert(db, *(transaction(day) for day in range(5)))
+    run(store.sync(USER))
+    
+    run(db.transactions.update_one(
+        {'_id': ids[1]}, {'$set': {'category': 'Travel', 'amount': 99.0, 'updatedAt': START + timedelta(days=20)}}
+    ))
+    df = by_description(run(store.sync(USER)))
+    
+    assert len(df) == 5
+    assert df.loc['purchase 1', 'category'] == 'Travel'
+    assert df.loc['purchase 1', 'amount'] == 99.0
+    assert (df.drop('purchase 1')['category'] == 'Food').all()
+
+
+def test_unchanged_resync_keeps_rows(db, store):
+    insert(db, *(transaction(day) for day in range(3)))
+    first = run(store.sync(USER))
+    
+    again = run(store.sync(USER))
+    
+    assert store.read_meta(USER)['count'] == 3
+    assert by_description(again).equals(by_description(first))
+
+
+def test_rebuild_drops_deleted_documents(db, store):
+    ids = insert(db, *(transaction(day) for day in range(5)))
+    run(store.sync(USER))
+    run(db.transactions.delete_one({'_id': ids[0]}))
+    
+    # Deltas cannot see deletions
+    assert len(run(store.sync(USER))) == 5
+    
+    df = run(store.sync(USER, rebuild=True))
+    assert len(df) == 4
+    assert 'purchase 0' not in set(df['description'])
+
+
+def test_stale_snapshot_is_rebuilt(db, tmp_path):
+    ids = insert(db, *(transaction(day) for day in range(5)))
+    store = SnapshotStore(tmp_path / "snapshots", max_age_hours=0)
+    run(store.sync(USER))
+    built_at = store.read_meta(USER)['built_at']
+    run(db.transactions.delete_one({'_id': ids[0]}))
+    
+    assert len(run(store.sync(USER))) == 4
+    assert store.read_meta(USER)['built_at'] > built_at
+
+
+def test_missing_version_dir_is_rebuilt(db, store):
+    insert(db, *(transaction(day) for day in range(3)))
+    run(store.sync(USER))
+    shutil.rmtree(store.user_dir(USER) / store.read_meta(USER)['version'])
+    
+    assert store.load(USER) is None
+    assert len(run(store.sync(USER))) == 3
+    assert store.has_version(USER, store.read_meta(USER))
+
+
+def test_string_and_objectid_callers_share_one_snapshot(db, store):
+    insert(db, transaction(0), transaction(1, user_id=ObjectId(USER)))
+    
+    from_string = run(store.sync(USER, rebuild=True))
+    from_object_id = run(store.sync(ObjectId(USER), rebuild=True))
+    
+    assert len(from_string) == len(from_object_id) == 2
+    assert store.list_users() == [USER]
+
+
+def test_old_versions_are_removed(db, store):
+    insert(db, *(transaction(day) for day in range(3)))
+    run(store.sync(USER))
+    insert(db, transaction(5))
+    run(store.sync(USER))
+    
+    versions = [p.name for p in store.user_dir(USER).iterdir() if p.is_dir()]
+    assert versions == [store.read_meta(USER)['version']]
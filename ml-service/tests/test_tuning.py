@@ -0,0 +1,99 @@
+"""Successive-halving hyperparameter search for the categorizer"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_transactions
+from services import tuning
+from services.transaction_categorizer import TransactionCategorizer
+from services.tuning import CategorizerTuner, expand_grid
+
+
+@pytest.fixture(scope="module")
+def data():
+    df = pd.DataFrame(generate_transactions(300, seed=41))
+    return df, df['category'].values
+
+
+@pytest.fixture
+def small_grids(monkeypatch):
+    monkeypatch.setitem(tuning.TEXT_GRIDS, 'tfidf', {'max_features': [20, 50, 100]})
+    monkeypatch.setitem(tuning.MODEL_GRIDS, 'random_forest', {'n_estimators': [10, 20, 30], 'max_depth': [6]})
+
+
+def test_expand_grid():
+    assert expand_grid({'b': [1, 2], 'a': ['x']}) == [{'a': 'x', 'b': 1}, {'a': 'x', 'b': 2}]
+
+
+def test_fold_features_fit_on_training_rows_only(data, monkeypatch):
+    df, y = data
+    categorizer = TransactionCategorizer("tuning_folds")
+    calls = []
+    extract_features = categorizer.extract_features
+    
+    def spy(transactions, fit=False):
+        calls.append((fit, set(transactions.index)))
+        return extract_features(transactions, fit=fit)
+    monkeypatch.setattr(categorizer, 'extract_features', spy)
+    
+    indices = np.arange(120)
+    folds = CategorizerTuner(categorizer, cv=3).fold_features(df, y, indices, {'max_features': 50})
+    
+    assert len(folds) == 3
+    for (fit_train, train_rows), (fit_test, test_rows) in zip(calls[::2], calls[1::2]):
+        assert fit_train and not fit_test
+        assert not train_rows & test_rows
+        assert train_rows | test_rows == set(indices)
+    # The amount column is standardized on the training fold
+    for X_train, _, _, _ in folds:
+        assert abs(np.asarray(X_train[:, -5].mean())) < 1e-9
+
+
+def test_fold_features_are_shared_per_text_setting(data):
+    df, y = data
+    tuner = CategorizerTuner(TransactionCategorizer("tuning_cache"), cv=3)
+    indices = np.arange(90)
+    
+    first = tuner.fold_features(df, y, indices, {'max_features': 50})
+    assert tuner.fold_features(df, y, indices, {'max_features': 50}) is first
+    assert tuner.fold_features(df, y, indices, {'max_features': 20}) is not first
+
+
+def test_search_halves_candidates(data, small_grids):
+    df, y = data
+    tuner = CategorizerTuner(TransactionCategorizer("tuning_search"), factor=3, cv=3, n_jobs=1)
+    
+    result = tuner.search(df, y)
+    
+    # 9 candidates -> 3 -> 1, each scored on 3 folds
+    assert result['rounds'] == 2
+    assert result['fits'] == (9 + 3) * 3
+    assert result['params']['max_features'] in (20, 50, 100)
+    assert result['params']['n_estimators'] in (10, 20, 30)
+    assert 0 < result['score'] <= 1
+
+
+def test_failed_fits_score_zero():
+    class Broken:
+        def fit(self, X, y):
+            raise ValueError("cannot fit")
+        
+        def get_params(self, deep=True):
+            return {}
+    
+    X = np.zeros((4, 2))
+    assert tuning._score_candidate(Broken(), [(X, np.zeros(4), X, np.zeros(4))]) == 0.0
+
+
+def test_tuned_params_persist_for_retrains(data, small_grids):
+    df, _ = data
+    categorizer = TransactionCategorizer("tuning_persist")
+    result = categorizer.train(df.to_dict('records'), eval_mode='holdout', tune=True)
+    
+    tuned = categorizer.tuned_params
+    assert result['tuned_params'] == {**tuned['text_params'], **tuned['model_params']}
+    
+    reloaded = TransactionCategorizer("tuning_persist")
+    assert reloaded.tuned_params['model_params'] == tuned['model_params']
+    assert reloaded.build_classifier().n_estimators == tuned['model_params']['n_estimators']
+    assert reloaded.build_text_vectorizer().max_features == tuned['text_params']['max_features']
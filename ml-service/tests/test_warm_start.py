@@ -0,0 +1,119 @@
+"""Warm-start parameters carried over from a previous Prophet fit"""
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+from prophet import Prophet
+
+from services import warm_start
+
+logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+
+
+def daily_series(days: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.RandomState(seed)
+    ds = pd.date_range('2024-01-01', periods=days, freq='D')
+    # A trend that bends halfway through, so the fit uses its changepoints
+    trend = 40 + 0.1 * np.arange(days) - 0.15 * np.clip(np.arange(days) - days // 2, 0, None)
+    y = trend + 8 * (ds.dayofweek >= 5) + rng.normal(0, 2, days)
+    return pd.DataFrame({'ds': ds, 'y': y})
+
+
+def new_model(**kwargs) -> Prophet:
+    # Same settings as ExpenseForecaster.train_category_model
+    settings = dict(
+        daily_seasonality=False,
+        weekly_seasonality=True,
+        yearly_seasonality=False,
+        changepoint_prior_scale=0.05,
+        seasonality_prior_scale=10.0
+    )
+    return Prophet(**{**settings, **kwargs})
+
+
+def implied_trend(model: Prophet, df: pd.DataFrame, init, dates: pd.Series) -> np.ndarray:
+    """Trend ``init`` describes for a fit of ``model`` to ``df``, in data units"""
+    # The scaling and changepoint grid Prophet.fit sets up before optimizing
+    model.history = model.setup_dataframe(df.copy(), initialize_scales=True)
+    model.set_changepoints()
+    t = (pd.DatetimeIndex(dates) - model.start).total_seconds().values / model.t_scale.total_seconds()
+    trend = model.piecewise_linear(t, init['delta'], init['k'], init['m'], model.changepoints_t)
+    return trend * model.y_scale
+
+
+@pytest.fixture(scope="module")
+def history():
+    return daily_series(150)
+
+
+@pytest.fixture(scope="module")
+def previous(history):
+    return new_model().fit(history)
+
+
+def previous_trend(previous: Prophet, dates: pd.Series) -> np.ndarray:
+    return previous.predict(pd.DataFrame({'ds': dates}))['trend'].values
+
+
+def test_same_history_reproduces_previous_fit(previous, history):
+    model = new_model()
+    init = warm_start.init_params(previous, model, history)
+    
+    assert init is not None
+    np.testing.assert_allclose(
+        implied_trend(model, history, init, history['ds']), previous_trend(previous, history['ds']),
+        rtol=1e-6
+    )
+    np.testing.assert_allclose(init['beta'], np.ravel(previous.params['beta']), rtol=1e-9)
+
+
+def test_grown_history_keeps_previous_trend(previous, history):
+    grown = pd.concat([history, daily_series(180).iloc[len(history):]], ignore_index=True)
+    model = new_model()
+    init = warm_start.init_params(previous, model, grown)
+    
+    assert init is not None
+    assert len(init['delta']) == model.n_changepoints
+    # The grid moves as history grows, so the trend matches up to the bends between changepoints
+    expected = previous_trend(previous, history['ds'])
+    actual = implied_trend(model, grown, init, history['ds'])
+    assert np.max(np.abs(actual - expected)) < 0.02 * np.ptp(history['y'])
+    
+    # Seasonalities scale with max|y|
+    y_ratio = previous.y_scale / grown['y'].abs().max()
+    np.testing.assert_allclose(init['beta'], np.ravel(previous.params['beta']) * y_ratio, rtol=1e-9)
+
+
+def test_warm_fit_matches_cold_fit(previous, history):
+    grown = pd.concat([history, daily_series(180).iloc[len(history):]], ignore_index=True)
+    model = new_model()
+    init = warm_start.init_params(previous, model, grown)
+    
+    model.fit(grown, init=init)
+    
+    cold = new_model().fit(grown)
+    np.testing.assert_allclose(
+        previous_trend(model, grown['ds']), previous_trend(cold, grown['ds']), rtol=0.02
+    )
+
+
+@pytest.mark.parametrize("settings", [
+    {'yearly_seasonality': True},
+    {'weekly_seasonality': False},
+    {'seasonality_mode': 'multiplicative'},
+    {'changepoint_prior_scale': 0.5},
+])
+def test_mismatched_settings_start_cold(previous, history, settings):
+    assert warm_start.init_params(previous, new_model(**settings), history) is None
+
+
+def test_mismatched_changepoints_start_cold(previous, history):
+    assert warm_start.init_params(previous, new_model(n_changepoints=10), history) is None
+    assert warm_start.init_params(previous, new_model(changepoints=['2024-03-01']), history) is None
+
+
+def test_unfitted_or_sampled_previous_starts_cold(history):
+    assert warm_start.init_params(None, new_model(), history) is None
+    assert warm_start.init_params(new_model(), new_model(), history) is None
+    assert warm_start.init_params(new_model(mcmc_samples=10), new_model(), history) is None
@@ -0,0 +1,176 @@
+"""Batch prediction and forecast responses through each negotiated wire format"""
+import json
+
+import msgpack
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from benchmarks.synthetic import generate_transactions
+from services import wire
+from services.expense_forecaster import ExpenseForecaster
+from services.transaction_categorizer import TransactionCategorizer
+
+USER = "wire_user"
+
+TRANSACTIONS = [
+    {"description": "ZOMATO ONLINE *REF25455", "amount": -286.17, "date": "2024-02-02T10:10:00"},
+    {"description": "DR LAL PATHLABS MUM", "amount": -855.13, "date": "2024-11-09T12:59:00"},
+    {"description": "UBER TRIP", "amount": -120.0, "date": "2024-03-15T08:30:00"},
+]
+
+
+@pytest.fixture(scope="module")
+def client():
+    transactions = generate_transactions(600, seed=7)
+    TransactionCategorizer(USER).train(transactions)
+    ExpenseForecaster(USER).train(transactions)
+    with TestClient(main.app) as client:
+        yield client
+
+
+def read_arrow(content: bytes) -> pa.Table:
+    return pa.ipc.open_stream(content).read_all()
+
+
+def predictions_from(response) -> list:
+    """Rows of (category, confidence, alternative categories) from any format"""
+    media_type = response.headers['content-type'].split(';')[0]
+    if media_type == wire.MEDIA_TYPES[wire.ARROW]:
+        table = read_arrow(response.content).to_pydict()
+        return list(zip(table['category'], table['confidence'], table['alternative_categories']))
+    if media_type == wire.MEDIA_TYPES[wire.MSGPACK]:
+        data = msgpack.unpackb(response.content)['data']
+        return list(zip(data['category'], data['confidence'], data['alternatives']['category']))
+    return [
+        (row['category'], row['confidence'], [alt['category'] for alt in row['alternatives']])
+        for row in response.json()['data']
+    ]
+
+
+def daily_from(response, category: str) -> pd.DataFrame:
+    """One category's daily forecast from any format"""
+    media_type = response.headers['content-type'].split(';')[0]
+    if media_type == wire.MEDIA_TYPES[wire.ARROW]:
+        table = read_arrow(response.content)
+        json.loads(table.schema.metadata[b'forecast'])  # the summary travels as JSON metadata
+        daily = table.to_pandas()
+        return daily[daily['category'] == category].drop(columns='category').reset_index(drop=True)
+    if media_type == wire.MEDIA_TYPES[wire.MSGPACK]:
+        data = msgpack.unpackb(response.content)['data']
+        data = data['categories'][category] if 'categories' in data else data
+        return pd.DataFrame(data['daily_forecast'])
+    data = response.json()['data']
+    data = data['categories'][category] if 'categories' in data else data
+    return pd.DataFrame(data['daily_forecast'])
+
+
+ACCEPTS = {
+    wire.JSON: 'application/json',
+    wire.MSGPACK: 'application/msgpack',
+    wire.ARROW: 'application/vnd.apache.arrow.stream',
+}
+
+
+def batch_body(fmt: str):
+    columns = {name: [t[name] for t in TRANSACTIONS] for name in ('description', 'amount', 'date')}
+    if fmt == wire.MSGPACK:
+        return msgpack.packb({"user_id": USER, "transactions": columns})
+    if fmt == wire.ARROW:
+        table = pa.table(columns).replace_schema_metadata({b'user_id': USER.encode()})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    return json.dumps({"user_id": USER, "transactions": TRANSACTIONS}).encode()
+
+
+@pytest.fixture(scope="module")
+def json_predictions(client):
+    response = client.post("/categorize/predict-batch", json={"user_id": USER, "transactions": TRANSACTIONS})
+    assert response.status_code == 200
+    return predictions_from(response)
+
+
+@pytest.mark.parametrize("request_fmt", list(ACCEPTS))
+@pytest.mark.parametrize("response_fmt", list(ACCEPTS))
+def test_predict_batch_round_trip(client, json_predictions, request_fmt, response_fmt):
+    response = client.post(
+        "/categorize/predict-batch", content=batch_body(request_fmt),
+        headers={"content-type": ACCEPTS[request_fmt], "accept": ACCEPTS[response_fmt]}
+    )
+    
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith(ACCEPTS[response_fmt])
+    rows = predictions_from(response)
+    assert [(c, a) for c, _, a in rows] == [(c, a) for c, _, a in json_predictions]
+    np.testing.assert_allclose([p for _, p, _ in rows], [p for _, p, _ in json_predictions], rtol=1e-12)
+
+
+@pytest.mark.parametrize("category", [None, "Food"])
+@pytest.mark.parametrize("response_fmt", [wire.MSGPACK, wire.ARROW])
+def test_forecast_round_trip(client, category, response_fmt):
+    body = {"user_id": USER, "periods": 14, **({"category": category} if category else {})}
+    expected = client.post("/forecast/predict", json=body)
+    
+    response = client.post(
+        "/forecast/predict", content=msgpack.packb(body),
+        headers={"content-type": ACCEPTS[wire.MSGPACK], "accept": ACCEPTS[response_fmt]}
+    )
+    
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith(ACCEPTS[response_fmt])
+    expected_daily, daily = daily_from(expected, "Food"), daily_from(response, "Food")
+    assert list(daily['date']) == list(expected_daily['date'])
+    # Interval bounds are sampled, the point forecast is not
+    np.testing.assert_allclose(daily['predicted_amount'], expected_daily['predicted_amount'], rtol=1e-9)
+    assert (daily['lower_bound'] <= daily['upper_bound']).all()
+
+
+def test_forecast_arrow_metadata_carries_summary(client):
+    response = client.post(
+        "/forecast/predict", json={"user_id": USER, "periods": 14},
+        headers={"accept": ACCEPTS[wire.ARROW]}
+    )
+    
+    summary = json.loads(read_arrow(response.content).schema.metadata[b'forecast'])
+    assert summary['forecast_period_days'] == 14
+    assert 'daily_forecast' not in summary['categories']['Food']
+    assert summary['categories']['Food']['monthly_total'] > 0
+
+
+@pytest.mark.parametrize("accept", ["text/csv", "application/xml, text/*;q=0.5", "application/msgpack;q=0"])
+def test_unknown_accept_falls_back_to_json(client, accept):
+    response = client.post(
+        "/categorize/predict-batch", json={"user_id": USER, "transactions": TRANSACTIONS},
+        headers={"accept": accept}
+    )
+    
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('application/json')
+    assert len(response.json()['data']) == len(TRANSACTIONS)
+
+
+def test_accept_quality_order():
+    assert wire.response_format(None) == wire.JSON
+    assert wire.response_format("application/json;q=0.5, application/msgpack") == wire.MSGPACK
+    assert wire.response_format("application/msgpack;q=0.2, application/vnd.apache.arrow.stream") == wire.ARROW
+    assert wire.response_format("application/x-msgpack") == wire.MSGPACK
+
+
+def test_unsupported_content_type_is_415(client):
+    response = client.post(
+        "/categorize/predict-batch", content=b"a,b", headers={"content-type": "text/csv"}
+    )
+    assert response.status_code == 415
+
+
+def test_malformed_msgpack_is_400(client):
+    response = client.post(
+        "/categorize/predict-batch", content=msgpack.packb({"user_id": USER, "transactions": []}),
+        headers={"content-type": ACCEPTS[wire.MSGPACK]}
+    )
+    assert response.status_code == 400